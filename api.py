@@ -0,0 +1,179 @@
+from flask import Blueprint, current_app, request, abort
+from models import Venue, Artist, Shows
+from conditional import conditional
+from database import read_only
+from json_responses import json_error, json_response
+from query_budgets import query_budget
+from queries import (VENUE_FIELDS, ARTIST_FIELDS, SHOW_FIELDS, KeysetPage, owners_page,
+                     owners_by_ids, shows_page, shows_query, show_section, upcoming_summaries)
+import search
+import genres
+
+# Versioned JSON API. Every endpoint goes through the same query functions
+# as the HTML views (queries.py).
+#
+#   ?fields=a,b,c   only those columns are SELECTed (plus the cursor keys)
+#   ?after=...      cursor from the previous page's "next_cursor"
+#   ?limit=n        page size, capped by API_PAGE_SIZE_MAX
+#   ?genre=name     venues/artists listing that genre
+
+api = Blueprint('api', __name__, url_prefix='/api/v1')
+
+# Pseudo-field embedding the next upcoming shows of each venue/artist
+EMBED = 'upcoming_shows'
+VENUE_SHOW_FIELDS = ['artist_id', 'artist_name', 'artist_image_link']
+ARTIST_SHOW_FIELDS = ['venue_id', 'venue_name', 'venue_image_link']
+
+
+# By code, so they take precedence over the app's HTML 404/500 pages
+for code in (400, 404, 405, 500):
+    api.register_error_handler(code, json_error)
+
+
+def requested_fields(fields_map, embeddable=False):
+    raw = request.args.get('fields')
+    if not raw:
+        return list(fields_map) + ([EMBED] if embeddable else [])
+    fields = [field.strip() for field in raw.split(',') if field.strip()]
+    allowed = set(fields_map) | ({EMBED} if embeddable else set())
+    unknown = [field for field in fields if field not in allowed]
+    if unknown:
+        abort(400, f"unknown fields: {', '.join(unknown)}")
+    return fields
+
+
+def int_arg(name, default=None):
+    # Unlike request.args.get(type=int), rejects a malformed value instead
+    # of ignoring it
+    raw = request.args.get(name)
+    if raw is None:
+        return default
+    try:
+        return int(raw)
+    except ValueError:
+        abort(400, f'{name} must be an integer')
+
+
+def page_size():
+    size = int_arg('limit', current_app.config['API_PAGE_SIZE'])
+    if size < 1:
+        abort(400, 'limit must be positive')
+    return min(size, current_app.config['API_PAGE_SIZE_MAX'])
+
+
+def owner_list(model, fields_map, owner_column, show_fields):
+    fields = requested_fields(fields_map, embeddable=True)
+    columns = [field for field in fields if field != EMBED]
+    limit = page_size()
+    term = request.args.get('q')
+    genre = request.args.get('genre')
+    criteria = [genres.with_genre(model, genre)] if genre else []
+    next_cursor = None
+    if term is not None:
+        # Ranked search results: a single, limited page
+        ids = [row.id for row in search.search(model, term, limit)]
+        rows = owners_by_ids(fields_map, columns, ids, criteria)
+    else:
+        rows = owners_page(fields_map, columns, int_arg('after'), limit + 1,
+                           criteria)
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = str(rows[-1].id)
+    data = [row._asdict() for row in rows]
+    if EMBED in fields:
+        summaries = upcoming_summaries(owner_column, [item['id'] for item in data], show_fields)
+        for item in data:
+            item[EMBED] = summaries.get(item['id'], [])
+    return json_response({"data": data, "next_cursor": next_cursor})
+
+
+def owner_detail(fields_map, owner_id, owner_column, show_fields):
+    fields = requested_fields(fields_map, embeddable=True)
+    rows = owners_by_ids(fields_map, [field for field in fields if field != EMBED], [owner_id])
+    if not rows:
+        abort(404)
+    data = rows[0]._asdict()
+    if EMBED in fields:
+        section = show_section(shows_query(show_fields).filter(owner_column == owner_id), upcoming=True)
+        data[EMBED] = {"data": [row._asdict() for row in section], "next_cursor": section.next_cursor}
+    return json_response({"data": data})
+
+
+def owner_shows(owner_column, owner_id, show_fields):
+    # Pages through a venue's/artist's upcoming or past shows
+    when = request.args.get('when', 'upcoming')
+    if when not in ('upcoming', 'past'):
+        abort(400, 'when must be upcoming or past')
+    section = show_section(shows_query(show_fields).filter(owner_column == owner_id),
+                           upcoming=when == 'upcoming', after=request.args.get('after'),
+                           page_size=page_size())
+    return json_response({"data": [row._asdict() for row in section], "next_cursor": section.next_cursor})
+
+
+#  Venues
+#  ----------------------------------------------------------------
+
+@api.route('/venues')
+@read_only
+@conditional('Venue', 'Show', 'Artist', time_sensitive=True)
+@query_budget(4)
+def venues():
+    return owner_list(Venue, VENUE_FIELDS, Shows.venue_id, VENUE_SHOW_FIELDS)
+
+
+@api.route('/venues/<int:venue_id>')
+@read_only
+@conditional('Venue:{venue_id}', 'Artist', time_sensitive=True)
+@query_budget(4)
+def venue(venue_id):
+    return owner_detail(VENUE_FIELDS, venue_id, Shows.venue_id, VENUE_SHOW_FIELDS)
+
+
+@api.route('/venues/<int:venue_id>/shows')
+@read_only
+@conditional('Venue:{venue_id}', 'Artist', time_sensitive=True)
+@query_budget(4)
+def venue_shows(venue_id):
+    return owner_shows(Shows.venue_id, venue_id, VENUE_SHOW_FIELDS)
+
+
+#  Artists
+#  ----------------------------------------------------------------
+
+@api.route('/artists')
+@read_only
+@conditional('Artist', 'Show', 'Venue', time_sensitive=True)
+@query_budget(4)
+def artists():
+    return owner_list(Artist, ARTIST_FIELDS, Shows.artist_id, ARTIST_SHOW_FIELDS)
+
+
+@api.route('/artists/<int:artist_id>')
+@read_only
+@conditional('Artist:{artist_id}', 'Venue', time_sensitive=True)
+@query_budget(4)
+def artist(artist_id):
+    return owner_detail(ARTIST_FIELDS, artist_id, Shows.artist_id, ARTIST_SHOW_FIELDS)
+
+
+@api.route('/artists/<int:artist_id>/shows')
+@read_only
+@conditional('Artist:{artist_id}', 'Venue', time_sensitive=True)
+@query_budget(4)
+def artist_shows(artist_id):
+    return owner_shows(Shows.artist_id, artist_id, ARTIST_SHOW_FIELDS)
+
+
+#  Shows
+#  ----------------------------------------------------------------
+
+@api.route('/shows')
+@read_only
+@conditional('Show', 'Venue', 'Artist')
+@query_budget(4)
+def shows():
+    fields = requested_fields(SHOW_FIELDS)
+    limit = page_size()
+    page = KeysetPage(shows_page(fields, request.args.get('after'), limit).all(), limit)
+    data = [row._asdict() for row in page]
+    return json_response({"data": data, "next_cursor": page.next_cursor})
@@ -2,35 +2,122 @@
 # Imports
 #----------------------------------------------------------------------------#
 
-import json
-import dateutil.parser
-import babel
-from flask import Flask, render_template, request, Response, flash, redirect, url_for
-from flask_moment import Moment
-from flask_sqlalchemy import SQLAlchemy
 import logging
 from logging import Formatter, FileHandler
-from flask_wtf import Form
-from forms import *
-from flask_migrate import Migrate
+from functools import lru_cache
+from datetime import datetime
+import click
+from flask import Flask, render_template, request, Response, abort, stream_with_context
+from flask.cli import with_appcontext
+from werkzeug.utils import import_string
 import collections
 collections.Callable = collections.abc.Callable
-from datetime import datetime
 
 # import Models
-from models import db, Artist, Venue, Shows
+from models import db, Artist, Venue
+import ngram_index
+from conditional import bump
+import cache
+import counters
+import bookings
+import geo
+import exporter
+import database
+import metrics
+from database import read_only
+import query_budgets
+import assets
+
+# Kept light on purpose: a cold start (serverless, autoscaling, test apps)
+# pays for every module imported here. The page blueprints are imported by
+# create_app, forms (wtforms) by the views that render them, babel and
+# dateutil by the datetime filter, and Flask-Migrate (alembic) and the
+# import/seed commands only when a command uses them (see init_cli).
+# benchmarks/bench_startup.py measures the difference.
 
 #----------------------------------------------------------------------------#
 # App Config.
 #----------------------------------------------------------------------------#
 
-app = Flask(__name__)
-moment = Moment(app)
-db = SQLAlchemy(app)
+def create_app(config='config', **overrides):
+  # `config` is an import name or object for app.config.from_object;
+  # keyword arguments override single settings, e.g. for a test app:
+  #   create_app(SQLALCHEMY_DATABASE_URI='sqlite://', TESTING=True)
+  # `flask ...` finds this factory (FLASK_APP=app); WSGI servers call it:
+  #   gunicorn 'app:create_app()'
+  app = Flask(__name__)
+  app.config.from_object(config)
+  app.config.update(overrides)
+
+  db.init_app(app)                 # the one db of the models (models.py)
+  database.init_app(app)           # read replicas and pool stats (database.py)
+  cache.init_app(app)              # rendered page / fragment cache (cache.py)
+  metrics.init_app(app)            # /metrics and Server-Timing (metrics.py)
+  query_budgets.init_app(app)      # N+1 / query budget checks (query_budgets.py)
+  assets.init_app(app)             # fingerprinted static bundles (assets.py)
+  for name in app.config['BLUEPRINTS']:
+    app.register_blueprint(import_string(name))
+
+  app.jinja_env.filters['datetime'] = format_datetime
+  app.add_url_rule('/', 'index', index)
+  app.add_url_rule('/export/<any(venues, artists, shows):kind>.<any(csv, jsonl):format>',
+                   'export', export)
+  if app.config.get('POOL_STATS'):
+    app.add_url_rule('/debug/pool', 'pool_stats', pool_stats)
+  app.register_error_handler(404, not_found_error)
+  app.register_error_handler(500, server_error)
+
+  if app.config.get('NGRAM_SEARCH_INDEX'):
+    app.before_first_request(build_ngram_indexes)
+
+  if not app.debug and not app.testing:
+    file_handler = FileHandler('error.log')
+    file_handler.setFormatter(
+        Formatter('%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]')
+    )
+    app.logger.setLevel(logging.INFO)
+    file_handler.setLevel(logging.INFO)
+    app.logger.addHandler(file_handler)
+    app.logger.info('errors')
 
-# TODO: connect to a local postgresql database
-app.config.from_object('config') # db URI from the config.py file
-migrate = Migrate(app, db)       # database migration using Flask-Migrate
+  init_cli(app)
+  return app
+
+class DeferredMigrate:
+  # app.extensions['migrate'] until `flask db ...` (or a script calling
+  # flask_migrate.upgrade()) first reads it: then Flask-Migrate, and with it
+  # alembic, is imported and takes its place
+  def __init__(self, app):
+    self.app = app
+
+  def __getattr__(self, name):
+    from flask_migrate import Migrate
+    Migrate(self.app, db)                         # database migration using Flask-Migrate
+    return getattr(self.app.extensions['migrate'], name)
+
+class DeferredCommand(click.Command):
+  # Stands for the command `import_name` until it runs, so the `flask` CLI
+  # only imports the module of the command it runs
+  def __init__(self, name, import_name, help):
+    click.Command.__init__(self, name, short_help=help)
+    self.import_name = import_name
+
+  def make_context(self, info_name, args, parent=None, **extra):
+    return import_string(self.import_name).make_context(info_name, args, parent, **extra)
+
+def init_cli(app):
+  # Migrations (flask db ..., a Flask-Migrate plugin command) and the
+  # maintenance commands
+  app.extensions['migrate'] = DeferredMigrate(app)
+  app.cli.add_command(rollover_show_counters)
+  app.cli.add_command(DeferredCommand('import', 'importer:import_command',
+                                      'Bulk import venues, artists or shows from a CSV or JSONL file.'))
+  app.cli.add_command(exporter.export_command)    # flask export venues|artists|shows
+  app.cli.add_command(DeferredCommand('seed', 'seeder:seed_command',
+                                      'Generate synthetic venues, artists and shows for load testing.'))
+  app.cli.add_command(assets.assets_command)      # flask assets build
+  app.cli.add_command(bookings.conflicts_command) # flask conflicts
+  app.cli.add_command(geo.geocode_command)        # flask geocode [--all]
 
 #----------------------------------------------------------------------------#
 # Models.
@@ -42,425 +129,98 @@ migrate = Migrate(app, db)       # database migration using Flask-Migrate
 # Filters.
 #----------------------------------------------------------------------------#
 
-def format_datetime(value, format='medium'):
-  date = dateutil.parser.parse(value)
-  if format == 'full':
-      format="EEEE MMMM, d, y 'at' h:mma"
-  elif format == 'medium':
-      format="EE MM, dd, y h:mma"
-  return babel.dates.format_datetime(date, format, locale='en')
-
-app.jinja_env.filters['datetime'] = format_datetime
+DATETIME_FORMATS = {
+  'full': "EEEE MMMM, d, y 'at' h:mma",
+  'medium': "EE MM, dd, y h:mma",
+}
+
+@lru_cache(maxsize=None)
+def datetime_pattern(format, locale):
+  # Parsed babel pattern and Locale, built once per (format, locale)
+  import babel
+  import babel.dates
+  pattern = DATETIME_FORMATS.get(format, format)
+  return babel.dates.parse_pattern(pattern), babel.Locale.parse(locale)
+
+@lru_cache(maxsize=4096)
+def format_datetime(value, format='medium', locale='en'):
+  # Takes datetimes as they come from the db; strings are still parsed.
+  # Show times repeat a lot across tiles, hence the LRU cache.
+  if isinstance(value, datetime):
+    date = value
+  else:
+    import dateutil.parser
+    date = dateutil.parser.parse(value)
+  pattern, locale = datetime_pattern(format, locale)
+  return pattern.apply(date, locale)
 
 #----------------------------------------------------------------------------#
-# Controllers.
+# Search index.
 #----------------------------------------------------------------------------#
 
-@app.route('/')
-def index():
-  return render_template('pages/home.html')
-
-
-#  Venues
-#  ----------------------------------------------------------------
-
-@app.route('/venues')
-def venues():
-  # TODO: replace with real venues data.
-  venues = Venue.query.all()          
-  data = []                           
-  list_city = []                      
-  list_shows = []                     
-  for venue in venues:                
-    list_city.append((venue.city, venue.state))
-    for city in list_city:
-      if (venue.city == city[0]) and (venue.state == city[1]): 
-        shows_list = list(filter(lambda s : s.start_time > datetime.now(), venue.show))
-        list_shows.append({          
-          "id": venue.id,
-          "name": venue.name,
-          "num_upcoming_shows": len(shows_list) 
-        })
-        dict_citystate = { "city" : venue.city, "state" : venue.state } 
-        dict_citystate["venues"] = list_shows
-        data.append(dict_citystate)         
-
-  return render_template('pages/venues.html', areas=data);
-
-@app.route('/venues/search', methods=['POST'])
-def search_venues():
-  # TODO: implement search on artists with partial string search. Ensure it is case-insensitive.
-  venues_search = request.form.get("search_term", "")
-  response = {}     
-  venues_search = Venue.query.filter(Venue.name.ilike(f"${venues_search}$")).all()
-  for venue in venues_search:
-    list_shows = list(filter(lambda s: s.start_time > datetime.now(), venue.shows))
-    ven_shows = {
-      "id": venue.id,
-      "name": venue.name,       
-      "num_upcoming_shows": len(list_shows)
-    }
-    response["count"] = len(venues_search) # Add the number of results to the response dict
-    response["data"] = []          
-    response["data"].append(ven_shows)
-  return render_template('pages/search_venues.html', results=response, search_term=venues_search)
-
-@app.route('/venues/<int:venue_id>')
-def show_venue(venue_id):
-  # TODO: replace with real venue data from the venues table, using venue_id
-  venue = Venue.query.get(venue_id)     # Obtain the data for that venue_id
-  # Store all the past shows to a var past_shows
-  past_shows = list(filter(lambda p: p.start_time < datetime.now(), venue.show))
-  # Store all the upcoming shows to a var upcoming_shows
-  upcoming_shows = list(filter(lambda u: u.start_time >= datetime.now(), venue.show))
-
-  ven_dict = {
-        **venue.__dict__,         # Build a dictionary on the original venue varieble
-        **{                       
-            'past_shows': past_shows,
-            'upcoming_shows': upcoming_shows,
-            'past_shows_count': len(past_shows),            
-            'upcoming_shows_count': len(upcoming_shows)            
-        }}
-
-  return render_template('pages/show_venue.html', venue=ven_dict)
-
-#  Create Venue
-#  ----------------------------------------------------------------
-
-@app.route('/venues/create', methods=['GET'])
-def create_venue_form():
-  form = VenueForm()
-  return render_template('forms/new_venue.html', form=form)
-
-@app.route('/venues/create', methods=['POST'])
-def create_venue_submission():
-  # TODO: insert form data as a new Venue record in the db, instead
-  # TODO: modify data to be the data object returned from db insertion
-  form = VenueForm(request.form)
-
-  if form.validate():             
-    try:
-      new_venue = Venue(          
-        name=form.name.data,      
-        city=form.city.data,
-        state=form.state.data,
-        address=form.address.data,
-        phone=form.phone.data,
-        genres=",".join(form.genres.data),    
-        facebook_link=form.facebook_link.data,
-        image_link=form.image_link.data,
-        seeking_talent=form.seeking_talent.data,
-        seeking_description=form.seeking_description.data,
-        website_link=form.website_link.data,
-      )
-      db.session.add(new_venue)         
-      db.session.commit()
-    # on successful db insert, flash success
-      flash('Venue ' + request.form['name'] + ' was successfully listed!')
-    # TODO: on unsuccessful db insert, flash an error instead.
-    except Exception:
-      db.session.rollback()
-      flash('An error occured. Venue ' + request.form['name'] + ' could not be listed.')
-    # e.g., flash('An error occurred. Venue ' + data.name + ' could not be listed.')
-    # see: http://flask.pocoo.org/docs/1.0/patterns/flashing/
-    finally:
-      db.session.close()
-  else:
-    flash("Venue was not listed!")
-
-    # return render_template('pages/home.html')
-  return redirect(url_for('venues'))
-
-@app.route('/venues/<venue_id>', methods=['DELETE'])
-def delete_venue(venue_id):
-    # TODO: Complete this endpoint for taking a venue_id, and using
-    # SQLAlchemy ORM to delete a record. Handle cases where the session commit could fail. 
-  venue = Venue.query.get(venue_id)           # Obtain data based on id
-  if venue:
-    try:
-      venue_name = venue.name         
-      db.session.delete(venue_name)   
-      db.session.commit()             
-      flash("Selected Venue: " + venue_name + " has been deleted succesfully.")
-    except:
-      db.session.rollback()
-    finally:
-      db.session.close()
-  else:
-    return redirect(url_for('venues'))
-  
+def build_ngram_indexes():
+  # Build the in-memory name indexes once per worker
+  ngram_index.get_index(Venue)
+  ngram_index.get_index(Artist)
 
-  # BONUS CHALLENGE: Implement a button to delete a Venue on a Venue Page, have it so that
-  # clicking that button delete it from the db then redirect the user to the homepage
-  # return render_template('pages/home.html')
+#----------------------------------------------------------------------------#
+# Database pool stats.
+#----------------------------------------------------------------------------#
 
-#  Artists
-#  ----------------------------------------------------------------
-@app.route('/artists')
-def artists():
-  # TODO: replace with real data returned from querying the database
-  
-  artists = db.session.query(Artist.id, Artist.name).all()
-
-  return render_template('pages/artists.html', artists=artists)
-
-@app.route('/artists/search', methods=['POST'])
-def search_artists():
-  # TODO: implement search on artists with partial string search. Ensure it is case-insensitive.
-  # seach for "A" should return "Guns N Petals", "Matt Quevado", and "The Wild Sax Band".
-  # search for "band" should return "The Wild Sax Band".
-  response = {}
-  artist_search = request.form.get('search_term', '')
-  # Query all the artists based on the input
-  # Store these results in a variable
-  artists = Artist.query.filter(Artist.name.ilike(f"${artist_search}$")).all()                               
-  response["count"] = len(artists)      # Add the num of artists to the dict                  
-  # Init empty list in data var in dict
-  response["data"] = []
-  for artist in artists:    
-    upcoming_shows = 0          
-    for show in artist.shows:
-      if show.start_time > datetime.now():# All the upcoming shows
-        upcoming_shows += 1
-    art = {
-      "name" : artist.name,   
-      "id" : artist.id,
-      "upcoming_shows" : upcoming_shows 
-    }
-    response["data"].append(art)      
-    # Add all to the response["data"] field
-
-  return render_template('pages/search_artists.html', results=response, search_term=request.form.get('search_term', ''))
-
-@app.route('/artists/<int:artist_id>')
-def show_artist(artist_id):
-  # shows the artist page with the given artist_id
-  # TODO: replace with real artist data from the artist table, using artist_id
-  artist = Artist.query.get(artist_id)
-  # Store all the past shows to a var past_shows
-  past_shows = list(filter(lambda p: p.start_time < datetime.today(), artist.show))
-  # Store all the upcoming shows to a var upcoming_shows
-  upcoming_shows = list(filter(lambda u: u.start_time >= datetime.today(), artist.show))
-  ven_dict = {
-        **artist.__dict__,        
-        **{                       
-            'past_shows': past_shows,
-            'upcoming_shows': upcoming_shows,
-            'past_shows_count': len(past_shows),            
-            'upcoming_shows_count': len(upcoming_shows)            
-        }}
-
-  return render_template('pages/show_artist.html', artist=ven_dict)
-
-#  Update
-#  ----------------------------------------------------------------
-@app.route('/artists/<int:artist_id>/edit', methods=['GET'])
-def edit_artist(artist_id):
-  form = ArtistForm()
-  # TODO: populate form with fields from artist with ID <artist_id>
-  artist = Artist.query.get(artist_id)          # Query data based on id
-  # separate genres from ","
-  form.genres.data = artist.genres.split(",")   
-
-  return render_template('forms/edit_artist.html', form=form, artist=artist)
-
-@app.route('/artists/<int:artist_id>/edit', methods=['POST'])
-def edit_artist_submission(artist_id):
-  # TODO: take values from the form submitted, and update existing
-  # artist record with ID <artist_id> using the new attributes
-  form = ArtistForm(request.form)
-
-  if form.validate():             
-    try:
-      artist = Artist.queryget(artist_id)       
-      artist.name = form.name.data
-      artist.city = form.city.data
-      artist.state = form.state.data
-      artist.phone = form.phone.data
-      artist.genres=",".join(form.genres.data)      
-      artist.facebook_link = form.facebook_link.data
-      artist.image_link = form.image_link.data
-      artist.seeking_venue = form.seeking_venue.data
-      artist.seeking_description = form.seeking_description.data
-      artist.website_link = form.website_link.data
-      db.session.add(artist)              
-      db.session.commit()
-      flash("Artist "+artist.name+" was edited succesfully")
-    except:
-      db.session.rollback()
-    finally:
-      db.session.close()
-  else:
-    flash("Artist was not edited!")
-
-  return redirect(url_for('show_artist', artist_id=artist_id))
-
-@app.route('/venues/<int:venue_id>/edit', methods=['GET'])
-def edit_venue(venue_id):
-  form = VenueForm()
-  # TODO: populate form with values from venue with ID <venue_id>
-  venue = Venue.query.get(venue_id)                 
-  form.genres.data = venue.genres.split(",")        
-  return render_template('forms/edit_venue.html', form=form, venue=venue)
-
-@app.route('/venues/<int:venue_id>/edit', methods=['POST'])
-def edit_venue_submission(venue_id):
-  # TODO: take values from the form submitted, and update existing
-  # venue record with ID <venue_id> using the new attributes
-  form = VenueForm(request.form)
-  if form.validate():          
-    try:
-      venue = Venue.query.get(venue_id)     
-      venue.name = form.name.data
-      venue.city = form.city.data
-      venue.state = form.state.data
-      venue.phone = form.phone.data
-      venue.genres=",".join(form.genres.data)     
-      venue.facebook_link = form.facebook_link.data
-      venue.image_link = form.image_link.data
-      venue.seeking_venue = form.seeking_venue.data
-      venue.seeking_description = form.seeking_description.data
-      venue.website_link = form.website_link.data
-      db.session.add(venue)           
-      db.session.commit()
-      flash("Venue "+form.name.data+" was edited succesfully")
-    except Exception:
-      db.session.rollback()
-    finally:
-      db.session.close()
-  else:
-    flash("Venue was not edited!")
-  return redirect(url_for('show_venue', venue_id=venue_id))
+def pool_stats():
+  # Connection pool usage per bind, for debugging saturation
+  return database.pool_stats(db)
 
-#  Create Artist
-#  ----------------------------------------------------------------
+#----------------------------------------------------------------------------#
+# Controllers.
+#----------------------------------------------------------------------------#
 
-@app.route('/artists/create', methods=['GET'])
-def create_artist_form():
-  form = ArtistForm()
-  return render_template('forms/new_artist.html', form=form)
-
-@app.route('/artists/create', methods=['POST'])
-def create_artist_submission():
-  # called upon submitting the new artist listing form
-  # TODO: insert form data as a new Venue record in the db, instead
-  # TODO: modify data to be the data object returned from db insertion
-  form = ArtistForm(request.form)
-  if form.validate():           
-    try:
-      new_artist = Artist(      
-        name=form.name.data,
-        city=form.city.data,
-        state=form.state.data,
-        phone=form.phone.data,
-        genres=",".join(form.genres.data),
-        image_link= form.image_link.data,
-        facebook_link=form.facebook_link.data,
-        website_link=form.website_link.data,
-        seeking_venue=form.seeking_venue.data,
-        seeking_description=form.seeking_description.data,
-      )
-      db.session.add(new_artist)    
-      db.session.commit()
-    # on successful db insert, flash success
-      flash('Artist ' + request.form['name'] + ' was successfully listed!')
-    except Exception:
-    # TODO: on unsuccessful db insert, flash an error instead.    
-      db.session.rollback()
-      flash('Artist' + request.form['name'] + ' was added unsuccessfully !')
-    # e.g., flash('An error occurred. Artist ' + data.name + ' could not be listed.')
-    finally:
-      db.session.close()
-  else:
-    flash("Artist was not added!")
+# Venues, artists and shows are in views/ (one blueprint each), the JSON
+# API in api.py.
 
+def index():
   return render_template('pages/home.html')
 
-
-#  Shows
+#  Export
 #  ----------------------------------------------------------------
 
-@app.route('/shows')
-def shows():
-  # displays list of shows at /shows
-  # TODO: replace with real venues data.
-  data = []       # data list for the final results
-  shows = db.session.query(Shows
-          ).join(Artist, Artist.id == Shows.artist_id
-          ).join(Venue, Venue.id == Shows.venue_id
-          ).all()
-  
-  for show in shows: 
-    # Loop through the query, assign to a dictionary
-    show_dict = {
-      "venue_id": show.venue_id,
-      "artist_id": show.artist_id,
-      "venue_name": show.venue.name,      
-      "artist_name": show.artist.name, 
-      "artist_image_link": show.artist.image_link,
-      # Change-type the start_time variable to string
-      "start_time": show.start_time.strftime('%Y-%m-%d %H:%M:%S')
-    }
-    data.append(show_dict)      
-
-  return render_template('pages/shows.html', shows=data)
-
-@app.route('/shows/create')
-def create_shows():
-  # renders form. do not touch.
-  form = ShowForm()
-  return render_template('forms/new_show.html', form=form)
-
-@app.route('/shows/create', methods=['POST'])
-def create_show_submission():
-  # called to create new shows in the db, upon submitting new show listing form
-  # TODO: insert form data as a new Show record in the db, instead
-  form = ShowForm(request.form)
-  if form.validate():
-    try:
-      new_show = Shows(                       
-        artist_id=form.artist_id.data,
-        venue_id=form.venue_id.data,
-        start_time=form.start_time.data,
-      )
-      db.session.add(new_show)                
-      db.session.commit()
-
-    # on successful db insert, flash success
-      flash('Show was successfully listed!')
-    # TODO: on unsuccessful db insert, flash an error instead.
-    except Exception:
-      db.session.rollback()
-      flash("Show was unsuccessfully added!")
-
-    # e.g., flash('An error occurred. Show could not be listed.')
-    # see: http://flask.pocoo.org/docs/1.0/patterns/flashing/
-    finally:
-      db.session.commit()
-  else:
-    flash("Show was not added")
-    
-  return render_template('pages/home.html')
+@read_only
+def export(kind, format):
+  # Streams the whole table (or rows changed since ?since=<ISO time>),
+  # gzip-encoded on the fly when the client accepts it
+  try:
+    since = exporter.parse_since(request.args.get('since'))
+  except ValueError:
+    abort(400)
+  gzip = 'gzip' in request.accept_encodings
+  response = Response(stream_with_context(exporter.export(kind, format, since, gzip)),
+                      mimetype=exporter.FORMATS[format])
+  if gzip:
+    response.headers['Content-Encoding'] = 'gzip'
+  response.headers['Vary'] = 'Accept-Encoding'
+  response.headers['Content-Disposition'] = f'attachment; filename={kind}.{format}'
+  return response
 
-@app.errorhandler(404)
 def not_found_error(error):
     return render_template('errors/404.html'), 404
 
-@app.errorhandler(500)
 def server_error(error):
     return render_template('errors/500.html'), 500
 
+#----------------------------------------------------------------------------#
+# Commands.
+#----------------------------------------------------------------------------#
 
-if not app.debug:
-    file_handler = FileHandler('error.log')
-    file_handler.setFormatter(
-        Formatter('%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]')
-    )
-    app.logger.setLevel(logging.INFO)
-    file_handler.setLevel(logging.INFO)
-    app.logger.addHandler(file_handler)
-    app.logger.info('errors')
+@click.command('rollover-show-counters')
+@with_appcontext
+def rollover_show_counters():
+  # Run periodically (e.g. from cron): shows that have started move from the
+  # upcoming to the past counters of their venue and artist.
+  moved = counters.rollover()
+  bump('Venue', 'Artist')
+  db.session.commit()
+  cache.invalidate('venues')
+  click.echo(f"{moved} shows rolled over to past")
 
 #----------------------------------------------------------------------------#
 # Launch.
@@ -468,11 +228,11 @@ if not app.debug:
 
 # Default port:
 if __name__ == '__main__':
-    app.run()
+    create_app().run()
 
 # Or specify port manually:
 '''
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
-    app.run(host='0.0.0.0', port=port)
+    create_app().run(host='0.0.0.0', port=port)
 '''
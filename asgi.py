@@ -0,0 +1,286 @@
+import io
+import sys
+from urllib.parse import parse_qs
+from flask import abort, current_app, g, render_template, request
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from werkzeug.exceptions import HTTPException
+from asgiref.wsgi import WsgiToAsgi
+from app import create_app
+from views import bool_arg, owner_page, search_results, time_range
+from views.venues import group_areas
+from views.shows import SHOW_TILE_FIELDS
+from database import QUEUE_POOL_OPTIONS, use_replica
+from models import Venue, Artist, Shows
+from queries import (KeysetPage, artists_query, shows_page, show_counts_query,
+                     show_section_query, shows_query, venue_areas_query)
+import genres
+import search
+
+# Optional ASGI entry point:
+#
+#   uvicorn asgi:application --workers 4
+#
+# The read views (venue/artist lists and pages, shows, both searches) run as
+# coroutines on SQLAlchemy's async engine (asyncpg / aiosqlite), so a worker
+# keeps serving while their queries wait on the database. They build the
+# same queries as the WSGI views (queries.py, search.py) and render the same
+# templates, inside a Flask request context, so before/after_request
+# handlers (metrics, query budgets, replica pinning, the session) still run.
+# Every other route -- forms, writes, the JSON API, exports, calendar
+# feeds, streamed /shows -- is handed to the WSGI app through asgiref.
+#
+# Not on the async path: the page cache and conditional GETs (cache.py,
+# conditional.py); run the WSGI app when those matter more.
+#
+# ASYNC_DATABASE_URI overrides the URI derived from SQLALCHEMY_DATABASE_URI.
+
+ASYNC_DRIVERS = {'postgresql': 'postgresql+asyncpg', 'sqlite': 'sqlite+aiosqlite'}
+
+
+def async_uri(uri):
+    url = make_url(uri)
+    driver = ASYNC_DRIVERS.get(url.get_backend_name())
+    if driver is None:
+        raise RuntimeError(f"no async driver for {url.drivername}; set ASYNC_DATABASE_URI")
+    return url.set(drivername=driver)
+
+
+def build_environ(scope, body):
+    # WSGI environ of an ASGI http scope (as asgiref's WsgiToAsgi does)
+    root_path = scope.get('root_path', '')
+    path = scope['path']
+    if path.startswith(root_path):
+        path = path[len(root_path):]
+    server = scope.get('server') or ('localhost', 80)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': root_path.encode().decode('latin1'),
+        'PATH_INFO': path.encode().decode('latin1'),
+        'QUERY_STRING': scope['query_string'].decode('ascii'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': f"HTTP/{scope['http_version']}",
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.input_terminated': True,      # the whole body is buffered
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    if scope.get('client'):
+        environ['REMOTE_ADDR'] = scope['client'][0]
+    for name, value in scope.get('headers', []):
+        name = name.decode('latin1').upper().replace('-', '_')
+        if name not in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+            name = f'HTTP_{name}'
+        value = value.decode('latin1')
+        environ[name] = f'{environ[name]},{value}' if name in environ else value
+    return environ
+
+
+#  Views
+#  ----------------------------------------------------------------
+
+async def venues(session):
+    genre = request.args.get('genre')
+    query = venue_areas_query(*([genres.with_genre(Venue, genre)] if genre else []))
+    rows = (await session.execute(query.statement)).all()
+    return render_template('pages/venues.html', areas=group_areas(rows), genre=genre)
+
+
+async def artists(session):
+    genre = request.args.get('genre')
+    query = artists_query(*([genres.with_genre(Artist, genre)] if genre else []))
+    rows = (await session.execute(query.statement)).all()
+    return render_template('pages/artists.html', artists=rows, genre=genre)
+
+
+async def search_venues(session):
+    search_term = request.form.get('search_term', '')
+    matches = await search_rows(session, Venue, search_term)
+    return render_template('pages/search_venues.html', results=search_results(matches),
+                           search_term=search_term)
+
+
+async def search_artists(session):
+    search_term = request.form.get('search_term', '')
+    matches = await search_rows(session, Artist, search_term)
+    return render_template('pages/search_artists.html', results=search_results(matches),
+                           search_term=search_term)
+
+
+async def search_rows(session, model, term):
+    limit = current_app.config.get('SEARCH_RESULTS_LIMIT', search.DEFAULT_LIMIT)
+    statement, params = search.search_statement(model, term, limit)
+    return (await session.execute(statement, params)).fetchall()
+
+
+async def show_venue(session, venue_id):
+    venue = await session.get(Venue, venue_id)
+    if venue is None:
+        abort(404)
+    shows = shows_query(['artist_id', 'artist_name', 'artist_image_link']
+                        ).filter(Shows.venue_id == venue_id)
+    context = await owner_shows(session, venue, Shows.venue_id, shows)
+    return render_template('pages/show_venue.html', venue=context)
+
+
+async def show_artist(session, artist_id):
+    artist = await session.get(Artist, artist_id)
+    if artist is None:
+        abort(404)
+    shows = shows_query(['venue_id', 'venue_name', 'venue_image_link']
+                        ).filter(Shows.artist_id == artist_id)
+    context = await owner_shows(session, artist, Shows.artist_id, shows)
+    return render_template('pages/show_artist.html', artist=context)
+
+
+async def owner_shows(session, owner, owner_column, shows):
+    upcoming_count, past_count = (await session.execute(
+        show_counts_query(owner_column, owner.id).statement)).one()
+    sections = []
+    for upcoming, cursor in ((False, 'past_after'), (True, 'upcoming_after')):
+        query, page_size = show_section_query(shows, upcoming, after=request.args.get(cursor))
+        sections.append(KeysetPage((await session.execute(query.statement)).all(), page_size))
+    return owner_page(owner, *sections, upcoming_count, past_count)
+
+
+async def shows(session):
+    config = current_app.config
+    page_size = min(request.args.get('limit', config['SHOWS_PAGE_SIZE'], type=int),
+                    config['SHOWS_PAGE_SIZE_MAX'])
+    start, end = time_range()
+    if page_size < 1 or (start and end and end < start):
+        abort(400)
+    query = shows_page(SHOW_TILE_FIELDS, request.args.get('after'), page_size, start, end)
+    rows = (await session.execute(query.statement)).all()
+    return render_template('pages/shows.html', shows=KeysetPage(rows, page_size))
+
+
+VIEWS = {
+    'venues.index': venues,
+    'venues.search_venues': search_venues,
+    'venues.show_venue': show_venue,
+    'artists.index': artists,
+    'artists.search_artists': search_artists,
+    'artists.show_artist': show_artist,
+    'shows.index': shows,
+}
+
+
+#  Application
+#  ----------------------------------------------------------------
+
+class AsyncApp:
+
+    def __init__(self, flask_app):
+        self.flask_app = flask_app
+        self.wsgi = WsgiToAsgi(flask_app)
+        self.sessions = {}
+
+    def session(self, bind=None):
+        # One async engine per bind (primary, 'replica0', ...), made on first use
+        if bind not in self.sessions:
+            config = self.flask_app.config
+            if bind is None:
+                uri = config.get('ASYNC_DATABASE_URI') or async_uri(config['SQLALCHEMY_DATABASE_URI'])
+            else:
+                uri = async_uri(config['SQLALCHEMY_BINDS'][bind])
+            options = dict(config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+            if make_url(uri).get_backend_name() == 'sqlite':
+                for option in QUEUE_POOL_OPTIONS:
+                    options.pop(option, None)
+            engine = create_async_engine(uri, **options)
+            self.sessions[bind] = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+        return self.sessions[bind]()
+
+    async def dispose(self):
+        for factory in self.sessions.values():
+            await factory.kw['bind'].dispose()
+        self.sessions.clear()
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self.lifespan(receive, send)
+        view = None
+        if scope['type'] == 'http':
+            view = self.match(scope)
+        if view is None:
+            return await self.wsgi(scope, receive, send)
+
+        body = bytearray()
+        while True:
+            message = await receive()
+            body += message.get('body', b'')
+            if not message.get('more_body'):
+                break
+        environ = build_environ(scope, bytes(body))
+        response = await self.dispatch(view, environ)
+        try:
+            headers = response.get_wsgi_headers(environ)
+            await send({
+                'type': 'http.response.start',
+                'status': response.status_code,
+                'headers': [(name.lower().encode('latin1'), value.encode('latin1'))
+                            for name, value in headers.items()],
+            })
+            for chunk in response.get_app_iter(environ):
+                await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+            await send({'type': 'http.response.body', 'body': b''})
+        finally:
+            response.close()
+
+    def match(self, scope):
+        root_path = scope.get('root_path', '')
+        path = scope['path'][len(root_path):] if scope['path'].startswith(root_path) else scope['path']
+        adapter = self.flask_app.url_map.bind('localhost', script_name=root_path or None)
+        try:
+            endpoint, _ = adapter.match(path, scope['method'])
+        except HTTPException:        # 404, 405 and redirects are WSGI's business
+            return None
+        return self.view(endpoint, scope['query_string'].decode('ascii'))
+
+    def view(self, endpoint, query_string):
+        # The coroutine serving `endpoint`, or None to serve it with WSGI
+        config = self.flask_app.config
+        if endpoint in ('venues.search_venues', 'artists.search_artists') and config.get('NGRAM_SEARCH_INDEX'):
+            return None
+        if endpoint == 'shows.index':
+            stream = parse_qs(query_string).get('stream')
+            if bool_arg(stream[0]) if stream else config['SHOWS_STREAMING']:
+                return None
+        return VIEWS.get(endpoint)
+
+    async def dispatch(self, view, environ):
+        # Flask's full_dispatch_request, with an awaited view
+        flask_app = self.flask_app
+        with flask_app.request_context(environ):
+            try:
+                try:
+                    rv = flask_app.preprocess_request()
+                    if rv is None:
+                        use_replica()
+                        async with self.session(g.get('replica_bind')) as session:
+                            rv = await view(session, **request.view_args)
+                except Exception as e:
+                    rv = flask_app.handle_user_exception(e)
+                return flask_app.finalize_request(rv)
+            except Exception as e:
+                return flask_app.handle_exception(e)
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await self.dispose()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+
+application = AsyncApp(create_app())
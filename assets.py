@@ -0,0 +1,234 @@
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import posixpath
+import re
+import shutil
+import threading
+import click
+from flask import abort, current_app, request, url_for
+from flask.cli import with_appcontext
+from werkzeug.security import safe_join
+
+try:
+    import brotli
+except ImportError:     # optional: without it only .gz variants are written
+    brotli = None
+
+try:
+    import rjsmin
+except ImportError:     # optional: without it JavaScript is only concatenated
+    rjsmin = None
+
+# Static asset pipeline.
+#
+# `flask assets build` bundles the layout's CSS and JS (BUNDLES), minifies
+# them, and copies every other file under static/ with its content hash in
+# the name. The output goes to static/dist/. Each file also gets
+# precompressed .gz (and .br, with brotli installed) variants, and
+# static/dist/manifest.json maps the original names to the hashed ones.
+#
+# Templates link assets through asset_urls('main.css') and
+# static_url('img/x.jpg'). With ASSETS_BUNDLES on and a manifest built,
+# these give the hashed URLs. Otherwise they give the source files, so
+# development works without a build.
+#
+# /static/dist/ responses are immutable and cached for a year: a changed
+# file gets a new name. Each worker keeps the bytes of the files it has
+# served, per encoding, so a request reads no file and compresses nothing.
+
+DIST = 'dist'
+MANIFEST = 'manifest.json'
+IMMUTABLE = 'public, max-age=31536000, immutable'
+
+# Bundle name -> source files under static/, in load order
+BUNDLES = {
+    'main.css': ['css/bootstrap.min.css', 'css/layout.main.css', 'css/main.css',
+                 'css/main.responsive.css', 'css/main.quickfix.css'],
+    # Must run before the body renders
+    'head.js': ['js/libs/modernizr-2.8.2.min.js'],
+    # Loaded with defer, at the end of the body
+    'main.js': ['js/libs/jquery-1.11.1.min.js', 'js/libs/bootstrap-3.1.1.min.js',
+                'js/libs/moment.min.js', 'js/plugins.js', 'js/script.js'],
+}
+
+# Encodings to serve, best first: (Accept-Encoding token, file suffix)
+ENCODINGS = [('br', '.br'), ('gzip', '.gz')]
+
+
+#  Build
+#  ----------------------------------------------------------------
+
+def fingerprint(name, content):
+    root, ext = posixpath.splitext(name)
+    return f"{root}.{hashlib.sha256(content).hexdigest()[:12]}{ext}"
+
+
+def minify_css(css):
+    css = re.sub(r'/\*.*?\*/', '', css, flags=re.S)
+    css = re.sub(r'\s+', ' ', css)
+    css = re.sub(r'\s*([{}:;,>])\s*', r'\1', css)
+    return css.replace(';}', '}').strip()
+
+
+def minify_js(js):
+    return rjsmin.jsmin(js) if rjsmin is not None else js
+
+
+def rewrite_urls(css, source, files):
+    # url(...) references of a CSS file, pointed at the fingerprinted files
+    directory = posixpath.dirname(source)
+
+    def replace(match):
+        url = match.group(2)
+        if re.match(r'(?:[a-z]+:|/|#)', url):
+            return match.group(0)
+        path, suffix = re.match(r'([^?#]*)(.*)', url).groups()
+        target = posixpath.normpath(posixpath.join(directory, path))
+        if target not in files:
+            return match.group(0)
+        return f'url("/static/{files[target]}{suffix}")'
+
+    return re.sub(r'''url\(\s*(['"]?)([^'")]+)\1\s*\)''', replace, css)
+
+
+def write(static, name, content):
+    path = os.path.join(static, name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(content)
+    with open(path + '.gz', 'wb') as f:
+        f.write(gzip.compress(content, 9, mtime=0))
+    if brotli is not None:
+        with open(path + '.br', 'wb') as f:
+            f.write(brotli.compress(content))
+
+
+def build(static):
+    dist = os.path.join(static, DIST)
+    shutil.rmtree(dist, ignore_errors=True)
+    files = {}
+    for directory, subdirectories, names in os.walk(static):
+        subdirectories[:] = [name for name in subdirectories if name != DIST]
+        for name in sorted(names):
+            source = os.path.relpath(os.path.join(directory, name), static).replace(os.sep, '/')
+            if source.endswith('.map'):
+                continue
+            with open(os.path.join(static, source), 'rb') as f:
+                content = f.read()
+            files[source] = posixpath.join(DIST, fingerprint(source, content))
+            write(static, files[source], content)
+
+    bundles = {}
+    for bundle, sources in BUNDLES.items():
+        parts = []
+        for source in sources:
+            with open(os.path.join(static, source), encoding='utf-8') as f:
+                text = f.read()
+            if bundle.endswith('.css'):
+                parts.append(minify_css(rewrite_urls(text, source, files)))
+            else:
+                parts.append(minify_js(text).rstrip().rstrip(';') + ';')
+        content = '\n'.join(parts).encode()
+        bundles[bundle] = posixpath.join(DIST, fingerprint(bundle, content))
+        write(static, bundles[bundle], content)
+
+    manifest = {'bundles': bundles, 'files': files}
+    with open(os.path.join(dist, MANIFEST), 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    return manifest
+
+
+@click.group('assets')
+def assets_command():
+    """Build the fingerprinted static bundles."""
+
+
+@assets_command.command('build')
+@with_appcontext
+def build_command():
+    """Bundle, minify, fingerprint and precompress static/ into static/dist/."""
+    manifest = build(current_app.static_folder)
+    dist = os.path.join(current_app.static_folder, DIST)
+    for bundle, name in manifest['bundles'].items():
+        size = os.path.getsize(os.path.join(current_app.static_folder, name))
+        gzipped = os.path.getsize(os.path.join(current_app.static_folder, name + '.gz'))
+        click.echo(f"{bundle:<10} {name}  {size:>8,} bytes, {gzipped:>7,} gzipped")
+    click.echo(f"{len(manifest['files'])} files fingerprinted into {dist}"
+               + ('' if brotli else ' (install brotli for .br variants)'))
+
+
+#  Templates
+#  ----------------------------------------------------------------
+
+def manifest():
+    return current_app.extensions['assets']
+
+
+def asset_urls(bundle):
+    # URLs to load `bundle`: the built bundle, or its source files
+    built = manifest()['bundles'].get(bundle)
+    if built is not None:
+        return [url_for('static', filename=built)]
+    return [url_for('static', filename=source) for source in BUNDLES[bundle]]
+
+
+def static_url(filename):
+    # url_for('static', ...), fingerprinted when the file was built
+    return url_for('static', filename=manifest()['files'].get(filename, filename))
+
+
+#  Serving
+#  ----------------------------------------------------------------
+
+# (filename, encoding) -> bytes, per worker
+served = {}
+served_lock = threading.Lock()
+
+
+def content(filename, suffix):
+    key = (filename, suffix)
+    data = served.get(key)
+    if data is None:
+        path = safe_join(current_app.static_folder, DIST, filename + suffix)
+        if path is None or not os.path.isfile(path):
+            return None
+        with open(path, 'rb') as f:
+            data = f.read()
+        with served_lock:
+            served[key] = data
+    return data
+
+
+def send_asset(filename):
+    # Files under static/dist/: precompressed variant if accepted, immutable
+    data, encoding = None, None
+    for token, suffix in ENCODINGS:
+        if token in request.accept_encodings:
+            data, encoding = content(filename, suffix), token
+            if data is not None:
+                break
+    if data is None:
+        data, encoding = content(filename, ''), None
+        if data is None:
+            abort(404)
+    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    response = current_app.response_class(data, mimetype=mimetype)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.headers['Vary'] = 'Accept-Encoding'
+    response.headers['Cache-Control'] = IMMUTABLE
+    response.set_etag(f"{filename}-{encoding or 'identity'}")
+    return response.make_conditional(request)
+
+
+def init_app(app):
+    app.extensions['assets'] = {'bundles': {}, 'files': {}}
+    path = os.path.join(app.static_folder, DIST, MANIFEST)
+    if app.config.get('ASSETS_BUNDLES') and os.path.exists(path):
+        with open(path) as f:
+            app.extensions['assets'] = json.load(f)
+    app.add_url_rule(f'{app.static_url_path}/{DIST}/<path:filename>', 'assets', send_asset)
+    app.jinja_env.globals.update(asset_urls=asset_urls, static_url=static_url)
@@ -0,0 +1,263 @@
+import threading
+from array import array
+from bisect import bisect_left
+from datetime import datetime, timedelta
+from flask import Blueprint, abort, current_app, request
+from sqlalchemy import event, func, select
+from sqlalchemy.orm import object_session
+from models import db, Venue, Artist
+from conditional import index_stamp, stamp
+from database import RoutingSession, read_only
+from json_responses import json_error, json_response
+from query_budgets import query_budget
+from ngram_index import normalize
+
+# Typeahead for the artist/venue pickers of the show form:
+#   /autocomplete/artists?q=wild&limit=8
+#   /autocomplete/venues?q=the mus
+#
+# Each worker holds a prefix index per model: the normalized names, and the
+# suffixes of the names starting at each later word ("sax band" of "the wild
+# sax band"), in two sorted lists. A lookup bisects to the prefix and reads
+# the next `limit` entries: whole-name matches first, then word matches.
+#
+# The worker that writes a venue or artist through the ORM updates its index
+# in place after the commit (record()). The model's Version stamp
+# (conditional.py, bumped by every write) catches the other writes: when it
+# has moved past the index's, the rows updated since the last refresh are
+# applied, and only a row count that still differs (a row deleted
+# elsewhere) rebuilds the whole index. The stamp is re-read at most every
+# INDEX_STAMP_MAX_AGE seconds; in between a lookup runs no query. Stamp and
+# rows are read on the primary, even for requests routed to a replica: a
+# lagging replica must not pin an old index.
+
+DEFAULT_LIMIT = 10
+
+# Rows updated this long before the previous refresh are read again: covers
+# transactions that committed after it with an earlier updated_at
+REFRESH_OVERLAP = timedelta(minutes=1)
+
+
+def positions(keys, ids, text, owner_id):
+    # Where (text, owner_id) is, or would go, in the sorted keys/ids pair
+    position = bisect_left(keys, text)
+    while position < len(keys) and keys[position] == text and ids[position] < owner_id:
+        position += 1
+    return position
+
+
+class PrefixIndex:
+
+    def __init__(self, rows=()):
+        # rows: (id, name, city, state)
+        self.labels = {}
+        self.lock = threading.RLock()
+        names, words = [], []
+        for owner_id, name, city, state in rows:
+            self.labels[owner_id] = (name, city, state)
+            text, suffixes = self.keys(name)
+            names.append((text, owner_id))
+            words.extend((suffix, owner_id) for suffix in suffixes)
+        names.sort()
+        words.sort()
+        self.names = [text for text, _ in names]
+        self.name_ids = array('i', (owner_id for _, owner_id in names))
+        self.words = [text for text, _ in words]
+        self.word_ids = array('i', (owner_id for _, owner_id in words))
+
+    def keys(self, name):
+        # The normalized name and its suffixes starting at each later word
+        text = normalize(name)
+        suffixes = []
+        position = text.find(' ')
+        while position >= 0:
+            suffixes.append(text[position + 1:])
+            position = text.find(' ', position + 1)
+        return text, suffixes
+
+    def add(self, owner_id, name, city, state):
+        with self.lock:
+            if self.labels.get(owner_id) == (name, city, state):
+                return
+            self.remove(owner_id)
+            self.labels[owner_id] = (name, city, state)
+            text, suffixes = self.keys(name)
+            for keys, ids, key in ([(self.names, self.name_ids, text)]
+                                   + [(self.words, self.word_ids, suffix) for suffix in suffixes]):
+                position = positions(keys, ids, key, owner_id)
+                keys.insert(position, key)
+                ids.insert(position, owner_id)
+
+    def remove(self, owner_id):
+        with self.lock:
+            label = self.labels.pop(owner_id, None)
+            if label is None:
+                return
+            text, suffixes = self.keys(label[0])
+            for keys, ids, key in ([(self.names, self.name_ids, text)]
+                                   + [(self.words, self.word_ids, suffix) for suffix in suffixes]):
+                position = positions(keys, ids, key, owner_id)
+                if position < len(keys) and keys[position] == key and ids[position] == owner_id:
+                    del keys[position]
+                    del ids[position]
+
+    def complete(self, prefix, limit):
+        # (id, name, city, state) of the first `limit` matches
+        prefix = normalize(prefix)
+        found = []
+        with self.lock:
+            for keys, ids in ((self.names, self.name_ids), (self.words, self.word_ids)):
+                position = bisect_left(keys, prefix)
+                while (len(found) < limit and position < len(keys)
+                       and keys[position].startswith(prefix)):
+                    if ids[position] not in found:
+                        found.append(ids[position])
+                    position += 1
+            return [(owner_id, *self.labels[owner_id]) for owner_id in found]
+
+    def __len__(self):
+        return len(self.labels)
+
+
+#  Per-model indexes
+#  ----------------------------------------------------------------
+
+indexes = {}        # (database, table) -> (version, PrefixIndex, refreshed at)
+build_lock = threading.Lock()
+
+
+def index_key(model):
+    return str(db.engine.url), model.__tablename__
+
+
+def labels(model):
+    return select(model.id, model.name, model.city, model.state)
+
+
+def build(model, version):
+    started = datetime.utcnow()
+    with db.engine.connect() as connection:
+        rows = connection.execution_options(stream_results=True).execute(labels(model))
+        index = PrefixIndex(rows)
+    current_app.logger.info('prefix index for %s built at version %s: %s names',
+                            model.__tablename__, version, len(index))
+    return version, index, started
+
+
+def refresh(model, built, version):
+    # Apply the rows written since the last refresh; rebuild when rows are
+    # missing from the table (deleted by another worker)
+    _, index, refreshed_at = built
+    started = datetime.utcnow()
+    with db.engine.connect() as connection:
+        for row in connection.execute(labels(model).where(
+                model.updated_at >= refreshed_at - REFRESH_OVERLAP)):
+            index.add(*row)
+        count = connection.execute(select(func.count()).select_from(model)).scalar()
+    if count != len(index):
+        return build(model, version)
+    return version, index, started
+
+
+def get_index(model):
+    key = index_key(model)
+    version = index_stamp(model.__tablename__)
+    built = indexes.get(key)
+    if built is None or built[0] < version:
+        with build_lock:
+            built = indexes.get(key)
+            if built is None:
+                built = indexes[key] = build(model, version)
+            elif built[0] < version:
+                built = indexes[key] = refresh(model, built, version)
+    return built[1]
+
+
+def complete(model, prefix, limit=DEFAULT_LIMIT):
+    return [dict(zip(('id', 'name', 'city', 'state'), row))
+            for row in get_index(model).complete(prefix, limit)]
+
+
+def record(model, changes):
+    # Apply one committed transaction's writes to `model` ({id: (name, city,
+    # state), or None for deleted}). The transaction bumped the stamp once,
+    # so when it is now just one past the index's, no other write happened
+    # in between and the updated index is current; otherwise the next
+    # lookup refreshes it.
+    key = index_key(model)
+    built = indexes.get(key)
+    if built is None:
+        return
+    version, index, refreshed_at = built
+    for owner_id, label in changes.items():
+        if label is None:
+            index.remove(owner_id)
+        else:
+            index.add(owner_id, *label)
+    with build_lock:
+        if indexes.get(key) is built and stamp(model.__tablename__) == version + 1:
+            indexes[key] = (version + 1, index, refreshed_at)
+
+
+def pending(target):
+    # The transaction's writes, per model, applied once it commits
+    changes = object_session(target).info.setdefault('autocomplete', {})
+    return changes.setdefault(type(target), {})
+
+
+def written(mapper, connection, target):
+    pending(target)[target.id] = (target.name, target.city, target.state)
+
+
+def deleted(mapper, connection, target):
+    pending(target)[target.id] = None
+
+
+for model in (Venue, Artist):
+    event.listen(model, 'after_insert', written)
+    event.listen(model, 'after_update', written)
+    event.listen(model, 'after_delete', deleted)
+
+
+@event.listens_for(RoutingSession, 'after_commit')
+def apply_writes(session):
+    for model, changes in session.info.pop('autocomplete', {}).items():
+        record(model, changes)
+
+
+@event.listens_for(RoutingSession, 'after_rollback')
+def discard_writes(session):
+    session.info.pop('autocomplete', None)
+
+
+#  Endpoints
+#  ----------------------------------------------------------------
+
+autocomplete = Blueprint('autocomplete', __name__, url_prefix='/autocomplete')
+for code in (400, 404, 405, 500):
+    autocomplete.register_error_handler(code, json_error)
+
+
+def respond(model):
+    prefix = request.args.get('q', '')
+    limit = request.args.get('limit', DEFAULT_LIMIT, type=int)
+    if not 1 <= limit <= current_app.config['AUTOCOMPLETE_LIMIT_MAX']:
+        abort(400, 'limit out of range')
+    data = complete(model, prefix, limit) if prefix.strip() else []
+    response = json_response({"data": data})
+    response.headers['Cache-Control'] = 'private, max-age=10'
+    return response
+
+
+@autocomplete.route('/artists')
+@read_only
+@query_budget(2)
+def artists():
+    return respond(Artist)
+
+
+@autocomplete.route('/venues')
+@read_only
+@query_budget(2)
+def venues():
+    return respond(Venue)
@@ -0,0 +1,140 @@
+# Concurrent throughput of the read views, WSGI (app.py, one thread per
+# concurrent client) against ASGI (asgi.py, one event loop).
+#
+#   python benchmarks/bench_async.py                          # seeded SQLite
+#   python benchmarks/bench_async.py --concurrency 1,16,64
+#   python benchmarks/bench_async.py --database-url postgresql://...   # migrated, seeded
+#
+# Both modes are driven in-process, without an HTTP server, so the numbers
+# compare the apps rather than servers. SQLite reads come from the OS cache;
+# the async engine pays off when queries wait on a database server, so
+# benchmark against PostgreSQL (asyncpg) for numbers that mean something.
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from bench_routes import DEFAULT_DATA_DIR, app, percentile, prepare
+
+ROUTES = ['/venues', '/artists', '/shows', '/venues/{venue}', '/artists/{artist}']
+SEARCHES = [('/venues/search', b'search_term=blue'), ('/artists/search', b'search_term=band')]
+
+
+def requests_for(ids):
+    # (method, path, body) round robin over the async views
+    paths = [('GET', path.format(**ids), b'') for path in ROUTES]
+    return paths + [('POST', path, body) for path, body in SEARCHES]
+
+
+def run_wsgi(requests, total, concurrency):
+    local = threading.local()
+
+    def one(number):
+        if not hasattr(local, 'client'):
+            local.client = app.test_client()
+        method, path, body = requests[number % len(requests)]
+        started = time.perf_counter()
+        response = local.client.open(path, method=method, data=body,
+                                     content_type='application/x-www-form-urlencoded')
+        response.get_data()
+        if response.status_code != 200:
+            raise RuntimeError(f"{method} {path} returned {response.status_code}")
+        return time.perf_counter() - started
+
+    with ThreadPoolExecutor(concurrency) as pool:
+        list(pool.map(one, range(concurrency)))            # warm up
+        started = time.perf_counter()
+        latencies = list(pool.map(one, range(total)))
+    return time.perf_counter() - started, latencies
+
+
+async def asgi_request(application, method, path, body):
+    messages = [{'type': 'http.request', 'body': body}]
+    status = []
+
+    async def receive():
+        return messages.pop() if messages else {'type': 'http.disconnect'}
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            status.append(message['status'])
+
+    path, _, query = path.partition('?')
+    await application({
+        'type': 'http', 'http_version': '1.1', 'method': method, 'scheme': 'http',
+        'path': path, 'root_path': '', 'query_string': query.encode(),
+        'server': ('localhost', 80), 'client': ('127.0.0.1', 0),
+        'headers': [(b'host', b'localhost'),
+                    (b'content-type', b'application/x-www-form-urlencoded'),
+                    (b'content-length', str(len(body)).encode())],
+    }, receive, send)
+    if status[0] != 200:
+        raise RuntimeError(f"{method} {path} returned {status[0]}")
+
+
+def run_asgi(requests, total, concurrency):
+    from asgi import AsyncApp
+    application = AsyncApp(app)
+
+    async def one(number):
+        method, path, body = requests[number % len(requests)]
+        started = time.perf_counter()
+        await asgi_request(application, method, path, body)
+        return time.perf_counter() - started
+
+    async def clients(count):
+        # `concurrency` clients, each sending its share of requests in turn
+        latencies = []
+
+        async def client(first):
+            for number in range(first, count, concurrency):
+                latencies.append(await one(number))
+        await asyncio.gather(*(client(first) for first in range(concurrency)))
+        return latencies
+
+    async def main():
+        await clients(concurrency)                          # warm up
+        started = time.perf_counter()
+        latencies = await clients(total)
+        elapsed = time.perf_counter() - started
+        await application.dispose()
+        return elapsed, latencies
+
+    return asyncio.run(main())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--size', type=int, default=2000, help='venues to seed (default: 2000)')
+    parser.add_argument('--requests', type=int, default=500, help='requests per run')
+    parser.add_argument('--concurrency', default='1,8,32',
+                        help='comma-separated client counts (default: 1,8,32)')
+    parser.add_argument('--database-url', help='run against this (migrated, seeded) database')
+    parser.add_argument('--data-dir', default=DEFAULT_DATA_DIR)
+    args = parser.parse_args()
+
+    if args.database_url:
+        app.config['SQLALCHEMY_DATABASE_URI'] = args.database_url
+        ids = {'venue': 1, 'artist': 1}
+    else:
+        os.makedirs(args.data_dir, exist_ok=True)
+        ids = prepare(args.size, args.data_dir, rebuild=False)
+    requests = requests_for(ids)
+
+    print(f"{'mode':<5} {'clients':>7} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9}")
+    for concurrency in [int(count) for count in args.concurrency.split(',')]:
+        for mode, run in (('wsgi', run_wsgi), ('asgi', run_asgi)):
+            elapsed, latencies = run(requests, args.requests, concurrency)
+            print(f"{mode:<5} {concurrency:>7} {len(latencies) / elapsed:9.1f} "
+                  f"{statistics.median(latencies) * 1000:9.2f} "
+                  f"{percentile(latencies, 0.95) * 1000:9.2f}")
+        sys.stdout.flush()
+
+
+if __name__ == '__main__':
+    main()
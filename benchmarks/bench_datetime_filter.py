@@ -0,0 +1,65 @@
+# Micro-benchmark for the `datetime` template filter.
+#
+#   python benchmarks/bench_datetime_filter.py
+#
+# "before" is the original filter (string parsed with dateutil, pattern string
+# handed to babel on every call); "after" is app.format_datetime on native
+# datetimes, with a cold and a warm LRU cache.
+
+import os
+import sys
+import timeit
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import babel.dates
+import dateutil.parser
+from app import format_datetime
+
+CALLS = 20000
+
+
+def legacy_format_datetime(value, format='medium'):
+    date = dateutil.parser.parse(value)
+    if format == 'full':
+        format = "EEEE MMMM, d, y 'at' h:mma"
+    elif format == 'medium':
+        format = "EE MM, dd, y h:mma"
+    return babel.dates.format_datetime(date, format, locale='en')
+
+
+def report(label, seconds, calls):
+    print(f"{label:<28} {seconds / calls * 1e6:8.2f} us/call")
+
+
+def main():
+    base = datetime(2026, 1, 1, 20, 0)
+    # A listing page: a few hundred distinct show times rendered repeatedly
+    values = [base + timedelta(hours=3 * i) for i in range(500)]
+    strings = [value.strftime('%Y-%m-%d %H:%M:%S') for value in values]
+    assert all(legacy_format_datetime(s, 'full') == format_datetime(v, 'full')
+               for s, v in zip(strings, values))
+
+    def run_legacy():
+        for i in range(CALLS):
+            legacy_format_datetime(strings[i % len(strings)], 'full')
+
+    def run_cold():
+        format_datetime.cache_clear()
+        for i in range(CALLS):
+            # distinct values, so every call misses the cache
+            format_datetime(base + timedelta(minutes=i), 'full')
+
+    def run_warm():
+        for i in range(CALLS):
+            format_datetime(values[i % len(values)], 'full')
+
+    report('before (dateutil + babel)', timeit.timeit(run_legacy, number=1), CALLS)
+    report('after, cache misses', timeit.timeit(run_cold, number=1), CALLS)
+    run_warm()
+    report('after, cache hits', timeit.timeit(run_warm, number=1), CALLS)
+
+
+if __name__ == '__main__':
+    main()
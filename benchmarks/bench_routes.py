@@ -0,0 +1,301 @@
+# Route-level benchmark: drives the app's routes through the Flask test
+# client against seeded SQLite databases of several sizes.
+#
+#   python benchmarks/bench_routes.py                         # report only
+#   python benchmarks/bench_routes.py --save baseline.json    # write a baseline
+#   python benchmarks/bench_routes.py --compare baseline.json # flag regressions
+#
+# Per route and size it reports p50/p95 latency, SQL statements per request
+# and the peak Python memory allocated while serving one request. The page
+# cache is disabled so the views' own cost is measured. Databases are built
+# with `flask seed` (--venues N, 2N artists, 20N shows), kept in --data-dir
+# and copied before each run; dates in the scenarios are relative to the
+# seeding time (Seeder.now), kept next to them. The static bundles are built into a copy of
+# static/ there too, for the /static/dist/ scenario.
+
+import argparse
+import itertools
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+DEFAULT_DATA_DIR = os.path.join(tempfile.gettempdir(), 'fyyur-bench')
+
+# Set before the app (and config.py) is imported
+os.environ.setdefault('DATABASE_URL', 'sqlite://')
+os.environ['CACHE_BACKEND'] = 'null'
+os.environ['QUERY_BUDGET_MODE'] = 'off'
+os.environ['NGRAM_SEARCH_INDEX'] = '0'
+
+import warnings
+from flask_migrate import upgrade
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+import assets
+from app import create_app
+from models import db, Venue, Artist
+from seeder import Seeder
+
+# after the imports: flask_wtf forces its deprecation warnings on
+warnings.filterwarnings('ignore')
+
+app = create_app(WTF_CSRF_ENABLED=False)   # the create/edit forms are posted directly
+
+MIGRATIONS = os.path.join(os.path.dirname(__file__), '..', 'migrations')
+
+VENUE_FORM = {
+    'name': 'Bench Hall', 'city': 'Austin', 'state': 'TX', 'address': '1 Main St',
+    'phone': '5551234', 'genres': ['Jazz', 'Blues'], 'image_link': 'https://example.com/i.jpg',
+    'facebook_link': 'https://www.facebook.com/bench', 'website_link': 'https://example.com',
+    'seeking_talent': 'y', 'seeking_description': 'Looking for acts',
+}
+ARTIST_FORM = dict(VENUE_FORM, name='Bench Band', seeking_venue='y')
+del ARTIST_FORM['address'], ARTIST_FORM['seeking_talent']
+
+
+def scenarios(ids):
+    # (name, method, url, form data or a function of the request number);
+    # ids are the busiest venue and artist, the seeding time and the built
+    # main.css bundle
+    venue, artist, now = ids['venue'], ids['artist'], ids['now']
+    month = f"from={now:%Y-%m-%d}&to={now + timedelta(days=31):%Y-%m-%d}"
+
+    def new_show(number):
+        # A day after every seeded show, a different one per request, so
+        # each post books a show instead of hitting a conflict
+        start_time = now + timedelta(days=400 + number)
+        return {'venue_id': venue, 'artist_id': artist,
+                'start_time': f"{start_time:%Y-%m-%d} 20:00:00"}
+
+    return [
+        ('home', 'GET', '/', None),
+        ('venues', 'GET', '/venues', None),
+        ('venues?genre', 'GET', '/venues?genre=Jazz', None),
+        ('venues near', 'GET', '/venues/near?lat=40.7128&lng=-74.006&radius=25', None),
+        ('artists', 'GET', '/artists', None),
+        ('shows', 'GET', '/shows', None),
+        ('shows in range', 'GET', f'/shows?{month}', None),
+        ('venue detail', 'GET', f'/venues/{venue}', None),
+        ('artist detail', 'GET', f'/artists/{artist}', None),
+        ('venue calendar', 'GET', f'/venues/{venue}/calendar.ics', None),
+        ('artist calendar', 'GET', f'/artists/{artist}/calendar.ics', None),
+        ('venue search', 'POST', '/venues/search', {'search_term': 'blue'}),
+        ('artist search', 'POST', '/artists/search', {'search_term': 'band'}),
+        ('venue create form', 'GET', '/venues/create', None),
+        ('venue create', 'POST', '/venues/create', VENUE_FORM),
+        ('artist create form', 'GET', '/artists/create', None),
+        ('artist create', 'POST', '/artists/create', ARTIST_FORM),
+        ('show create form', 'GET', '/shows/create', None),
+        ('show create', 'POST', '/shows/create', new_show),
+        ('venue edit form', 'GET', f'/venues/{venue}/edit', None),
+        ('venue edit', 'POST', f'/venues/{venue}/edit', VENUE_FORM),
+        ('artist edit form', 'GET', f'/artists/{artist}/edit', None),
+        ('artist edit', 'POST', f'/artists/{artist}/edit', ARTIST_FORM),
+        ('api venues', 'GET', '/api/v1/venues', None),
+        ('api venue', 'GET', f'/api/v1/venues/{venue}', None),
+        ('api venue shows', 'GET', f'/api/v1/venues/{venue}/shows', None),
+        ('api artists', 'GET', '/api/v1/artists', None),
+        ('api artist', 'GET', f'/api/v1/artists/{artist}', None),
+        ('api artist shows', 'GET', f'/api/v1/artists/{artist}/shows', None),
+        ('api shows', 'GET', '/api/v1/shows', None),
+        ('autocomplete venues', 'GET', '/autocomplete/venues?q=blue&limit=8', None),
+        ('autocomplete artists', 'GET', '/autocomplete/artists?q=band&limit=8', None),
+        ('export shows', 'GET', '/export/shows.csv', None),
+        ('asset bundle', 'GET', f"/static/{ids['bundle']}", None),
+    ]
+
+
+# Not benchmarked: deleting would empty the fixture; debug/metrics/static
+# are not views of the app
+SKIPPED = {'venues.delete_venue', 'pool_stats', 'metrics', 'static'}
+
+statements = 0
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def count_statement(*args):
+    global statements
+    statements += 1
+
+
+def prepare(size, data_dir, rebuild):
+    # Seed once, then run on a fresh copy so the create/edit scenarios do
+    # not make the next run's data bigger
+    seeded = os.path.join(data_dir, f'fyyur-{size}.seed.db')
+    seeded_at = os.path.join(data_dir, f'fyyur-{size}.seed.json')
+    path = os.path.join(data_dir, f'fyyur-{size}.db')
+    if rebuild or not os.path.exists(seeded) or not os.path.exists(seeded_at):
+        if os.path.exists(seeded):
+            os.remove(seeded)
+        print(f"seeding {seeded} ...", file=sys.stderr)
+        app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{seeded}'
+        with app.app_context():
+            upgrade(directory=MIGRATIONS)
+            seeder = Seeder(seed=0, chunk_size=10000, past_ratio=0.5)
+            seeder.run(size, 2 * size, 20 * size)
+            db.session.remove()
+        with open(seeded_at, 'w') as f:
+            json.dump({'now': seeder.now.isoformat()}, f)
+    with open(seeded_at) as f:
+        now = datetime.fromisoformat(json.load(f)['now'])
+    shutil.copyfile(seeded, path)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{path}'
+    with app.app_context():
+        busiest = lambda model: model.query.order_by(
+            (model.upcoming_shows_count + model.past_shows_count).desc()).first().id
+        return {'venue': busiest(Venue), 'artist': busiest(Artist), 'now': now}
+
+
+def build_assets(data_dir):
+    # `flask assets build` into a copy of static/, so the tree is left alone
+    static = os.path.join(data_dir, 'static')
+    shutil.rmtree(static, ignore_errors=True)
+    shutil.copytree(app.static_folder, static, ignore=shutil.ignore_patterns(assets.DIST))
+    app.static_folder = static
+    return assets.build(static)['bundles']['main.css']
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def measure(client, method, url, data, requests):
+    global statements
+    numbers = itertools.count()
+    if not callable(data):
+        data = lambda number, data=data: data
+    for _ in range(3):
+        client.open(url, method=method, data=data(next(numbers))).get_data()
+    latencies = []
+    statements = 0
+    for _ in range(requests):
+        form = data(next(numbers))
+        started = time.perf_counter()
+        response = client.open(url, method=method, data=form)
+        response.get_data()         # streamed bodies are produced here
+        latencies.append(time.perf_counter() - started)
+    queries = statements / requests
+    if response.status_code >= 400:
+        raise RuntimeError(f"{method} {url} returned {response.status_code}")
+    # Memory in a separate pass: tracemalloc would skew the timings
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    client.open(url, method=method, data=data(next(numbers))).get_data()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {
+        'p50_ms': round(statistics.median(latencies) * 1000, 3),
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 3),
+        'queries': round(queries, 2),
+        'peak_kib': round(peak / 1024, 1),
+    }
+
+
+def run(sizes, requests, data_dir, rebuild):
+    os.makedirs(data_dir, exist_ok=True)
+    results = {}
+    bundle = build_assets(data_dir)
+    for size in sizes:
+        ids = dict(prepare(size, data_dir, rebuild), bundle=bundle)
+        client = app.test_client()
+        results[str(size)] = {}
+        for name, method, url, data in scenarios(ids):
+            results[str(size)][name] = measure(client, method, url, data, requests)
+            print_row(size, name, results[str(size)][name])
+    return results
+
+
+def uncovered(requests):
+    # Routes of the app no scenario requests
+    covered = set()
+    adapter = app.url_map.bind('localhost')
+    for method, url in requests:
+        endpoint, _ = adapter.match(url.split('?')[0], method=method)
+        covered.add(endpoint)
+    return sorted({rule.endpoint for rule in app.url_map.iter_rules()} - covered - SKIPPED)
+
+
+def print_row(size, name, result, note=''):
+    print(f"{size:>7} {name:<20} {result['p50_ms']:9.2f} {result['p95_ms']:9.2f} "
+          f"{result['queries']:8.1f} {result['peak_kib']:9.1f} {note}")
+
+
+def compare(results, baseline, threshold, floor_ms):
+    # Regressions: p95 or peak memory up by more than `threshold` (p95 also
+    # by more than `floor_ms`, to ignore noise on fast routes), or more queries
+    regressions = []
+    for size, routes in results.items():
+        for name, result in routes.items():
+            base = baseline.get('results', {}).get(size, {}).get(name)
+            if base is None:
+                continue
+            reasons = []
+            if (result['p95_ms'] > base['p95_ms'] * (1 + threshold)
+                    and result['p95_ms'] - base['p95_ms'] > floor_ms):
+                reasons.append(f"p95 {base['p95_ms']:.2f} -> {result['p95_ms']:.2f} ms")
+            if result['queries'] > base['queries']:
+                reasons.append(f"queries {base['queries']} -> {result['queries']}")
+            if result['peak_kib'] > base['peak_kib'] * (1 + threshold):
+                reasons.append(f"peak {base['peak_kib']} -> {result['peak_kib']} KiB")
+            if reasons:
+                regressions.append(f"{size:>7} {name}: {', '.join(reasons)}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', default='200,2000',
+                        help='comma-separated venue counts (default: 200,2000)')
+    parser.add_argument('--requests', type=int, default=30, help='timed requests per route')
+    parser.add_argument('--data-dir', default=DEFAULT_DATA_DIR)
+    parser.add_argument('--rebuild', action='store_true', help='re-seed the databases')
+    parser.add_argument('--save', metavar='FILE', help='write the results as a baseline')
+    parser.add_argument('--compare', metavar='FILE', help='baseline to compare against')
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help='allowed relative slowdown (default: 0.25)')
+    parser.add_argument('--floor-ms', type=float, default=1.0,
+                        help='ignore p95 slowdowns smaller than this (default: 1.0)')
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(',')]
+    print(f"{'size':>7} {'route':<20} {'p50 ms':>9} {'p95 ms':>9} {'queries':>8} {'peak KiB':>9}")
+    results = run(sizes, args.requests, args.data_dir, args.rebuild)
+
+    placeholders = {'venue': 1, 'artist': 1, 'now': datetime.now(), 'bundle': 'dist/main.css'}
+    missing = uncovered([(method, url) for _, method, url, _ in scenarios(placeholders)])
+    if missing:
+        print(f"routes without a scenario: {', '.join(missing)}")
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump({
+                'meta': {'python': platform.python_version(), 'platform': platform.platform(),
+                         'requests': args.requests, 'created': time.strftime('%Y-%m-%dT%H:%M:%S')},
+                'results': results,
+            }, f, indent=2, sort_keys=True)
+        print(f"baseline written to {args.save}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold, args.floor_ms)
+        if regressions:
+            print(f"{len(regressions)} regression(s) against {args.compare}:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print(f"no regressions against {args.compare}")
+
+
+if __name__ == '__main__':
+    main()
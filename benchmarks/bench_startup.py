@@ -0,0 +1,91 @@
+# Cold start: time from a fresh interpreter to the first response, split
+# into importing app.py, create_app() and the first request, plus the cost
+# of building one more app in the same process (test suites).
+#
+#   python benchmarks/bench_startup.py
+#   python benchmarks/bench_startup.py --runs 20
+#
+# Each run is a new process, so imports are really cold (bytecode is
+# cached). Also lists the heavy modules a served app must not import.
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+# Only needed by the CLI, the forms or the datetime filter
+DEFERRED = ['flask_migrate', 'alembic', 'wtforms', 'flask_wtf', 'babel', 'dateutil',
+            'importer', 'seeder']
+
+PROBE = '''
+import json, sys, time
+started = time.perf_counter()
+import app
+imported = time.perf_counter()
+application = app.create_app(BLUEPRINTS=%(blueprints)r)
+created = time.perf_counter()
+response = application.test_client().get(%(path)r)
+assert response.status_code == 200, response.status_code
+served = time.perf_counter()
+app.create_app(BLUEPRINTS=%(blueprints)r)
+again = time.perf_counter()
+print(json.dumps({
+    'import_ms': (imported - started) * 1000,
+    'create_app_ms': (created - imported) * 1000,
+    'first_request_ms': (served - created) * 1000,
+    'next_app_ms': (again - served) * 1000,
+    'loaded': [name for name in %(deferred)r if name in sys.modules],
+}))
+'''
+
+# name: (BLUEPRINTS, first URL requested; neither touches the database)
+SETUPS = {
+    'full app': (['views.venues:blueprint', 'views.artists:blueprint',
+                  'views.shows:blueprint', 'api:api'], '/'),
+    'api only': (['api:api'], '/metrics'),
+}
+
+
+def probe(blueprints, path):
+    env = dict(os.environ, DATABASE_URL='sqlite://', PYTHONWARNINGS='ignore', METRICS_ENDPOINT='1')
+    output = subprocess.run(
+        [sys.executable, '-c', PROBE % {'blueprints': blueprints, 'path': path, 'deferred': DEFERRED}],
+        cwd=ROOT, env=env, check=True, capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def interpreter_ms():
+    # Baseline: starting Python itself
+    timings = []
+    for _ in range(5):
+        started = time.perf_counter()
+        subprocess.run([sys.executable, '-c', 'pass'], check=True)
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--runs', type=int, default=10, help='processes per setup')
+    args = parser.parse_args()
+
+    print(f"bare interpreter: {interpreter_ms():.1f} ms")
+    print(f"{'setup':<10} {'import':>9} {'create_app':>11} {'1st request':>12} {'next app':>9}  (median ms)")
+    for name, (blueprints, path) in SETUPS.items():
+        results = [probe(blueprints, path) for _ in range(args.runs)]
+        median = {key: statistics.median(result[key] for result in results)
+                  for key in ('import_ms', 'create_app_ms', 'first_request_ms', 'next_app_ms')}
+        print(f"{name:<10} {median['import_ms']:9.1f} {median['create_app_ms']:11.1f} "
+              f"{median['first_request_ms']:12.1f} {median['next_app_ms']:9.1f}")
+        loaded = results[-1]['loaded']
+        if loaded:
+            print(f"  loaded although deferred: {', '.join(loaded)}")
+
+
+if __name__ == '__main__':
+    main()
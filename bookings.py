@@ -0,0 +1,147 @@
+from datetime import timedelta
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import event, inspect, or_, select
+from models import db, Venue, Artist, Shows, SHOW_DURATION_DEFAULT, SHOW_DURATION_MAX
+
+# Double-booking checks: a show occupies its venue and its artist for
+# [start_time, start_time + duration), and two shows of the same venue or
+# artist must not overlap.
+#
+# Inserting or rescheduling a Shows row through the ORM first looks for an
+# overlapping show. As no show lasts longer than SHOW_DURATION_MAX, a
+# conflict starts within SHOW_DURATION_MAX before the new show ends, so the
+# lookup is a bounded range scan of the (venue_id, start_time) and
+# (artist_id, start_time) indexes: O(log n) per insert, however many shows
+# there are. On PostgreSQL the exclusion constraints of the
+# c8e5f2a9b3d1 migration guarantee it under concurrency as well (a booking
+# that loses the race fails with an IntegrityError, see booking_conflict());
+# elsewhere the venue and artist rows are locked before the check.
+#
+# Bulk loads (`flask import`, `flask seed`) use Core inserts and skip the
+# check; `flask conflicts` reports the overlapping shows of the whole table
+# in one pass over the same indexes.
+
+# Must stay identical to the exclusion constraints of the migration
+SHOW_PERIOD = "tsrange(start_time, start_time + duration * interval '1 minute')"
+
+# SQLSTATE of a violated exclusion constraint
+EXCLUSION_VIOLATION = '23P01'
+
+OWNERS = (('venue', Shows.venue_id), ('artist', Shows.artist_id))
+
+
+class BookingConflict(ValueError):
+
+    def __init__(self, owner, owner_id, other_id, start, end):
+        self.owner = owner
+        self.owner_id = owner_id
+        self.other_id = other_id
+        super().__init__(f"{owner} {owner_id} is already booked from "
+                         f"{start:%Y-%m-%d %H:%M} to {end:%H:%M} (show {other_id})")
+
+
+def period(show):
+    # Defaults are only applied by the INSERT, after the mapper events
+    start = show.start_time
+    return start, start + timedelta(minutes=show.duration or SHOW_DURATION_DEFAULT)
+
+
+def overlapping(connection, show):
+    # Shows of the same venue or artist overlapping `show`, as
+    # (owner, owner id, show id, start, end)
+    start, end = period(show)
+    # Form data may hold the ids as strings
+    owner_ids = {owner: int(getattr(show, f'{owner}_id')) for owner, _ in OWNERS}
+    owner_matches = or_(*(column == owner_ids[owner] for owner, column in OWNERS))
+    query = (select(Shows.id, Shows.venue_id, Shows.artist_id, Shows.start_time, Shows.duration)
+             .where(owner_matches,
+                    Shows.start_time < end,
+                    Shows.start_time > start - timedelta(minutes=SHOW_DURATION_MAX))
+             .order_by(Shows.start_time))
+    if show.id is not None:
+        query = query.where(Shows.id != show.id)
+    for row in connection.execute(query):
+        row_end = row.start_time + timedelta(minutes=row.duration)
+        if row_end > start:
+            owner = 'venue' if row.venue_id == owner_ids['venue'] else 'artist'
+            yield owner, owner_ids[owner], row.id, row.start_time, row_end
+
+
+def check(connection, show):
+    if connection.dialect.name != 'postgresql':
+        # Serializes concurrent bookings of the same venue or artist
+        for model, owner_id in ((Venue, show.venue_id), (Artist, show.artist_id)):
+            connection.execute(select(model.id).where(model.id == owner_id).with_for_update())
+    for conflict in overlapping(connection, show):
+        raise BookingConflict(*conflict)
+
+
+def booking_conflict(error, show):
+    # The BookingConflict behind `error`: the check's own, or the show a
+    # concurrent booking committed when an exclusion constraint failed.
+    # None for other errors. Call after the rollback.
+    if isinstance(error, BookingConflict):
+        return error
+    if getattr(error.orig, 'pgcode', None) != EXCLUSION_VIOLATION:
+        return None
+    with db.engine.connect() as connection:
+        for conflict in overlapping(connection, show):
+            return BookingConflict(*conflict)
+    return None
+
+
+@event.listens_for(Shows, 'before_insert')
+def check_new_show(mapper, connection, show):
+    check(connection, show)
+
+
+@event.listens_for(Shows, 'before_update')
+def check_rescheduled_show(mapper, connection, show):
+    state = inspect(show)
+    if any(state.attrs[name].history.has_changes()
+           for name in ('start_time', 'duration', 'venue_id', 'artist_id')):
+        check(connection, show)
+
+
+#  Report
+#  ----------------------------------------------------------------
+
+def conflicts(owner_column):
+    # Overlapping pairs among the shows of each venue/artist, as
+    # (owner id, earlier show, later show). One sweep in index order,
+    # keeping the shows still running at each start time.
+    rows = (db.session.query(owner_column, Shows.id, Shows.start_time, Shows.duration)
+            .order_by(owner_column, Shows.start_time, Shows.id)
+            .yield_per(10000))
+    current, running = None, []
+    for owner_id, show_id, start, duration in rows:
+        if owner_id != current:
+            current, running = owner_id, []
+        running = [show for show in running if show[2] > start]
+        for other in running:
+            yield owner_id, other, (show_id, start, start + timedelta(minutes=duration))
+        running.append((show_id, start, start + timedelta(minutes=duration)))
+
+
+@click.command('conflicts')
+@click.option('--limit', default=100, show_default=True, help='Conflicts to list per kind.')
+@with_appcontext
+def conflicts_command(limit):
+    """Report overlapping shows of the same venue or artist."""
+    found = 0
+    for owner, column in OWNERS:
+        count = 0
+        for owner_id, earlier, later in conflicts(column):
+            count += 1
+            if count <= limit:
+                click.echo(f"{owner} {owner_id}: show {earlier[0]} "
+                           f"({earlier[1]:%Y-%m-%d %H:%M}-{earlier[2]:%H:%M}) overlaps show "
+                           f"{later[0]} ({later[1]:%Y-%m-%d %H:%M}-{later[2]:%H:%M})")
+        if count > limit:
+            click.echo(f"  ... and {count - limit} more {owner} conflicts")
+        click.echo(f"{count} {owner} conflicts")
+        found += count
+    # Non-zero exit status for scripts checking an import
+    if found:
+        raise click.exceptions.Exit(1)
@@ -0,0 +1,248 @@
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from flask import current_app, request, session, g, make_response, Response
+from jinja2 import nodes
+from jinja2.ext import Extension
+from markupsafe import Markup
+
+# Rendered-page and fragment cache with tag-based invalidation.
+#
+# Every entry carries the tags it depends on ('venue:3', 'artist:7',
+# 'show:12', 'venues', 'shows'). Invalidations are numbered, and a tag's
+# version is the number of the last invalidation of it; entries stored under
+# an older version are treated as misses. Renders note the number before
+# reading any data (sequence()) and are not stored when one of their tags
+# was invalidated since, so a page rendered from data an invalidation
+# replaced meanwhile is never cached as fresh. Backends:
+#   LRUBackend     bounded in-process LRU (one copy per worker)
+#   SharedBackend  any store with the redis-py get/set/mget/incr API, so all
+#                  workers see the same entries and invalidations; LocalStore
+#                  is an in-process stand-in for development and tests.
+
+
+def stale(versions, since):
+    # Whether a tag was invalidated after invalidation number `since`
+    return since is not None and any(version > since for version in versions.values())
+
+
+class LRUBackend:
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()    # key -> (expires, tag versions, value)
+        self.tag_versions = {}
+        self.invalidations = 0
+        self.lock = threading.Lock()
+
+    def sequence(self):
+        return self.invalidations
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            expires, tags, value = entry
+            if expires < time.time() or any(
+                    self.tag_versions.get(tag, 0) != version for tag, version in tags.items()):
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, tags=(), ttl=300, since=None):
+        with self.lock:
+            versions = {tag: self.tag_versions.get(tag, 0) for tag in tags}
+            if stale(versions, since):
+                return
+            self.entries[key] = (time.time() + ttl, versions, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def invalidate(self, *tags):
+        with self.lock:
+            self.invalidations += 1
+            for tag in tags:
+                self.tag_versions[tag] = self.invalidations
+
+
+class LocalStore:
+    # In-process stand-in for a redis.Redis client (only what SharedBackend uses)
+
+    def __init__(self):
+        self.data = {}
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            value, expires = self.data.get(key, (None, None))
+            if expires is not None and expires < time.time():
+                del self.data[key]
+                return None
+            return value
+
+    def mget(self, keys):
+        return [self.get(key) for key in keys]
+
+    def set(self, key, value, ex=None):
+        with self.lock:
+            self.data[key] = (value, time.time() + ex if ex else None)
+
+    def incr(self, key):
+        with self.lock:
+            value, expires = self.data.get(key, (0, None))
+            self.data[key] = (int(value) + 1, expires)
+            return int(value) + 1
+
+
+class SharedBackend:
+
+    def __init__(self, store, prefix='fyyur:'):
+        self.store = store
+        self.prefix = prefix
+
+    def tag_key(self, tag):
+        return f"{self.prefix}tag:{tag}"
+
+    def sequence(self):
+        return int(self.store.get(self.prefix + 'invalidations') or 0)
+
+    def tag_versions(self, tags):
+        values = self.store.mget([self.tag_key(tag) for tag in tags]) if tags else []
+        return {tag: int(value or 0) for tag, value in zip(tags, values)}
+
+    def get(self, key):
+        raw = self.store.get(self.prefix + key)
+        if raw is None:
+            return None
+        tags, value = pickle.loads(raw)
+        if self.tag_versions(list(tags)) != tags:
+            return None
+        return value
+
+    def set(self, key, value, tags=(), ttl=300, since=None):
+        tags = self.tag_versions(list(tags))
+        if stale(tags, since):
+            return
+        self.store.set(self.prefix + key, pickle.dumps((tags, value)), ex=ttl)
+
+    def invalidate(self, *tags):
+        # Numbered before the tags are set: a render that read the number
+        # after this started after the data changed
+        number = self.store.incr(self.prefix + 'invalidations')
+        for tag in tags:
+            self.store.set(self.tag_key(tag), number)
+
+
+class NullBackend:
+
+    def sequence(self):
+        return 0
+
+    def get(self, key):
+        return None
+
+    def set(self, key, value, tags=(), ttl=300, since=None):
+        pass
+
+    def invalidate(self, *tags):
+        pass
+
+
+def create_backend(config):
+    kind = config.get('CACHE_BACKEND', 'lru')
+    if kind == 'lru':
+        return LRUBackend(config.get('CACHE_MAX_ENTRIES', 1024))
+    if kind == 'shared':
+        url = config.get('CACHE_SHARED_URL')
+        if url:
+            import redis    # optional dependency, only needed for a real shared store
+            return SharedBackend(redis.Redis.from_url(url))
+        return SharedBackend(LocalStore())
+    return NullBackend()
+
+
+def init_app(app):
+    app.extensions['page_cache'] = create_backend(app.config)
+    app.jinja_env.add_extension(FragmentCacheExtension)
+
+
+def backend():
+    return current_app.extensions['page_cache']
+
+
+def invalidate(*tags):
+    backend().invalidate(*tags)
+
+
+def render_sequence():
+    # Invalidation number before this request's data was read (see cached())
+    if 'cache_sequence' not in g:
+        g.cache_sequence = backend().sequence()
+    return g.cache_sequence
+
+
+def add_tags(*tags):
+    # Record tags the page being rendered depends on
+    g.setdefault('cache_tags', set()).update(tags)
+
+
+def cached(*tags):
+    # Page cache for GET views, keyed by the full URL. Static tags are
+    # formatted with the view arguments; views add data-dependent ones with
+    # add_tags().
+    #
+    # Under @conditional the key also holds the ETag of the version stamps:
+    # invalidate() only reaches the current worker's LRUBackend, and a page
+    # another worker cached before a write must not be served (and then
+    # revalidated with 304s) under the ETag of the new stamps.
+    def decorator(view):
+        @wraps(view)
+        def wrapper(**kwargs):
+            # Flashed messages are per user, so such pages are neither read
+            # from nor written to the cache
+            if request.method not in ('GET', 'HEAD') or '_flashes' in session:
+                return view(**kwargs)
+            key = f"page:{g.get('stamp_etag', '')}:{request.full_path}"
+            hit = backend().get(key)
+            if hit is not None:
+                body, mimetype = hit
+                return Response(body, mimetype=mimetype)
+            since = render_sequence()
+            response = make_response(view(**kwargs))
+            if response.status_code == 200 and not response.is_streamed:
+                page_tags = {tag.format(**kwargs) for tag in tags} | g.get('cache_tags', set())
+                backend().set(key, (response.get_data(), response.mimetype), page_tags,
+                              current_app.config.get('CACHE_TTL', 300), since)
+            return response
+        return wrapper
+    return decorator
+
+
+class FragmentCacheExtension(Extension):
+    # {% cache "show-tile:" ~ show.id, ["show:" ~ show.id, ...] %}...{% endcache %}
+    tags = {'cache'}
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        args = [parser.parse_expression()]
+        if parser.stream.skip_if('comma'):
+            args.append(parser.parse_expression())
+        else:
+            args.append(nodes.List([]))
+        body = parser.parse_statements(['name:endcache'], drop_needle=True)
+        return nodes.CallBlock(self.call_method('_cache_fragment', args), [], [], body).set_lineno(lineno)
+
+    def _cache_fragment(self, key, tags, caller):
+        key = f"fragment:{key}"
+        hit = backend().get(key)
+        if hit is not None:
+            return Markup(hit)
+        since = render_sequence()
+        rendered = caller()
+        backend().set(key, str(rendered), tags, current_app.config.get('CACHE_TTL', 300), since)
+        return rendered
@@ -0,0 +1,122 @@
+import io
+from datetime import datetime, timedelta
+from flask import current_app, url_for
+from models import db, Venue, Artist, Shows
+from conditional import time_bucket
+
+# iCalendar (RFC 5545) feeds of the shows of a venue or an artist:
+#   /venues/3/calendar.ics
+#   /artists/7/calendar.ics?from=2026-01-01&to=2026-07-01
+#
+# A feed holds the shows starting in a window: ?from=&to=, by default
+# CALENDAR_PAST_DAYS back and CALENDAR_FUTURE_DAYS ahead of the start of the
+# current day-long bucket. The default window and the feed's ETag (see
+# conditional.py) move on together once a day, so between writes calendar
+# clients polling it get 304s. The window is one range scan of
+# Show(venue_id, start_time) or Show(artist_id, start_time), streamed in
+# chunks of BATCH_SIZE events.
+
+WINDOW_BUCKET = 24 * 60 * 60
+BATCH_SIZE = 200
+
+EVENT_FIELDS = (Shows.id, Shows.start_time, Shows.duration, Shows.updated_at,
+                Shows.venue_id, Venue.name.label('venue_name'), Venue.address, Venue.city,
+                Venue.state, Shows.artist_id, Artist.name.label('artist_name'))
+
+
+def window(start=None, end=None):
+    # (start, end) of a feed: the rolling window, or the requested one; a
+    # single bound gets a window of the default length
+    config = current_app.config
+    past = timedelta(days=config['CALENDAR_PAST_DAYS'])
+    length = past + timedelta(days=config['CALENDAR_FUTURE_DAYS'])
+    if start is None and end is None:
+        start = datetime.fromtimestamp(time_bucket(WINDOW_BUCKET)) - past
+    if start is None:
+        start = end - length
+    if end is None:
+        end = start + length
+    if end < start or end - start > timedelta(days=config['CALENDAR_WINDOW_MAX_DAYS']):
+        raise ValueError((start, end))
+    return start, end
+
+
+def events_query(owner_column, owner_id, start, end):
+    return (db.session.query(*EVENT_FIELDS).select_from(Shows)
+            .join(Venue, Venue.id == Shows.venue_id)
+            .join(Artist, Artist.id == Shows.artist_id)
+            .filter(owner_column == owner_id, Shows.start_time >= start, Shows.start_time < end)
+            .order_by(Shows.start_time, Shows.id))
+
+
+#  Serialization
+#  ----------------------------------------------------------------
+
+def escape(text):
+    return (str(text or '').replace('\\', '\\\\').replace(';', '\\;')
+            .replace(',', '\\,').replace('\r\n', '\\n').replace('\n', '\\n'))
+
+
+def fold(line):
+    # Content lines longer than 75 octets continue on lines starting with a space
+    if len(line.encode('utf-8')) <= 75:
+        return line + '\r\n'
+    parts, part, size = [], '', 0
+    for char in line:
+        length = len(char.encode('utf-8'))
+        if size + length > 75:
+            parts.append(part)
+            part, size = ' ', 1
+        part += char
+        size += length
+    parts.append(part)
+    return '\r\n'.join(parts) + '\r\n'
+
+
+def local_time(value):
+    # Floating time: show times are stored as the venue's local time
+    return value.strftime('%Y%m%dT%H%M%S')
+
+
+def event(row, link):
+    location = ', '.join(part for part in (row.venue_name, row.address, row.city, row.state) if part)
+    lines = [
+        'BEGIN:VEVENT',
+        f'UID:show-{row.id}@fyyur',
+        f"DTSTAMP:{row.updated_at.strftime('%Y%m%dT%H%M%SZ')}",
+        f'DTSTART:{local_time(row.start_time)}',
+        f'DTEND:{local_time(row.start_time + timedelta(minutes=row.duration))}',
+        f'SUMMARY:{escape(row.artist_name)} at {escape(row.venue_name)}',
+        f'LOCATION:{escape(location)}',
+        f'URL:{link(row)}',
+        'END:VEVENT',
+    ]
+    return ''.join(fold(line) for line in lines)
+
+
+def feed(name, rows, link):
+    # Yields the calendar as utf-8 chunks. `link(row)` is the URL of an event.
+    buffer = io.StringIO()
+    buffer.write(''.join(fold(line) for line in (
+        'BEGIN:VCALENDAR',
+        'VERSION:2.0',
+        'PRODID:-//Fyyur//Shows//EN',
+        'CALSCALE:GREGORIAN',
+        f'X-WR-CALNAME:{escape(name)}',
+    )))
+    for count, row in enumerate(rows, 1):
+        buffer.write(event(row, link))
+        if count % BATCH_SIZE == 0:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+    buffer.write('END:VCALENDAR\r\n')
+    yield buffer.getvalue().encode('utf-8')
+
+
+def venue_link(row):
+    return url_for('venues.show_venue', venue_id=row.venue_id, _external=True)
+
+
+def artist_link(row):
+    return url_for('artists.show_artist', artist_id=row.artist_id, _external=True)
@@ -0,0 +1,134 @@
+import hashlib
+import time
+from datetime import datetime, timezone
+from functools import wraps
+from flask import current_app, g, request, session, make_response
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql, sqlite
+from models import db, Version
+
+# Conditional GET (ETag / Last-Modified / 304) driven by version stamps.
+#
+# A stamp is a row in the Version table: one per table ('Venue', 'Artist',
+# 'Show') and one per entity ('Venue:3', 'Artist:7'). Write handlers call
+# bump() inside their transaction; views decorated with @conditional(...)
+# read the stamps they depend on with a single primary-key query and answer
+# a matching revalidation with 304 before running their own queries.
+
+
+def bump(*keys):
+    # Increment the given stamps; call before the handler's commit
+    keys = sorted(set(keys))
+    if not keys:
+        return
+    now = datetime.utcnow()
+    dialect = db.engine.dialect.name
+    if dialect in ('postgresql', 'sqlite'):
+        # One upsert, executed for all keys at once
+        insert = (postgresql if dialect == 'postgresql' else sqlite).insert
+        statement = insert(Version).on_conflict_do_update(
+            index_elements=[Version.key],
+            set_={'version': Version.version + 1, 'updated_at': now})
+        db.session.execute(statement, [
+            {'key': key, 'version': 1, 'updated_at': now} for key in keys])
+        return
+    for key in keys:
+        updated = Version.query.filter_by(key=key).update(
+            {'version': Version.version + 1, 'updated_at': now},
+            synchronize_session=False)
+        if not updated:
+            db.session.add(Version(key=key, version=1, updated_at=now))
+
+
+# (database, key) -> (monotonic time read, version), see stamp()
+stamps = {}
+
+
+def stamp(key, max_age=0):
+    # Current version of one stamp, read on the primary: in-process indexes
+    # checked against it (ngram_index.py, autocomplete.py) are shared by all
+    # requests, so must not follow a lagging replica back in time. A version
+    # read less than `max_age` seconds ago is returned without a query.
+    cache_key = (str(db.engine.url), key)
+    now = time.monotonic()
+    cached = stamps.get(cache_key)
+    if cached is not None and now - cached[0] < max_age:
+        return cached[1]
+    with db.engine.connect() as connection:
+        version = connection.execute(select(Version.version).where(Version.key == key)).scalar() or 0
+    stamps[cache_key] = (now, version)
+    return version
+
+
+def index_stamp(key):
+    # stamp() for the lookups of the in-process indexes
+    return stamp(key, current_app.config.get('INDEX_STAMP_MAX_AGE', 0))
+
+
+def time_bucket(seconds):
+    # Start of the current `seconds`-long period, as a Unix time
+    return int(time.time()) // seconds * seconds
+
+
+def validators(keys, time_sensitive=False):
+    # (etag, last_modified) for the given stamps. `time_sensitive` is True
+    # (CONDITIONAL_GET_TIME_BUCKET) or a bucket length in seconds.
+    rows = db.session.query(Version.key, Version.version, Version.updated_at
+            ).filter(Version.key.in_(keys)
+            ).all()
+    versions = {row.key: row for row in rows}
+    parts = [current_app.config.get('CONDITIONAL_GET_SALT', '')]
+    last_modified = datetime(1970, 1, 1)
+    for key in sorted(keys):
+        row = versions.get(key)
+        parts.append(f"{key}={row.version if row else 0}")
+        if row and row.updated_at > last_modified:
+            last_modified = row.updated_at
+    if time_sensitive:
+        # Pages splitting shows into past/upcoming change as time passes
+        bucket = (current_app.config['CONDITIONAL_GET_TIME_BUCKET']
+                  if time_sensitive is True else time_sensitive)
+        bucket_start = time_bucket(bucket)
+        parts.append(f"t={bucket_start}")
+        last_modified = max(last_modified, datetime.utcfromtimestamp(bucket_start))
+    etag = hashlib.sha1(';'.join(parts).encode()).hexdigest()[:20]
+    return etag, last_modified.replace(microsecond=0, tzinfo=timezone.utc)
+
+
+def cache_control(endpoint):
+    settings = current_app.config['CACHE_CONTROL']
+    return settings.get(endpoint, settings['default'])
+
+
+def not_modified(etag, last_modified):
+    if request.if_none_match:
+        return request.if_none_match.contains(etag)
+    if request.if_modified_since:
+        return last_modified <= request.if_modified_since
+    return False
+
+
+def conditional(*stamps, time_sensitive=False):
+    # @conditional('Venue:{venue_id}', 'Artist') -- stamps are formatted
+    # with the view arguments
+    def decorator(view):
+        @wraps(view)
+        def wrapper(**kwargs):
+            # Flashed messages are rendered into the page, so it must be sent
+            if request.method not in ('GET', 'HEAD') or '_flashes' in session:
+                return view(**kwargs)
+            keys = [stamp.format(**kwargs) for stamp in stamps]
+            etag, last_modified = validators(keys, time_sensitive)
+            g.stamp_etag = etag     # part of the page cache key, see cache.cached()
+            if not_modified(etag, last_modified):
+                response = make_response('', 304)
+            else:
+                response = make_response(view(**kwargs))
+                if response.status_code != 200:
+                    return response
+            response.set_etag(etag)
+            response.last_modified = last_modified
+            response.headers['Cache-Control'] = cache_control(request.endpoint)
+            return response
+        return wrapper
+    return decorator
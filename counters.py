@@ -0,0 +1,114 @@
+from datetime import datetime
+from sqlalchemy import event, func, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from models import db, Venue, Artist, Shows, ShowCounters
+
+# Denormalized Venue/Artist.upcoming_shows_count and past_shows_count.
+#
+# The counters split shows at ShowCounters.cutoff rather than at "now":
+# inserting or deleting a Shows row adjusts the counters of its venue and
+# artist in the same transaction, and rollover() periodically moves the
+# shows that started since the previous cutoff from upcoming to past.
+#
+# The counters are derived data, not exported: their updates keep
+# updated_at (see exporter.py), so a rollover does not put every venue and
+# artist with a started show into the next incremental export.
+
+OWNERS = ((Venue, Shows.venue_id), (Artist, Shows.artist_id))
+
+
+def current_cutoff(connection, for_update=False):
+    query = select(ShowCounters.cutoff).where(ShowCounters.id == 1)
+    # Writers take a shared lock so a concurrent rollover cannot miss them
+    query = query.with_for_update() if for_update else query.with_for_update(read=True)
+    return connection.execute(query).scalar()
+
+
+def start_counters(connection):
+    # The ShowCounters row of a database created without the migrations
+    # (db.create_all()), cut off now. A concurrent first show may insert it
+    # too: the first one wins.
+    values = {'id': 1, 'cutoff': datetime.now()}
+    dialect = connection.dialect.name
+    if dialect in ('postgresql', 'sqlite'):
+        insert = (postgresql if dialect == 'postgresql' else sqlite).insert
+        connection.execute(insert(ShowCounters.__table__).values(values).on_conflict_do_nothing())
+    else:
+        connection.execute(ShowCounters.__table__.insert().values(values))
+    return current_cutoff(connection)
+
+
+def adjust(connection, show, delta):
+    cutoff = current_cutoff(connection)
+    if cutoff is None:
+        cutoff = start_counters(connection)
+    upcoming = show.start_time >= cutoff
+    name = 'upcoming_shows_count' if upcoming else 'past_shows_count'
+    for model, owner_id in ((Venue, show.venue_id), (Artist, show.artist_id)):
+        column = model.__table__.c[name]
+        connection.execute(
+            update(model.__table__)
+            .where(model.__table__.c.id == owner_id)
+            .values({name: column + delta, 'updated_at': model.__table__.c.updated_at}))
+
+
+@event.listens_for(Shows, 'after_insert')
+def count_new_show(mapper, connection, show):
+    adjust(connection, show, 1)
+
+
+@event.listens_for(Shows, 'after_delete')
+def uncount_deleted_show(mapper, connection, show):
+    adjust(connection, show, -1)
+
+
+def rollover(now=None):
+    # Move shows that started since the last cutoff from upcoming to past.
+    # Only the venues/artists with such shows are touched. Returns the
+    # number of shows moved.
+    now = now or datetime.now()
+    connection = db.session.connection()
+    cutoff = current_cutoff(connection, for_update=True)
+    if cutoff is None:
+        recount(now=now)
+        return 0
+    window = (Shows.start_time >= cutoff) & (Shows.start_time < now)
+    moved = db.session.query(func.count(Shows.id)).filter(window).scalar()
+    if moved:
+        for model, owner_column in OWNERS:
+            started = (select(func.count(Shows.id))
+                       .where(owner_column == model.id, window)
+                       .scalar_subquery())
+            db.session.execute(
+                update(model)
+                .where(model.id.in_(select(owner_column).where(window)))
+                .values(upcoming_shows_count=model.upcoming_shows_count - started,
+                        past_shows_count=model.past_shows_count + started,
+                        updated_at=model.updated_at)
+                .execution_options(synchronize_session=False))
+    db.session.query(ShowCounters).filter_by(id=1).update({'cutoff': now})
+    return moved
+
+
+def recount(model=None, ids=None, now=None):
+    # Recompute counters from scratch (all rows, or only `ids` of `model`),
+    # e.g. after bulk inserts or deletes that bypass the ORM events
+    connection = db.session.connection()
+    cutoff = current_cutoff(connection, for_update=True)
+    if cutoff is None:
+        cutoff = now or datetime.now()
+        db.session.add(ShowCounters(id=1, cutoff=cutoff))
+    for owner, owner_column in OWNERS:
+        if model is not None and owner is not model:
+            continue
+        def count(condition):
+            return (select(func.count(Shows.id))
+                    .where(owner_column == owner.id, condition)
+                    .scalar_subquery())
+        statement = update(owner).values(
+            upcoming_shows_count=count(Shows.start_time >= cutoff),
+            past_shows_count=count(Shows.start_time < cutoff),
+            updated_at=owner.updated_at)
+        if ids is not None:
+            statement = statement.where(owner.id.in_(ids))
+        db.session.execute(statement.execution_options(synchronize_session=False))
@@ -0,0 +1,145 @@
+import random
+import threading
+import time
+from functools import wraps
+from flask import current_app, g, has_request_context, session
+from flask_sqlalchemy import SQLAlchemy, SignallingSession, get_state
+from sqlalchemy import event, orm
+from sqlalchemy.pool import QueuePool
+
+# Engine setup shared by every bind: pool options from
+# SQLALCHEMY_ENGINE_OPTIONS (config.py), optional read replicas and pool
+# statistics.
+#
+# Replicas (SQLALCHEMY_REPLICA_URIS) are registered as the binds 'replica0',
+# 'replica1', ...; views marked @read_only (pages, JSON API, autocomplete)
+# pick one per request and run their queries there. Flushes always go to the primary, and
+# a client that just wrote reads from the primary for REPLICA_PIN_SECONDS so
+# it sees its own changes despite replication lag.
+
+# Options only QueuePool takes; SQLite runs on NullPool/StaticPool
+QUEUE_POOL_OPTIONS = ('pool_size', 'max_overflow', 'pool_timeout')
+
+PIN_KEY = '_primary_until'
+
+
+class PoolMonitor:
+    # High-water mark of checked out connections, for pool_stats()
+
+    def __init__(self, engine):
+        self.lock = threading.Lock()
+        self.checked_out = 0
+        self.peak = 0
+        self.checkouts = 0
+        event.listen(engine, 'checkout', self.on_checkout)
+        event.listen(engine, 'checkin', self.on_checkin)
+
+    def on_checkout(self, dbapi_connection, record, proxy):
+        with self.lock:
+            self.checked_out += 1
+            self.checkouts += 1
+            self.peak = max(self.peak, self.checked_out)
+
+    def on_checkin(self, dbapi_connection, record):
+        with self.lock:
+            self.checked_out -= 1
+
+
+class RoutingSession(SignallingSession):
+
+    def get_bind(self, mapper=None, clause=None):
+        replica = replica_bind()
+        if replica is not None and not self._flushing:
+            return get_state(self.app).db.get_engine(self.app, bind=replica)
+        return SignallingSession.get_bind(self, mapper, clause)
+
+
+@event.listens_for(RoutingSession, 'after_flush')
+def wrote(db_session, flush_context):
+    if has_request_context():
+        g.wrote_primary = True
+
+
+class RoutingSQLAlchemy(SQLAlchemy):
+
+    def __init__(self, *args, **kwargs):
+        SQLAlchemy.__init__(self, *args, **kwargs)
+        self.monitors = {}
+
+    def create_session(self, options):
+        return orm.sessionmaker(class_=RoutingSession, db=self, **options)
+
+    def create_engine(self, sa_url, engine_opts):
+        if sa_url.get_backend_name() == 'sqlite':
+            for option in QUEUE_POOL_OPTIONS:
+                engine_opts.pop(option, None)
+        engine = SQLAlchemy.create_engine(self, sa_url, engine_opts)
+        self.monitors[engine] = PoolMonitor(engine)
+        return engine
+
+
+def init_app(app):
+    binds = dict(app.config.get('SQLALCHEMY_BINDS') or {})
+    replicas = []
+    for number, uri in enumerate(app.config.get('SQLALCHEMY_REPLICA_URIS') or ()):
+        binds[f'replica{number}'] = uri
+        replicas.append(f'replica{number}')
+    app.config['SQLALCHEMY_BINDS'] = binds or None
+    app.extensions['replicas'] = replicas
+
+    @app.after_request
+    def pin_to_primary(response):
+        if replicas and g.get('wrote_primary'):
+            session[PIN_KEY] = time.time() + app.config.get('REPLICA_PIN_SECONDS', 5)
+        return response
+
+
+#  Read routing
+#  ----------------------------------------------------------------
+
+def replica_bind():
+    return g.get('replica_bind') if has_request_context() else None
+
+
+def use_replica():
+    # Route this request's queries to a replica, unless there is none or the
+    # client wrote recently
+    replicas = current_app.extensions.get('replicas')
+    if not replicas or session.get(PIN_KEY, 0) > time.time():
+        return
+    if 'replica_bind' not in g:
+        g.replica_bind = random.choice(replicas)
+
+
+def read_only(view):
+    @wraps(view)
+    def wrapper(**kwargs):
+        use_replica()
+        return view(**kwargs)
+    return wrapper
+
+
+#  Pool statistics
+#  ----------------------------------------------------------------
+
+def pool_stats(db):
+    # Per bind: pool size, connections in use and the peak since start.
+    # `saturation` is in use / (size + max overflow) for queue pools.
+    app = current_app._get_current_object()
+    stats = {}
+    for bind in [None] + list(app.config.get('SQLALCHEMY_BINDS') or ()):
+        engine = db.get_engine(app, bind)
+        pool = engine.pool
+        monitor = db.monitors.get(engine)
+        entry = {"pool": type(pool).__name__, "status": pool.status()}
+        if isinstance(pool, QueuePool):
+            capacity = pool.size() + max(pool._max_overflow, 0)
+            entry.update(size=pool.size(), checked_in=pool.checkedin(),
+                         checked_out=pool.checkedout(), overflow=pool.overflow(),
+                         timeout=pool.timeout(),
+                         saturation=round(pool.checkedout() / capacity, 3) if capacity else None)
+        if monitor is not None:
+            entry.update(in_use=monitor.checked_out, peak_in_use=monitor.peak,
+                         checkouts=monitor.checkouts)
+        stats[bind or 'primary'] = entry
+    return stats
@@ -0,0 +1,108 @@
+import csv
+import io
+import json
+import sys
+import zlib
+from datetime import datetime
+import click
+from flask.cli import with_appcontext
+from models import db, Venue, Artist, Shows
+
+# Streaming catalogue export, shared by the /export/<kind>.<format> endpoint
+# and `flask export`.
+#
+# Rows are read through a server-side cursor (yield_per) and serialized in
+# batches by generators, so memory stays flat however many rows there are.
+# `since` limits the export to rows changed at or after that time, by their
+# updated_at: set on every write of an exported column, ORM or Core (the
+# column's onupdate; geo.locate() sets it too). Derived data is not exported
+# and its bulk updates leave updated_at alone: the show counters
+# (counters.py), the grid cells (geo.py) and the genre link tables
+# (genres.py; the exported genres string is the source).
+
+EXPORTS = {
+    'venues': (Venue, ['id', 'name', 'city', 'state', 'address', 'phone', 'genres',
+                       'image_link', 'facebook_link', 'website_link', 'seeking_talent',
+                       'seeking_description', 'latitude', 'longitude', 'updated_at']),
+    'artists': (Artist, ['id', 'name', 'city', 'state', 'phone', 'genres', 'image_link',
+                         'facebook_link', 'website_link', 'seeking_venue',
+                         'seeking_description', 'updated_at']),
+    'shows': (Shows, ['id', 'artist_id', 'venue_id', 'start_time', 'duration', 'updated_at']),
+}
+
+FORMATS = {'csv': 'text/csv', 'jsonl': 'application/x-ndjson'}
+
+BATCH_SIZE = 1000
+
+
+def parse_since(value):
+    return datetime.fromisoformat(value) if value else None
+
+
+def export_rows(kind, since=None):
+    model, columns = EXPORTS[kind]
+    query = db.session.query(*(getattr(model, column) for column in columns))
+    if since is not None:
+        query = query.filter(model.updated_at >= since).order_by(model.updated_at, model.id)
+    else:
+        query = query.order_by(model.id)
+    return query.yield_per(BATCH_SIZE)
+
+
+def serialize(kind, format, rows):
+    # Yields text chunks of up to BATCH_SIZE rows each
+    columns = EXPORTS[kind][1]
+    buffer = io.StringIO()
+    if format == 'csv':
+        writer = csv.writer(buffer)
+        writer.writerow(columns)
+        write = writer.writerow
+    else:
+        def write(row):
+            buffer.write(json.dumps(dict(zip(columns, row)), default=datetime.isoformat))
+            buffer.write('\n')
+    for count, row in enumerate(rows, 1):
+        write(row)
+        if count % BATCH_SIZE == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def gzipped(chunks):
+    # gzip-encode a stream of text chunks on the fly
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export(kind, format, since=None, gzip=False):
+    chunks = serialize(kind, format, export_rows(kind, since))
+    return gzipped(chunks) if gzip else (chunk.encode('utf-8') for chunk in chunks)
+
+
+@click.command('export')
+@click.argument('kind', type=click.Choice(sorted(EXPORTS)))
+@click.option('--format', 'format', type=click.Choice(sorted(FORMATS)), default='csv', show_default=True)
+@click.option('--since', help='Only rows changed at or after this ISO timestamp.')
+@click.option('--gzip', is_flag=True, help='gzip the output.')
+@click.option('--output', '-o', type=click.Path(dir_okay=False), help='Write to a file instead of stdout.')
+@with_appcontext
+def export_command(kind, format, since, gzip, output):
+    """Export venues, artists or shows as CSV or JSONL."""
+    try:
+        since = parse_since(since)
+    except ValueError:
+        raise click.BadParameter('expected an ISO timestamp', param_hint='--since')
+    out = open(output, 'wb') if output else sys.stdout.buffer
+    try:
+        for data in export(kind, format, since, gzip):
+            out.write(data)
+    finally:
+        if output:
+            out.close()
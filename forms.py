@@ -1,9 +1,10 @@
 from datetime import datetime
 from flask_wtf import Form, FlaskForm
-from wtforms import StringField, SelectField, SelectMultipleField, DateTimeField, BooleanField, ValidationError, IntegerField
-from wtforms.validators import DataRequired, AnyOf, URL, NumberRange
+from wtforms import StringField, SelectField, SelectMultipleField, DateTimeField, BooleanField, ValidationError, IntegerField, FloatField
+from wtforms.validators import DataRequired, AnyOf, URL, NumberRange, Optional
 from wtforms import ValidationError
 import phonenumbers
+from models import SHOW_DURATION_DEFAULT, SHOW_DURATION_MAX
 
 class ShowForm(Form):
     artist_id = StringField(
@@ -17,6 +18,11 @@ class ShowForm(Form):
         validators=[DataRequired()],
         default= datetime.today()
     )
+    duration = IntegerField(
+        'duration',
+        validators=[NumberRange(min=1, max=SHOW_DURATION_MAX)],
+        default=SHOW_DURATION_DEFAULT
+    )
 
 class VenueForm(Form):
     name = StringField(
@@ -127,6 +133,14 @@ class VenueForm(Form):
         'seeking_description',validators=[DataRequired()]
     )
 
+    # Optional: without them the venue is placed at its city (see geo.py)
+    latitude = FloatField(
+        'latitude', validators=[Optional(), NumberRange(min=-90, max=90)]
+    )
+    longitude = FloatField(
+        'longitude', validators=[Optional(), NumberRange(min=-180, max=180)]
+    )
+
 
 
 class ArtistForm(Form):
@@ -0,0 +1,110 @@
+from sqlalchemy import event, func, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import attributes
+from models import db, Venue, Artist, Genre, venue_genres, artist_genres
+
+# Normalized genres.
+#
+# Venue.genres / Artist.genres keep the comma-joined string the forms and
+# pages use. Mapper events mirror it into Genre and the VenueGenre /
+# ArtistGenre link tables in the same transaction, so genre filters are a
+# join on the links' (genre_id, owner id) primary key instead of a scan of
+# every genres string. Bulk writes that bypass the ORM call reindex().
+
+LINKS = {
+    Venue: (venue_genres, venue_genres.c.venue_id),
+    Artist: (artist_genres, artist_genres.c.artist_id),
+}
+
+BATCH_SIZE = 1000
+
+
+def split(value):
+    # Genre names of a comma-joined string (or list), stripped and de-duplicated
+    if not value:
+        return []
+    names = value if isinstance(value, (list, tuple)) else value.split(',')
+    result = []
+    for name in names:
+        name = name.strip()
+        if name and name not in result:
+            result.append(name)
+    return result
+
+
+def genre_ids(connection, names):
+    # {name: id} for `names`, creating the missing genres
+    table = Genre.__table__
+    found = dict(connection.execute(
+        select(table.c.name, table.c.id).where(table.c.name.in_(names))).all())
+    missing = [name for name in names if name not in found]
+    if missing:
+        dialect = connection.dialect.name
+        if dialect in ('postgresql', 'sqlite'):
+            # Another transaction may be adding the same genre
+            insert = (postgresql if dialect == 'postgresql' else sqlite).insert
+            statement = insert(table).on_conflict_do_nothing(index_elements=[table.c.name])
+        else:
+            statement = table.insert()
+        connection.execute(statement, [{'name': name} for name in missing])
+        found.update(connection.execute(
+            select(table.c.name, table.c.id).where(table.c.name.in_(missing))).all())
+    return found
+
+
+def link(connection, model, values):
+    # Replace the genre links of the owners in `values` ({id: genres string})
+    table, owner_column = LINKS[model]
+    connection.execute(table.delete().where(owner_column.in_(list(values))))
+    names = sorted({name for value in values.values() for name in split(value)})
+    if not names:
+        return
+    ids = genre_ids(connection, names)
+    connection.execute(table.insert(), [
+        {'genre_id': ids[name], owner_column.name: owner_id}
+        for owner_id, value in values.items() for name in split(value)])
+
+
+def relink(mapper, connection, target):
+    if attributes.get_history(target, 'genres').has_changes():
+        link(connection, type(target), {target.id: target.genres})
+
+
+def unlink(mapper, connection, target):
+    # Before the owner's row goes, as the links reference it
+    table, owner_column = LINKS[type(target)]
+    connection.execute(table.delete().where(owner_column == target.id))
+
+
+for model in LINKS:
+    event.listen(model, 'after_insert', relink)
+    event.listen(model, 'after_update', relink)
+    event.listen(model, 'before_delete', unlink)
+
+
+def reindex(model, *criteria):
+    # Rebuild the links of `model` rows matching `criteria` (all rows when
+    # none), e.g. after bulk inserts that skip the mapper events
+    connection = db.session.connection()
+    query = db.session.query(model.id, model.genres).filter(*criteria).order_by(model.id)
+    batch = {}
+    for owner_id, value in query.yield_per(BATCH_SIZE):
+        batch[owner_id] = value
+        if len(batch) == BATCH_SIZE:
+            link(connection, model, batch)
+            batch = {}
+    if batch:
+        link(connection, model, batch)
+
+
+def with_genre(model, name):
+    # Filter criterion: `model` rows listing genre `name` (case-insensitive)
+    table, owner_column = LINKS[model]
+    return model.id.in_(
+        select(owner_column)
+        .join(Genre, Genre.id == table.c.genre_id)
+        .where(func.lower(Genre.name) == name.strip().lower()))
+
+
+def all_names():
+    return [name for (name,) in db.session.query(Genre.name).order_by(Genre.name)]
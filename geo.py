@@ -0,0 +1,187 @@
+import csv
+import math
+from collections import Counter
+from datetime import datetime
+from functools import lru_cache
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import bindparam, event, inspect, or_, update
+from models import db, Venue
+from conditional import bump
+
+# Venue locations and "venues near a point".
+#
+# Venue.latitude/longitude come from imports (or the create form) and
+# otherwise from the bundled gazetteer of city centroids
+# (GAZETTEER_PATH, data/gazetteer.csv), looked up by (city, state) when a
+# venue is created or changes city; `flask geocode` fills in the venues
+# written by Core inserts or before the columns existed.
+#
+# Venue.geocell is the venue's cell of a GRID_DEGREES grid, numbered row by
+# row (cell = row * COLUMNS + column), so the cells of one row of a search
+# area are one contiguous range of ix_Venue_geocell. A radius query reads
+# the cells of the circle's bounding box -- one index range per grid row --
+# then keeps the venues really within the radius and ranks them.
+
+GRID_DEGREES = 0.1                       # ~11 km of latitude
+COLUMNS = round(360 / GRID_DEGREES)
+EARTH_RADIUS_KM = 6371.0
+
+# Venues this close count as equally near; they rank by upcoming shows
+RING_KM = 1.0
+
+
+def cell_row(latitude):
+    return int((latitude + 90) // GRID_DEGREES)
+
+
+def cell_column(longitude):
+    return int((longitude + 180) // GRID_DEGREES) % COLUMNS
+
+
+def cell_of(latitude, longitude):
+    return cell_row(latitude) * COLUMNS + cell_column(longitude)
+
+
+def cell_ranges(latitude, longitude, radius_km):
+    # Inclusive (first, last) cell ranges covering the circle's bounding box
+    delta = math.degrees(radius_km / EARTH_RADIUS_KM)
+    south, north = max(-90.0, latitude - delta), min(90.0, latitude + delta)
+    # The box is widest at the latitude farthest from the equator
+    widest = math.cos(math.radians(max(abs(south), abs(north))))
+    if widest <= 0 or delta / widest >= 180:
+        columns = [(0, COLUMNS - 1)]
+    else:
+        west, east = longitude - delta / widest, longitude + delta / widest
+        first, last = cell_column(west), cell_column(east)
+        columns = [(first, last)] if first <= last else [(first, COLUMNS - 1), (0, last)]
+    return [(row * COLUMNS + first, row * COLUMNS + last)
+            for row in range(cell_row(south), cell_row(north) + 1)
+            for first, last in columns]
+
+
+def distance_km(latitude, longitude, other_latitude, other_longitude):
+    # Haversine great-circle distance
+    phi1, phi2 = math.radians(latitude), math.radians(other_latitude)
+    half_dphi = (phi2 - phi1) / 2
+    half_dlambda = math.radians(other_longitude - longitude) / 2
+    a = math.sin(half_dphi) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(half_dlambda) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(min(1.0, a)))
+
+
+#  Gazetteer
+#  ----------------------------------------------------------------
+
+@lru_cache(maxsize=None)
+def gazetteer(path):
+    # (city, state) -> (latitude, longitude), read once per worker
+    with open(path, newline='', encoding='utf-8') as f:
+        return {place_key(row['city'], row['state']): (float(row['latitude']), float(row['longitude']))
+                for row in csv.DictReader(f)}
+
+
+def place_key(city, state):
+    return (city or '').strip().lower(), (state or '').strip().upper()
+
+
+def lookup(city, state):
+    return gazetteer(current_app.config['GAZETTEER_PATH']).get(place_key(city, state))
+
+
+def locate_venue(venue, moved):
+    # Coordinates set on the venue win; otherwise its city's, when it has
+    # none yet or `moved`. Blank form fields set them to None: not given.
+    state = inspect(venue)
+    given = (venue.latitude is not None and venue.longitude is not None
+             and any(state.attrs[name].history.has_changes() for name in ('latitude', 'longitude')))
+    if not given and (moved or venue.latitude is None or venue.longitude is None):
+        venue.latitude, venue.longitude = lookup(venue.city, venue.state) or (None, None)
+    located = venue.latitude is not None and venue.longitude is not None
+    venue.geocell = cell_of(venue.latitude, venue.longitude) if located else None
+
+
+@event.listens_for(Venue, 'before_insert')
+def locate_new_venue(mapper, connection, venue):
+    locate_venue(venue, moved=False)
+
+
+@event.listens_for(Venue, 'before_update')
+def locate_moved_venue(mapper, connection, venue):
+    state = inspect(venue)
+    moved = any(state.attrs[name].history.has_changes() for name in ('city', 'state'))
+    locate_venue(venue, moved)
+
+
+def locate(*criteria):
+    # Core version for bulk writes: fill in the missing coordinates of the
+    # venues matching `criteria` from the gazetteer, and set their cells.
+    # Coordinates are exported, so the venues count as changed (updated_at).
+    # Returns the number of venues located and a Counter of the (city,
+    # state) not in the gazetteer.
+    rows = db.session.query(Venue.id, Venue.city, Venue.state, Venue.latitude, Venue.longitude
+                            ).filter(*criteria).all()
+    updates, unknown = [], Counter()
+    for venue_id, city, state, latitude, longitude in rows:
+        if latitude is None or longitude is None:
+            latitude, longitude = lookup(city, state) or (None, None)
+        if latitude is None:
+            unknown[(city, state)] += 1
+            continue
+        updates.append({'venue_id': venue_id, 'latitude': latitude, 'longitude': longitude,
+                        'geocell': cell_of(latitude, longitude)})
+    if updates:
+        table = Venue.__table__
+        db.session.execute(
+            update(table).where(table.c.id == bindparam('venue_id'))
+            .values(latitude=bindparam('latitude'), longitude=bindparam('longitude'),
+                    geocell=bindparam('geocell'), updated_at=datetime.utcnow()),
+            updates)
+    return len(updates), unknown
+
+
+#  Radius search
+#  ----------------------------------------------------------------
+
+def near(latitude, longitude, radius_km, limit):
+    # Venues within `radius_km`, nearest first; venues in the same RING_KM
+    # ring rank by upcoming shows
+    ranges = cell_ranges(latitude, longitude, radius_km)
+    rows = db.session.query(
+            Venue.id, Venue.name, Venue.address, Venue.city, Venue.state,
+            Venue.latitude, Venue.longitude, Venue.upcoming_shows_count
+        ).filter(or_(*(Venue.geocell.between(first, last) for first, last in ranges))
+        ).all()
+    found = []
+    for row in rows:
+        distance = distance_km(latitude, longitude, row.latitude, row.longitude)
+        if distance <= radius_km:
+            found.append((distance, row))
+    found.sort(key=lambda item: (int(item[0] // RING_KM), -item[1].upcoming_shows_count, item[0]))
+    return [{
+        "id": row.id,
+        "name": row.name,
+        "address": row.address,
+        "city": row.city,
+        "state": row.state,
+        "distance_km": round(distance, 1),
+        "num_upcoming_shows": row.upcoming_shows_count,
+    } for distance, row in found[:limit]]
+
+
+#  Command
+#  ----------------------------------------------------------------
+
+@click.command('geocode')
+@click.option('--all', 'everything', is_flag=True,
+              help='Recompute every venue, not only those without a grid cell.')
+@with_appcontext
+def geocode_command(everything):
+    """Locate venues from the bundled gazetteer and index their grid cells."""
+    criteria = [] if everything else [Venue.geocell.is_(None)]
+    located, unknown = locate(*criteria)
+    bump('Venue')
+    db.session.commit()
+    click.echo(f"{located} venues located, {sum(unknown.values())} in places not in the gazetteer")
+    for (city, state), count in unknown.most_common(10):
+        click.echo(f"  {city}, {state}: {count}")
@@ -0,0 +1,241 @@
+import csv
+import io
+import json
+import os
+import time
+from datetime import datetime
+from itertools import islice
+from sqlalchemy import func
+import click
+from flask.cli import with_appcontext
+from werkzeug.datastructures import MultiDict
+from models import db, Venue, Artist, Shows, ImportCheckpoint
+from forms import VenueForm, ArtistForm, ShowForm
+from conditional import bump
+import cache
+import counters
+import genres
+import geo
+
+# `flask import venues|artists|shows FILE` -- bulk load CSV or JSONL.
+#
+# Rows are validated with the same WTForms classes as the create pages and
+# written in chunks: each chunk is one transaction holding a batched INSERT
+# (COPY on PostgreSQL) and the ImportCheckpoint row recording how many input
+# rows are done, so re-running the same command after a failure resumes
+# after the last committed chunk.
+
+VENUE_COLUMNS = ['name', 'city', 'state', 'address', 'phone', 'genres', 'image_link',
+                 'facebook_link', 'website_link', 'seeking_talent', 'seeking_description',
+                 'latitude', 'longitude']
+ARTIST_COLUMNS = ['name', 'city', 'state', 'phone', 'genres', 'image_link',
+                  'facebook_link', 'website_link', 'seeking_venue', 'seeking_description']
+SHOW_COLUMNS = ['artist_id', 'venue_id', 'start_time', 'duration']
+
+KINDS = {
+    'venues': (Venue, VenueForm, VENUE_COLUMNS),
+    'artists': (Artist, ArtistForm, ARTIST_COLUMNS),
+    'shows': (Shows, ShowForm, SHOW_COLUMNS),
+}
+
+FALSE_VALUES = ('', '0', 'false', 'f', 'no', 'n', 'off')
+MAX_REPORTED_ERRORS = 20
+
+
+def read_rows(path, format):
+    with open(path, newline='', encoding='utf-8') as f:
+        if format == 'csv':
+            yield from csv.DictReader(f)
+        else:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def formdata(row):
+    # Map an input row onto what the form would receive from the browser
+    data = MultiDict()
+    for key, value in row.items():
+        if value is None:
+            continue
+        if key == 'genres':
+            genres = value if isinstance(value, list) else str(value).split(',')
+            data.setlist(key, [genre.strip() for genre in genres if genre.strip()])
+        elif key in ('seeking_talent', 'seeking_venue'):
+            if str(value).strip().lower() not in FALSE_VALUES:
+                data[key] = 'y'
+        elif key == 'start_time':
+            data[key] = str(value).replace('T', ' ')[:19]
+        else:
+            data[key] = str(value)
+    return data
+
+
+class NameResolver:
+    # Resolves a show's venue/artist given either an id or an exact name
+
+    def __init__(self, model):
+        self.ids = set()
+        self.names = {}
+        for owner_id, name in db.session.query(model.id, model.name).yield_per(10000):
+            self.ids.add(owner_id)
+            # None marks names shared by several rows
+            self.names[name] = None if name in self.names else owner_id
+
+    def resolve(self, value):
+        value = str(value or '').strip()
+        if value.isdigit() and int(value) in self.ids:
+            return int(value)
+        return self.names.get(value)
+
+
+class Importer:
+
+    def __init__(self, kind, path, format, chunk_size, use_copy):
+        self.model, self.form_class, self.columns = KINDS[kind]
+        self.kind = kind
+        self.path = path
+        self.format = format
+        self.chunk_size = chunk_size
+        self.use_copy = use_copy and db.engine.dialect.name == 'postgresql'
+        self.key = f"{kind}:{os.path.abspath(path)}:{os.path.getsize(path)}"
+        self.errors = []
+        self.rejected = 0
+        self.inserted = 0
+        if kind == 'shows':
+            self.venues = NameResolver(Venue)
+            self.artists = NameResolver(Artist)
+
+    def validate(self, line, row):
+        if self.kind == 'shows':
+            row = dict(row)
+            row['artist_id'] = self.artists.resolve(row.get('artist_id', row.get('artist')))
+            row['venue_id'] = self.venues.resolve(row.get('venue_id', row.get('venue')))
+        form = self.form_class(formdata=formdata(row), meta={'csrf': False})
+        errors = dict(form.errors) if not form.validate() else {}
+        if self.kind == 'shows':
+            for field in ('artist_id', 'venue_id'):
+                if row[field] is None:
+                    errors[field] = ['unknown or ambiguous id/name']
+        if errors:
+            self.rejected += 1
+            if len(self.errors) < MAX_REPORTED_ERRORS:
+                self.errors.append(f"row {line}: {errors}")
+            return None
+        record = {column: form[column].data for column in self.columns}
+        if 'genres' in record:
+            record['genres'] = ','.join(record['genres'])
+        if self.kind == 'shows':
+            record['artist_id'] = int(record['artist_id'])
+            record['venue_id'] = int(record['venue_id'])
+        return record
+
+    def write(self, records):
+        if not records:
+            return
+        if self.use_copy:
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            for record in records:
+                writer.writerow([record[column] for column in self.columns])
+            buffer.seek(0)
+            cursor = db.session.connection().connection.cursor()
+            cursor.copy_expert(
+                f'COPY "{self.model.__tablename__}" ({", ".join(self.columns)}) FROM STDIN WITH CSV',
+                buffer)
+        else:
+            db.session.execute(self.model.__table__.insert(), records)
+
+    def last_id(self):
+        return db.session.query(func.max(self.model.id)).scalar() or 0
+
+    def after_write(self, records, last_id):
+        # Core inserts skip the ORM events: refresh counters, genre links,
+        # venue locations, stamps and caches. `last_id` is the highest id before this chunk.
+        if self.kind == 'shows':
+            venue_ids = {record['venue_id'] for record in records}
+            artist_ids = {record['artist_id'] for record in records}
+            counters.recount(Venue, venue_ids)
+            counters.recount(Artist, artist_ids)
+            bump('Show', 'Venue', 'Artist',
+                 *(f'Venue:{venue_id}' for venue_id in venue_ids),
+                 *(f'Artist:{artist_id}' for artist_id in artist_ids))
+            return venue_ids, artist_ids
+        genres.reindex(self.model, self.model.id > last_id)
+        if self.kind == 'venues':
+            geo.locate(Venue.id > last_id)
+        bump(self.model.__tablename__)
+        return set(), set()
+
+    def run(self):
+        checkpoint = ImportCheckpoint.query.get(self.key)
+        start = checkpoint.rows_committed if checkpoint else 0
+        if start:
+            click.echo(f"resuming {self.path} after row {start}")
+        rows = islice(enumerate(read_rows(self.path, self.format), 1), start, None)
+        started = time.perf_counter()
+        done = start
+        touched_venues, touched_artists = set(), set()
+        while True:
+            chunk = list(islice(rows, self.chunk_size))
+            if not chunk:
+                break
+            records = [record for record in (self.validate(line, row) for line, row in chunk) if record]
+            try:
+                last_id = self.last_id()
+                self.write(records)
+                venue_ids, artist_ids = self.after_write(records, last_id)
+                done = chunk[-1][0]
+                db.session.merge(ImportCheckpoint(key=self.key, rows_committed=done,
+                                                  updated_at=datetime.utcnow()))
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                click.echo(f"chunk ending at row {chunk[-1][0]} failed; "
+                           f"re-run to resume after row {done}", err=True)
+                raise
+            touched_venues |= venue_ids
+            touched_artists |= artist_ids
+            self.inserted += len(records)
+            elapsed = time.perf_counter() - started
+            click.echo(f"  {done} rows read, {self.inserted} inserted "
+                       f"({self.inserted / elapsed:,.0f} rows/s)")
+        ImportCheckpoint.query.filter_by(key=self.key).delete()
+        db.session.commit()
+        self.invalidate_caches(touched_venues, touched_artists)
+        return time.perf_counter() - started
+
+    def invalidate_caches(self, venue_ids, artist_ids):
+        if self.kind == 'venues':
+            cache.invalidate('venues')
+        elif self.kind == 'shows':
+            cache.invalidate('venues', 'shows',
+                             *(f'venue:{venue_id}' for venue_id in venue_ids),
+                             *(f'artist:{artist_id}' for artist_id in artist_ids))
+
+    def report(self, elapsed):
+        click.echo(f"{self.kind}: {self.inserted} inserted, {self.rejected} rejected "
+                   f"in {elapsed:.2f}s ({self.inserted / elapsed if elapsed else 0:,.0f} rows/s)")
+        for error in self.errors:
+            click.echo(f"  {error}", err=True)
+        if self.rejected > len(self.errors):
+            click.echo(f"  ... and {self.rejected - len(self.errors)} more", err=True)
+
+
+@click.command('import')
+@click.argument('kind', type=click.Choice(sorted(KINDS)))
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'format', type=click.Choice(['csv', 'jsonl']),
+              help='Input format (default: from the file extension).')
+@click.option('--chunk-size', default=5000, show_default=True,
+              help='Input rows per transaction.')
+@click.option('--no-copy', is_flag=True, help='Use batched INSERTs even on PostgreSQL.')
+@with_appcontext
+def import_command(kind, path, format, chunk_size, no_copy):
+    """Bulk import venues, artists or shows from a CSV or JSONL file."""
+    format = format or ('jsonl' if path.endswith(('.jsonl', '.json')) else 'csv')
+    importer = Importer(kind, path, format, chunk_size, use_copy=not no_copy)
+    elapsed = importer.run()
+    importer.report(elapsed)
+    if importer.rejected:
+        raise click.exceptions.Exit(1)
@@ -0,0 +1,26 @@
+import json
+from datetime import datetime
+from flask import current_app
+
+try:
+    import orjson
+except ImportError:     # optional: falls back to the stdlib encoder
+    orjson = None
+
+# JSON responses shared by the JSON endpoints: the API (api.py) and the
+# form widgets' typeahead (autocomplete.py).
+
+
+def dumps(data):
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, default=datetime.isoformat, separators=(',', ':'))
+
+
+def json_response(data, status=200):
+    return current_app.response_class(dumps(data), status=status, mimetype='application/json')
+
+
+def json_error(error):
+    # Error handler: HTTP errors as {"error": ..., "message": ...}
+    return json_response({"error": error.name, "message": error.description}, error.code)
@@ -0,0 +1,171 @@
+import hmac
+import threading
+import time
+from collections import defaultdict
+from flask import Response, abort, current_app, g, has_request_context, request
+from jinja2 import Template
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Per-request instrumentation: latency, SQL statements and time (engine
+# events, on every bind), and template render time. Recorded into
+# in-process histograms served at /metrics in the Prometheus text format,
+# and summed up for the browser in a Server-Timing header.
+#
+# Each worker process keeps its own numbers; Prometheus sums them per
+# instance label.
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+
+class Histogram:
+
+    def __init__(self, name, help, labels, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        self.lock = threading.Lock()
+        # label values -> [bucket counts..., +Inf count, sum]
+        self.series = defaultdict(lambda: [0] * (len(buckets) + 2))
+
+    def observe(self, value, *label_values):
+        with self.lock:
+            series = self.series[label_values]
+            for position, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[position] += 1
+            series[-2] += 1
+            series[-1] += value
+
+    def expose(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self.lock:
+            series = {key: list(values) for key, values in self.series.items()}
+        for label_values, values in sorted(series.items()):
+            labels = format_labels(self.labels, label_values)
+            for bound, count in zip(self.buckets, values):
+                lines.append(f'{self.name}_bucket{{{labels},le="{bound}"}} {count}')
+            lines.append(f'{self.name}_bucket{{{labels},le="+Inf"}} {values[-2]}')
+            lines.append(f"{self.name}_count{{{labels}}} {values[-2]}")
+            lines.append(f"{self.name}_sum{{{labels}}} {values[-1]:.6f}")
+        return lines
+
+
+class Counter:
+
+    def __init__(self, name, help, labels):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.lock = threading.Lock()
+        self.series = defaultdict(int)
+
+    def inc(self, *label_values):
+        with self.lock:
+            self.series[label_values] += 1
+
+    def expose(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self.lock:
+            series = dict(self.series)
+        for label_values, value in sorted(series.items()):
+            lines.append(f"{self.name}{{{format_labels(self.labels, label_values)}}} {value}")
+        return lines
+
+
+def format_labels(names, values):
+    def escape(value):
+        return str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+    return ','.join(f'{name}="{escape(value)}"' for name, value in zip(names, values))
+
+
+REQUESTS = Counter('fyyur_requests_total', 'Requests by endpoint, method and status.',
+                   ('endpoint', 'method', 'status'))
+LATENCY = Histogram('fyyur_request_duration_seconds', 'Request latency (up to the response '
+                    'being returned; streamed bodies excluded).', ('endpoint', 'method'))
+DB_TIME = Histogram('fyyur_db_duration_seconds', 'Time spent executing SQL per request.',
+                    ('endpoint',))
+DB_QUERIES = Histogram('fyyur_db_queries_per_request', 'SQL statements executed per request.',
+                       ('endpoint',), QUERY_COUNT_BUCKETS)
+RENDER_TIME = Histogram('fyyur_template_render_seconds', 'Template render time per request.',
+                        ('endpoint',))
+
+METRICS = (REQUESTS, LATENCY, DB_TIME, DB_QUERIES, RENDER_TIME)
+
+
+#  Collection
+#  ----------------------------------------------------------------
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def before_cursor_execute(connection, cursor, statement, parameters, context, executemany):
+    if has_request_context():
+        context._metrics_started = time.perf_counter()
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def after_cursor_execute(connection, cursor, statement, parameters, context, executemany):
+    started = getattr(context, '_metrics_started', None)
+    if started is not None and has_request_context():
+        g.db_time = g.get('db_time', 0) + time.perf_counter() - started
+        g.db_queries = g.get('db_queries', 0) + 1
+
+
+class TimedTemplate(Template):
+    # Adds each top-level render to the request's render time (extends and
+    # includes render inside it)
+
+    def render(self, *args, **kwargs):
+        if not has_request_context():
+            return Template.render(self, *args, **kwargs)
+        started = time.perf_counter()
+        try:
+            return Template.render(self, *args, **kwargs)
+        finally:
+            g.render_time = g.get('render_time', 0) + time.perf_counter() - started
+
+
+def start_timer():
+    g.request_started = time.perf_counter()
+
+
+def record(response):
+    started = g.pop('request_started', None)
+    if started is None:
+        return response
+    elapsed = time.perf_counter() - started
+    endpoint = request.endpoint or 'unmatched'
+    db_time = g.get('db_time', 0)
+    db_queries = g.get('db_queries', 0)
+    render_time = g.get('render_time', 0)
+    REQUESTS.inc(endpoint, request.method, response.status_code)
+    LATENCY.observe(elapsed, endpoint, request.method)
+    DB_TIME.observe(db_time, endpoint)
+    DB_QUERIES.observe(db_queries, endpoint)
+    RENDER_TIME.observe(render_time, endpoint)
+    response.headers.add('Server-Timing', ', '.join([
+        f'db;dur={db_time * 1000:.1f};desc="{db_queries} queries"',
+        f'render;dur={render_time * 1000:.1f}',
+        f'total;dur={elapsed * 1000:.1f}',
+    ]))
+    return response
+
+
+def expose():
+    token = current_app.config.get('METRICS_TOKEN')
+    if token and not hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        abort(401)
+    lines = []
+    for metric in METRICS:
+        lines.extend(metric.expose())
+    return Response('\n'.join(lines) + '\n', mimetype='text/plain; version=0.0.4')
+
+
+def init_app(app):
+    # Templates loaded from now on are TimedTemplates
+    app.jinja_env.template_class = TimedTemplate
+    app.before_request(start_timer)
+    app.after_request(record)
+    if app.config.get('METRICS_ENDPOINT'):
+        app.add_url_rule('/metrics', 'metrics', expose)
@@ -0,0 +1,78 @@
+"""add search indexes for venues and artists
+
+Revision ID: 7c2e5d8a41f3
+Revises: 3b1f0c2a9d4e
+Create Date: 2026-10-18 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7c2e5d8a41f3'
+down_revision = '3b1f0c2a9d4e'
+branch_labels = None
+depends_on = None
+
+
+# Must stay identical to search.SEARCH_DOCUMENT so the planner can use the index
+SEARCH_DOCUMENT = (
+    "to_tsvector('simple', coalesce(name, '') || ' ' || "
+    "coalesce(city, '') || ' ' || coalesce(genres, ''))"
+)
+
+TABLES = {'Venue': 'venue', 'Artist': 'artist'}
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        for table, prefix in TABLES.items():
+            op.execute(
+                f'CREATE INDEX ix_{prefix}_search_document ON "{table}" '
+                f'USING gin ({SEARCH_DOCUMENT})'
+            )
+            op.execute(
+                f'CREATE INDEX ix_{prefix}_name_trgm ON "{table}" '
+                f'USING gin (name gin_trgm_ops)'
+            )
+    elif dialect == 'sqlite':
+        # External-content FTS5 tables kept in sync with triggers
+        for table, prefix in TABLES.items():
+            op.execute(
+                f"CREATE VIRTUAL TABLE {prefix}_search USING fts5("
+                f"name, city, genres, content='{table}', content_rowid='id')"
+            )
+            op.execute(
+                f'CREATE TRIGGER {prefix}_search_ai AFTER INSERT ON "{table}" BEGIN '
+                f'INSERT INTO {prefix}_search(rowid, name, city, genres) '
+                f'VALUES (new.id, new.name, new.city, new.genres); END'
+            )
+            op.execute(
+                f'CREATE TRIGGER {prefix}_search_ad AFTER DELETE ON "{table}" BEGIN '
+                f"INSERT INTO {prefix}_search({prefix}_search, rowid, name, city, genres) "
+                f"VALUES ('delete', old.id, old.name, old.city, old.genres); END"
+            )
+            op.execute(
+                f'CREATE TRIGGER {prefix}_search_au AFTER UPDATE ON "{table}" BEGIN '
+                f"INSERT INTO {prefix}_search({prefix}_search, rowid, name, city, genres) "
+                f"VALUES ('delete', old.id, old.name, old.city, old.genres); "
+                f'INSERT INTO {prefix}_search(rowid, name, city, genres) '
+                f'VALUES (new.id, new.name, new.city, new.genres); END'
+            )
+            op.execute(f"INSERT INTO {prefix}_search({prefix}_search) VALUES ('rebuild')")
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        for table, prefix in TABLES.items():
+            op.execute(f'DROP INDEX IF EXISTS ix_{prefix}_name_trgm')
+            op.execute(f'DROP INDEX IF EXISTS ix_{prefix}_search_document')
+    elif dialect == 'sqlite':
+        for table, prefix in TABLES.items():
+            for suffix in ('ai', 'ad', 'au'):
+                op.execute(f'DROP TRIGGER IF EXISTS {prefix}_search_{suffix}')
+            op.execute(f'DROP TABLE IF EXISTS {prefix}_search')
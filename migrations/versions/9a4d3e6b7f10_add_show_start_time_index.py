@@ -0,0 +1,24 @@
+"""add Show (start_time, id) index for keyset pagination
+
+Revision ID: 9a4d3e6b7f10
+Revises: 7c2e5d8a41f3
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9a4d3e6b7f10'
+down_revision = '7c2e5d8a41f3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_Show_start_time_id', 'Show', ['start_time', 'id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_Show_start_time_id', table_name='Show')
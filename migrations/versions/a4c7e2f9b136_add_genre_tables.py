@@ -0,0 +1,69 @@
+"""normalize genres into Genre and the VenueGenre/ArtistGenre link tables
+
+Revision ID: a4c7e2f9b136
+Revises: f3a9d1b6c852
+Create Date: 2026-10-18 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a4c7e2f9b136'
+down_revision = 'f3a9d1b6c852'
+branch_labels = None
+depends_on = None
+
+
+def split(value):
+    names = []
+    for name in (value or '').split(','):
+        name = name.strip()
+        if name and name not in names:
+            names.append(name)
+    return names
+
+
+def upgrade():
+    genre = op.create_table('Genre',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=120), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('name')
+    )
+    links = {}
+    for table, column in (('Venue', 'venue_id'), ('Artist', 'artist_id')):
+        links[table] = op.create_table(f'{table}Genre',
+        sa.Column('genre_id', sa.Integer(), nullable=False),
+        sa.Column(column, sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['genre_id'], ['Genre.id'], ),
+        sa.ForeignKeyConstraint([column], [f'{table}.id'], ),
+        sa.PrimaryKeyConstraint('genre_id', column)
+        )
+        op.create_index(f'ix_{table}Genre_{column}', f'{table}Genre', [column], unique=False)
+
+    # Backfill from the comma-joined strings
+    connection = op.get_bind()
+    owners = {}
+    for table in ('Venue', 'Artist'):
+        owners[table] = [(owner_id, split(value)) for owner_id, value in
+                         connection.execute(sa.text(f'SELECT id, genres FROM "{table}"'))]
+    names = sorted({name for rows in owners.values() for _, row_names in rows for name in row_names})
+    if not names:
+        return
+    op.bulk_insert(genre, [{'name': name} for name in names])
+    ids = dict(connection.execute(sa.text('SELECT name, id FROM "Genre"')).all())
+    for table, column in (('Venue', 'venue_id'), ('Artist', 'artist_id')):
+        rows = [{'genre_id': ids[name], column: owner_id}
+                for owner_id, row_names in owners[table] for name in row_names]
+        if rows:
+            op.bulk_insert(links[table], rows)
+
+
+def downgrade():
+    op.drop_index('ix_ArtistGenre_artist_id', table_name='ArtistGenre')
+    op.drop_table('ArtistGenre')
+    op.drop_index('ix_VenueGenre_venue_id', table_name='VenueGenre')
+    op.drop_table('VenueGenre')
+    op.drop_table('Genre')
@@ -0,0 +1,33 @@
+"""add Show.duration (minutes) for booking conflict checks
+
+Revision ID: b7d4e1f8a2c9
+Revises: a4c7e2f9b136
+Create Date: 2026-10-18 18:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7d4e1f8a2c9'
+down_revision = 'a4c7e2f9b136'
+branch_labels = None
+depends_on = None
+
+
+# Must stay identical to models.SHOW_DURATION_DEFAULT / SHOW_DURATION_MAX
+DEFAULT = 120
+MAXIMUM = 24 * 60
+
+
+def upgrade():
+    with op.batch_alter_table('Show') as batch_op:
+        batch_op.add_column(sa.Column('duration', sa.Integer(), server_default=str(DEFAULT), nullable=False))
+        batch_op.create_check_constraint('ck_Show_duration', f'duration BETWEEN 1 AND {MAXIMUM}')
+
+
+def downgrade():
+    with op.batch_alter_table('Show') as batch_op:
+        batch_op.drop_constraint('ck_Show_duration', type_='check')
+        batch_op.drop_column('duration')
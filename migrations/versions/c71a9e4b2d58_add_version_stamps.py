@@ -0,0 +1,36 @@
+"""add Version table for conditional GET stamps
+
+Revision ID: c71a9e4b2d58
+Revises: b5e8f1c23a67
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from datetime import datetime
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c71a9e4b2d58'
+down_revision = 'b5e8f1c23a67'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    version = op.create_table('Version',
+    sa.Column('key', sa.String(length=120), nullable=False),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('key')
+    )
+    # Table-level stamps start at the migration time
+    now = datetime.utcnow()
+    op.bulk_insert(version, [
+        {'key': table, 'version': 1, 'updated_at': now}
+        for table in ('Venue', 'Artist', 'Show')
+    ])
+
+
+def downgrade():
+    op.drop_table('Version')
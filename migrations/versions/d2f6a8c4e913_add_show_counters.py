@@ -0,0 +1,48 @@
+"""add denormalized show counters to Venue and Artist
+
+Revision ID: d2f6a8c4e913
+Revises: c71a9e4b2d58
+Create Date: 2026-10-18 13:00:00.000000
+
+"""
+from datetime import datetime
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd2f6a8c4e913'
+down_revision = 'c71a9e4b2d58'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    for table in ('Venue', 'Artist'):
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.add_column(sa.Column('upcoming_shows_count', sa.Integer(), server_default='0', nullable=False))
+            batch_op.add_column(sa.Column('past_shows_count', sa.Integer(), server_default='0', nullable=False))
+    counters = op.create_table('ShowCounters',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('cutoff', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    # Backfill, splitting existing shows at the migration time
+    cutoff = datetime.now()
+    op.bulk_insert(counters, [{'id': 1, 'cutoff': cutoff}])
+    for table, column in (('Venue', 'venue_id'), ('Artist', 'artist_id')):
+        op.execute(sa.text(
+            f'UPDATE "{table}" SET '
+            f'upcoming_shows_count = (SELECT count(*) FROM "Show" '
+            f'WHERE "Show".{column} = "{table}".id AND "Show".start_time >= :cutoff), '
+            f'past_shows_count = (SELECT count(*) FROM "Show" '
+            f'WHERE "Show".{column} = "{table}".id AND "Show".start_time < :cutoff)'
+        ).bindparams(cutoff=cutoff))
+
+
+def downgrade():
+    op.drop_table('ShowCounters')
+    for table in ('Artist', 'Venue'):
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.drop_column('past_shows_count')
+            batch_op.drop_column('upcoming_shows_count')
@@ -0,0 +1,32 @@
+"""add Venue.latitude/longitude and the geocell grid index
+
+Revision ID: d9f6a3b1c4e7
+Revises: c8e5f2a9b3d1
+Create Date: 2026-10-18 20:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd9f6a3b1c4e7'
+down_revision = 'c8e5f2a9b3d1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Existing venues are located afterwards by `flask geocode`
+    op.add_column('Venue', sa.Column('latitude', sa.Float(), nullable=True))
+    op.add_column('Venue', sa.Column('longitude', sa.Float(), nullable=True))
+    op.add_column('Venue', sa.Column('geocell', sa.Integer(), nullable=True))
+    op.create_index('ix_Venue_geocell', 'Venue', ['geocell'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('Venue') as batch_op:
+        batch_op.drop_index('ix_Venue_geocell')
+        batch_op.drop_column('geocell')
+        batch_op.drop_column('longitude')
+        batch_op.drop_column('latitude')
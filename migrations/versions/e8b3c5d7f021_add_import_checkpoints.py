@@ -0,0 +1,29 @@
+"""add ImportCheckpoint table for resumable bulk imports
+
+Revision ID: e8b3c5d7f021
+Revises: d2f6a8c4e913
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e8b3c5d7f021'
+down_revision = 'd2f6a8c4e913'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('ImportCheckpoint',
+    sa.Column('key', sa.String(length=500), nullable=False),
+    sa.Column('rows_committed', sa.Integer(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('key')
+    )
+
+
+def downgrade():
+    op.drop_table('ImportCheckpoint')
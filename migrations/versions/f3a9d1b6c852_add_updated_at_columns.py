@@ -0,0 +1,34 @@
+"""add updated_at to Venue, Artist and Show for incremental exports
+
+Revision ID: f3a9d1b6c852
+Revises: e8b3c5d7f021
+Create Date: 2026-10-18 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3a9d1b6c852'
+down_revision = 'e8b3c5d7f021'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    sqlite = op.get_bind().dialect.name == 'sqlite'
+    for table in ('Venue', 'Artist', 'Show'):
+        # SQLite cannot add a column with a non-constant default
+        default = "'1970-01-01 00:00:00'" if sqlite else 'CURRENT_TIMESTAMP'
+        op.add_column(table, sa.Column('updated_at', sa.DateTime(), server_default=sa.text(default), nullable=False))
+        if sqlite:
+            op.execute(f'UPDATE "{table}" SET updated_at = CURRENT_TIMESTAMP')
+        op.create_index(f'ix_{table}_updated_at', table, ['updated_at'], unique=False)
+
+
+def downgrade():
+    for table in ('Show', 'Artist', 'Venue'):
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.drop_index(f'ix_{table}_updated_at')
+            batch_op.drop_column('updated_at')
@@ -1,60 +1,161 @@
-from flask_sqlalchemy import SQLAlchemy
-from datetime import datetime
-db = SQLAlchemy()
-
-# Models for Artists, Venues, Shows
-
-class Venue(db.Model):
-    __tablename__ = 'Venue'
-
-    id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String)
-    city = db.Column(db.String(120))
-    state = db.Column(db.String(120))
-    address = db.Column(db.String(120))
-    phone = db.Column(db.Integer())
-    image_link = db.Column(db.String(500))
-    facebook_link = db.Column(db.String(120))
-
-    # TODO: implement any missing fields, as a database migration using Flask-Migrate
-    genres = db.Column(db.String(120))           
-    website_link = db.Column(db.String(120))     
-    seeking_talent = db.Column(db.Boolean, nullable=False, default=False)
-    seeking_description = db.Column(db.String(500))  
-    show = db.relationship('Shows', backref='venue', lazy=True)
-
-    def __repr__(self):
-      return f"Venue ID: {self.id}, Venue Name: {self.name}, Venue City: {self.city}, Venue State: {self.state}, Venue Address: {self.address}, Venue Phone: {self.phone}, Venue Image-Link: {self.image_link}, FB-Link: {self.facebook_link}, Venue Genres: {self.genres}, Venue Website-link: {self.website_link}, Venue Seek talent: {self.seeking_talent}"
-
-class Artist(db.Model):
-    __tablename__ = 'Artist'
-
-    id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String)
-    city = db.Column(db.String(120))
-    state = db.Column(db.String(120))
-    phone = db.Column(db.Integer())
-    genres = db.Column(db.String(120))
-    image_link = db.Column(db.String(500))
-    facebook_link = db.Column(db.String(120))
-
-    # TODO: implement any missing fields, as a database migration using Flask-Migrate
-    website_link = db.Column(db.String(120))       
-    seeking_venue = db.Column(db.Boolean, nullable=False, default=False)
-    seeking_description = db.Column(db.String(500)) 
-    show = db.relationship('Shows', backref='artist', lazy=True)
-
-    def __repr__(self):
-      return f"Venue ID: {self.id}, Venue Name: {self.name}, Venue City: {self.city}, Venue State: {self.state}, Venue Address: {self.address}, Venue Phone: {self.phone}, Venue Image-Link: {self.image_link}, FB-Link: {self.facebook_link}, Venue Genres: {self.genres}, Venue Website-link: {self.website_link}, Venue Seek Venue: {self.seeking_venue}"
-
-# TODO Implement Show and Artist models, and complete all model relationships and properties, as a database migration.
-class Shows(db.Model):
-    __tablename__ = 'Show'
-
-    id = db.Column(db.Integer, primary_key=True)  
-    start_time = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
-    artist_id = db.Column(db.Integer, db.ForeignKey('Artist.id'),nullable=False)
-    venue_id = db.Column(db.Integer, db.ForeignKey('Venue.id'),nullable=False)
-
-    def __repr__(self):
-      return f"Show ID: {self.id}, Show Start: {self.start_time}, Show Artist: {self.artist_id}, Show Venue: {self.venue_id}"
+from datetime import datetime, timedelta
+from database import RoutingSQLAlchemy
+db = RoutingSQLAlchemy()         # pool options and read replicas, see database.py
+
+# Models for Artists, Venues, Shows
+
+class Venue(db.Model):
+    __tablename__ = 'Venue'
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String)
+    city = db.Column(db.String(120))
+    state = db.Column(db.String(120))
+    address = db.Column(db.String(120))
+    phone = db.Column(db.Integer())
+    image_link = db.Column(db.String(500))
+    facebook_link = db.Column(db.String(120))
+
+    # TODO: implement any missing fields, as a database migration using Flask-Migrate
+    genres = db.Column(db.String(120))           
+    website_link = db.Column(db.String(120))     
+    seeking_talent = db.Column(db.Boolean, nullable=False, default=False)
+    seeking_description = db.Column(db.String(500))  
+    show = db.relationship('Shows', backref='venue', lazy=True)
+
+    # Denormalized show counts, maintained by counters.py
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    past_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
+    # Location, from imports or the gazetteer, and its grid cell (see geo.py)
+    latitude = db.Column(db.Float)
+    longitude = db.Column(db.Float)
+    geocell = db.Column(db.Integer, index=True)
+
+    # Last change, for incremental exports
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow,
+                           onupdate=datetime.utcnow, server_default=db.func.now(), index=True)
+
+    def __repr__(self):
+      return f"Venue ID: {self.id}, Venue Name: {self.name}, Venue City: {self.city}, Venue State: {self.state}, Venue Address: {self.address}, Venue Phone: {self.phone}, Venue Image-Link: {self.image_link}, FB-Link: {self.facebook_link}, Venue Genres: {self.genres}, Venue Website-link: {self.website_link}, Venue Seek talent: {self.seeking_talent}"
+
+class Artist(db.Model):
+    __tablename__ = 'Artist'
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String)
+    city = db.Column(db.String(120))
+    state = db.Column(db.String(120))
+    phone = db.Column(db.Integer())
+    genres = db.Column(db.String(120))
+    image_link = db.Column(db.String(500))
+    facebook_link = db.Column(db.String(120))
+
+    # TODO: implement any missing fields, as a database migration using Flask-Migrate
+    website_link = db.Column(db.String(120))       
+    seeking_venue = db.Column(db.Boolean, nullable=False, default=False)
+    seeking_description = db.Column(db.String(500)) 
+    show = db.relationship('Shows', backref='artist', lazy=True)
+
+    # Denormalized show counts, maintained by counters.py
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    past_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
+    # Last change, for incremental exports
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow,
+                           onupdate=datetime.utcnow, server_default=db.func.now(), index=True)
+
+    def __repr__(self):
+      return f"Venue ID: {self.id}, Venue Name: {self.name}, Venue City: {self.city}, Venue State: {self.state}, Venue Address: {self.address}, Venue Phone: {self.phone}, Venue Image-Link: {self.image_link}, FB-Link: {self.facebook_link}, Venue Genres: {self.genres}, Venue Website-link: {self.website_link}, Venue Seek Venue: {self.seeking_venue}"
+
+# Show lengths in minutes. The upper bound keeps the overlap check of
+# bookings.py an index range scan.
+SHOW_DURATION_DEFAULT = 120
+SHOW_DURATION_MAX = 24 * 60
+
+# TODO Implement Show and Artist models, and complete all model relationships and properties, as a database migration.
+class Shows(db.Model):
+    __tablename__ = 'Show'
+    __table_args__ = (
+        # keyset pagination of /shows
+        db.Index('ix_Show_start_time_id', 'start_time', 'id'),
+        # past/upcoming sections of the venue and artist pages, booking conflicts
+        db.Index('ix_Show_venue_id_start_time', 'venue_id', 'start_time'),
+        db.Index('ix_Show_artist_id_start_time', 'artist_id', 'start_time'),
+        db.CheckConstraint(f'duration BETWEEN 1 AND {SHOW_DURATION_MAX}', name='ck_Show_duration'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)  
+    start_time = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    artist_id = db.Column(db.Integer, db.ForeignKey('Artist.id'),nullable=False)
+    venue_id = db.Column(db.Integer, db.ForeignKey('Venue.id'),nullable=False)
+    # Minutes; the show occupies its venue and artist for [start_time, end_time)
+    duration = db.Column(db.Integer, nullable=False, default=SHOW_DURATION_DEFAULT,
+                         server_default=str(SHOW_DURATION_DEFAULT))
+    # Last change, for incremental exports
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow,
+                           onupdate=datetime.utcnow, server_default=db.func.now(), index=True)
+
+    @property
+    def end_time(self):
+      return self.start_time + timedelta(minutes=self.duration)
+
+    def __repr__(self):
+      return f"Show ID: {self.id}, Show Start: {self.start_time}, Show Duration: {self.duration}, Show Artist: {self.artist_id}, Show Venue: {self.venue_id}"
+
+# Version stamps for conditional GET (see conditional.py)
+class Version(db.Model):
+    __tablename__ = 'Version'
+
+    key = db.Column(db.String(120), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def __repr__(self):
+      return f"Version Key: {self.key}, Version: {self.version}, Updated At: {self.updated_at}"
+
+# Shows starting before `cutoff` are counted as past in the denormalized
+# counters; the rollover command moves it forward (see counters.py)
+class ShowCounters(db.Model):
+    __tablename__ = 'ShowCounters'
+
+    id = db.Column(db.Integer, primary_key=True)
+    cutoff = db.Column(db.DateTime, nullable=False)
+
+    def __repr__(self):
+      return f"Show Counters Cutoff: {self.cutoff}"
+
+# Progress of `flask import` runs, committed with each chunk (see importer.py)
+class ImportCheckpoint(db.Model):
+    __tablename__ = 'ImportCheckpoint'
+
+    key = db.Column(db.String(500), primary_key=True)
+    rows_committed = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def __repr__(self):
+      return f"Import: {self.key}, Rows Committed: {self.rows_committed}"
+
+# Normalized genres, mirrored from Venue/Artist.genres by genres.py. The
+# (genre_id, owner id) primary keys make "venues/artists of a genre" an index
+# range scan; the owner id indexes serve relinking and deletes.
+class Genre(db.Model):
+    __tablename__ = 'Genre'
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(120), nullable=False, unique=True)
+
+    def __repr__(self):
+      return f"Genre ID: {self.id}, Genre Name: {self.name}"
+
+venue_genres = db.Table('VenueGenre',
+    db.Column('genre_id', db.Integer, db.ForeignKey('Genre.id'), primary_key=True),
+    db.Column('venue_id', db.Integer, db.ForeignKey('Venue.id'), primary_key=True),
+    db.Index('ix_VenueGenre_venue_id', 'venue_id'),
+)
+
+artist_genres = db.Table('ArtistGenre',
+    db.Column('genre_id', db.Integer, db.ForeignKey('Genre.id'), primary_key=True),
+    db.Column('artist_id', db.Integer, db.ForeignKey('Artist.id'), primary_key=True),
+    db.Index('ix_ArtistGenre_artist_id', 'artist_id'),
+)
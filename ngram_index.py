@@ -0,0 +1,193 @@
+import sys
+import threading
+from array import array
+from bisect import bisect_left
+from heapq import nsmallest
+from flask import current_app
+from sqlalchemy import select
+from models import db
+from conditional import index_stamp, stamp
+
+# Optional in-memory substring index over Venue.name / Artist.name.
+#
+# Each n-gram maps to a sorted array('i') of ids (no per-posting Python
+# objects). Queries intersect the postings of the query's n-grams, verify the
+# candidates against the stored name and only then touch the database to
+# fetch the matched rows. Enabled with NGRAM_SEARCH_INDEX in config.py; each
+# worker process keeps its own copy, built from the primary at the model's
+# Version stamp (conditional.py) and rebuilt once the stamp has moved on, so
+# writes and deletes by any worker show up in its searches, within
+# INDEX_STAMP_MAX_AGE seconds: the stamp is re-read at most that often, and
+# in between a search resolves its ids without a query. The worker that made
+# a write updates its copy in place instead (record()).
+
+
+def normalize(name):
+    return ' '.join((name or '').lower().split())
+
+
+class NgramIndex:
+
+    def __init__(self, n=3):
+        self.n = n
+        self.postings = {}      # gram -> sorted array('i') of ids
+        self.names = {}         # id -> normalized name
+        self.lock = threading.RLock()
+
+    def grams(self, text):
+        return {text[i:i + self.n] for i in range(len(text) - self.n + 1)}
+
+    def add(self, doc_id, name):
+        with self.lock:
+            if doc_id in self.names:
+                self.remove(doc_id)
+            text = normalize(name)
+            self.names[doc_id] = text
+            for gram in self.grams(text):
+                ids = self.postings.get(gram)
+                if ids is None:
+                    self.postings[gram] = array('i', [doc_id])
+                    continue
+                position = bisect_left(ids, doc_id)
+                if position == len(ids) or ids[position] != doc_id:
+                    ids.insert(position, doc_id)
+
+    def remove(self, doc_id):
+        with self.lock:
+            text = self.names.pop(doc_id, None)
+            if text is None:
+                return
+            for gram in self.grams(text):
+                ids = self.postings[gram]
+                position = bisect_left(ids, doc_id)
+                if position < len(ids) and ids[position] == doc_id:
+                    del ids[position]
+                if not ids:
+                    del self.postings[gram]
+
+    def candidates(self, term):
+        if len(term) < self.n:
+            # Too short for a full gram: union every gram containing the term
+            found = set()
+            for gram, ids in self.postings.items():
+                if term in gram:
+                    found.update(ids)
+            return found
+        lists = sorted((self.postings.get(gram) for gram in self.grams(term)),
+                       key=lambda ids: len(ids) if ids is not None else 0)
+        if lists[0] is None:
+            return set()
+        found = set(lists[0])
+        for ids in lists[1:]:
+            found.intersection_update(ids)
+            if not found:
+                break
+        return found
+
+    def search(self, term, limit=None):
+        # Ids whose name contains `term`; prefix matches and shorter names first
+        term = normalize(term)
+        with self.lock:
+            matches = []
+            for doc_id in self.candidates(term):
+                name = self.names[doc_id]
+                position = name.find(term)
+                if position >= 0:
+                    matches.append((position != 0, position, len(name), doc_id))
+        if limit is not None:
+            matches = nsmallest(limit, matches)
+        else:
+            matches.sort()
+        return [match[-1] for match in matches]
+
+    def memory_usage(self):
+        # Approximate bytes held by the index (dict tables, keys, arrays, names)
+        with self.lock:
+            size = sys.getsizeof(self.postings) + sys.getsizeof(self.names)
+            for gram, ids in self.postings.items():
+                size += sys.getsizeof(gram) + sys.getsizeof(ids)
+            for doc_id, name in self.names.items():
+                size += sys.getsizeof(doc_id) + sys.getsizeof(name)
+        return size
+
+    def stats(self):
+        return {
+            "documents": len(self.names),
+            "grams": len(self.postings),
+            "postings": sum(len(ids) for ids in self.postings.values()),
+            "bytes": self.memory_usage(),
+        }
+
+
+#  Per-model indexes
+#  ----------------------------------------------------------------
+
+indexes = {}        # (database, table) -> (version, NgramIndex)
+build_lock = threading.Lock()
+
+
+def enabled():
+    return current_app.config.get('NGRAM_SEARCH_INDEX', False)
+
+
+def index_key(model):
+    return str(db.engine.url), model.__tablename__
+
+
+def build(model, version):
+    index = NgramIndex(current_app.config.get('NGRAM_SIZE', 3))
+    with db.engine.connect() as connection:
+        rows = connection.execution_options(stream_results=True).execute(
+            select(model.id, model.name))
+        for doc_id, name in rows:
+            index.add(doc_id, name)
+    current_app.logger.info('ngram index for %s built at version %s: %s',
+                            model.__tablename__, version, index.stats())
+    return index
+
+
+def get_index(model):
+    key = index_key(model)
+    version = index_stamp(model.__tablename__)
+    built = indexes.get(key)
+    # Older: read before the index adopted a write by this worker (record())
+    if built is None or built[0] < version:
+        with build_lock:
+            built = indexes.get(key)
+            if built is None or built[0] < version:
+                built = indexes[key] = (version, build(model, version))
+    return built[1]
+
+
+def record(model, doc_id, name=None):
+    # Called after the successful commit of a write to one row (`name` None:
+    # deleted). The write bumped the stamp once, so when the stamp is now
+    # just one past the index's, no other write happened in between and the
+    # updated index is current; otherwise the next search rebuilds it.
+    key = index_key(model)
+    built = indexes.get(key)
+    if built is None:
+        return
+    version, index = built
+    if name is None:
+        index.remove(doc_id)
+    else:
+        index.add(doc_id, name)
+    with build_lock:
+        if indexes.get(key) is built and stamp(model.__tablename__) == version + 1:
+            indexes[key] = (version + 1, index)
+
+
+def search(model, term, limit=None):
+    # Resolve ids in memory, then fetch only the matched rows
+    ids = get_index(model).search(term, limit)
+    if not ids:
+        return []
+    rows = {row.id: row for row in
+            db.session.query(model.id, model.name, model.upcoming_shows_count
+                            ).filter(model.id.in_(ids))}
+    return [rows[doc_id] for doc_id in ids if doc_id in rows]
+
+
+def stats():
+    return {table: index.stats() for (_, table), (_, index) in indexes.items()}
@@ -0,0 +1,240 @@
+import base64
+import binascii
+from datetime import datetime
+from flask import current_app, abort
+from sqlalchemy import func, tuple_
+from models import db, Venue, Artist, Shows
+
+# Query functions shared by the HTML views (app.py), the JSON API (api.py)
+# and the async views (asgi.py), so all go through the same indexes. The
+# *_query variants return the unexecuted query; asgi.py runs their
+# .statement on the async engine.
+#   Show(start_time, id)                       shows_page
+#   Show(venue_id|artist_id, start_time)       show_section, show_counts,
+#                                              upcoming_summaries
+
+# Selectable columns, by public field name
+VENUE_FIELDS = {
+    'id': Venue.id,
+    'name': Venue.name,
+    'city': Venue.city,
+    'state': Venue.state,
+    'address': Venue.address,
+    'phone': Venue.phone,
+    'genres': Venue.genres,
+    'image_link': Venue.image_link,
+    'facebook_link': Venue.facebook_link,
+    'website_link': Venue.website_link,
+    'seeking_talent': Venue.seeking_talent,
+    'seeking_description': Venue.seeking_description,
+    'latitude': Venue.latitude,
+    'longitude': Venue.longitude,
+    'upcoming_shows_count': Venue.upcoming_shows_count,
+    'past_shows_count': Venue.past_shows_count,
+}
+
+ARTIST_FIELDS = {
+    'id': Artist.id,
+    'name': Artist.name,
+    'city': Artist.city,
+    'state': Artist.state,
+    'phone': Artist.phone,
+    'genres': Artist.genres,
+    'image_link': Artist.image_link,
+    'facebook_link': Artist.facebook_link,
+    'website_link': Artist.website_link,
+    'seeking_venue': Artist.seeking_venue,
+    'seeking_description': Artist.seeking_description,
+    'upcoming_shows_count': Artist.upcoming_shows_count,
+    'past_shows_count': Artist.past_shows_count,
+}
+
+SHOW_FIELDS = {
+    'id': Shows.id,
+    'start_time': Shows.start_time,
+    'venue_id': Shows.venue_id,
+    'artist_id': Shows.artist_id,
+    'venue_name': Venue.name,
+    'venue_image_link': Venue.image_link,
+    'artist_name': Artist.name,
+    'artist_image_link': Artist.image_link,
+}
+
+
+#  Cursors
+#  ----------------------------------------------------------------
+
+def encode_cursor(start_time, show_id):
+    # Opaque keyset cursor for the (start_time, id) ordering of shows
+    raw = f"{start_time.isoformat()}|{show_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        start_time, show_id = raw.split('|')
+        return datetime.fromisoformat(start_time), int(show_id)
+    except (binascii.Error, UnicodeDecodeError) as e:
+        raise ValueError(cursor) from e
+
+
+class KeysetPage:
+    # Iterates over at most `size` rows of a query fetched with limit(size + 1).
+    # Once iterated, `next_cursor` points past the last row if more rows exist,
+    # so it also works while the template is being streamed.
+
+    def __init__(self, rows, size):
+        self.rows = rows
+        self.size = size
+        self.next_cursor = None
+
+    def __iter__(self):
+        last = None
+        for count, row in enumerate(self.rows):
+            if count == self.size:
+                self.next_cursor = encode_cursor(last.start_time, last.id)
+                break
+            last = row
+            yield row
+
+
+#  Shows
+#  ----------------------------------------------------------------
+
+def shows_query(fields):
+    # Only the requested columns; Venue/Artist are joined only when needed.
+    # id and start_time are always selected, they make up the cursor.
+    fields = ['id', 'start_time'] + [field for field in fields if field not in ('id', 'start_time')]
+    query = db.session.query(*(SHOW_FIELDS[field].label(field) for field in fields)).select_from(Shows)
+    if any(field.startswith('artist_') and field != 'artist_id' for field in fields):
+        query = query.join(Artist, Artist.id == Shows.artist_id)
+    if any(field.startswith('venue_') and field != 'venue_id' for field in fields):
+        query = query.join(Venue, Venue.id == Shows.venue_id)
+    return query
+
+
+def shows_page(fields, after=None, page_size=None, start=None, end=None):
+    # One keyset page of the shows starting in [start, end) (either bound
+    # optional) by (start_time, id): a range scan of ix_Show_start_time_id.
+    # Returns the query, fetched with one extra row (see KeysetPage).
+    query = shows_query(fields)
+    if start is not None:
+        query = query.filter(Shows.start_time >= start)
+    if end is not None:
+        query = query.filter(Shows.start_time < end)
+    if after:
+        try:
+            start_time, show_id = decode_cursor(after)
+        except ValueError:
+            abort(400)
+        query = query.filter(tuple_(Shows.start_time, Shows.id) > tuple_(start_time, show_id))
+    return query.order_by(Shows.start_time, Shows.id).limit(page_size + 1)
+
+
+def show_counts_query(owner_column, owner_id):
+    # (upcoming, past) number of shows for one venue or artist, in one query
+    now = datetime.now()
+    return db.session.query(
+            func.count(Shows.id).filter(Shows.start_time >= now),
+            func.count(Shows.id).filter(Shows.start_time < now)
+        ).filter(owner_column == owner_id)
+
+
+def show_counts(owner_column, owner_id):
+    return show_counts_query(owner_column, owner_id).one()
+
+
+def show_section_query(query, upcoming, after=None, page_size=None):
+    # One page of upcoming (soonest first) or past (latest first) shows,
+    # limited to one extra row: returns (query, page size) for KeysetPage.
+    # `after` is the "show more" cursor of the previous page.
+    now = datetime.now()
+    key = tuple_(Shows.start_time, Shows.id)
+    if after:
+        try:
+            cursor = tuple_(*decode_cursor(after))
+        except ValueError:
+            abort(400)
+    if upcoming:
+        query = query.filter(Shows.start_time >= now).order_by(Shows.start_time, Shows.id)
+        if after:
+            query = query.filter(key > cursor)
+    else:
+        query = query.filter(Shows.start_time < now).order_by(Shows.start_time.desc(), Shows.id.desc())
+        if after:
+            query = query.filter(key < cursor)
+    page_size = page_size or current_app.config['DETAIL_SHOWS_PAGE_SIZE']
+    return query.limit(page_size + 1), page_size
+
+
+def show_section(query, upcoming, after=None, page_size=None):
+    query, page_size = show_section_query(query, upcoming, after, page_size)
+    return KeysetPage(query.all(), page_size)
+
+
+def upcoming_summaries(owner_column, owner_ids, fields, per_owner=3):
+    # {owner id: [next `per_owner` upcoming shows]} for a page of venues or
+    # artists, in one windowed query instead of one query per owner
+    if not owner_ids:
+        return {}
+    position = func.row_number().over(
+        partition_by=owner_column, order_by=(Shows.start_time, Shows.id)).label('position')
+    ranked = shows_query(fields).add_columns(owner_column.label('owner_id'), position
+                ).filter(owner_column.in_(owner_ids), Shows.start_time >= datetime.now()
+                ).subquery()
+    rows = db.session.query(ranked).filter(ranked.c.position <= per_owner
+            ).order_by(ranked.c.owner_id, ranked.c.position
+            ).all()
+    keys = ['id', 'start_time'] + [field for field in fields if field not in ('id', 'start_time')]
+    summaries = {}
+    for row in rows:
+        summaries.setdefault(row.owner_id, []).append({key: getattr(row, key) for key in keys})
+    return summaries
+
+
+#  Venues
+#  ----------------------------------------------------------------
+
+def venue_areas_query(*criteria):
+    # Every venue (matching `criteria`, e.g. genres.with_genre) with its
+    # denormalized upcoming show count, ordered so that venues of the same
+    # city/state come back next to each other
+    return db.session.query(
+            Venue.city,
+            Venue.state,
+            Venue.id,
+            Venue.name,
+            Venue.upcoming_shows_count.label('num_upcoming_shows')
+        ).filter(*criteria
+        ).order_by(Venue.state, Venue.city, Venue.name)
+
+
+def venue_areas(*criteria):
+    return venue_areas_query(*criteria).all()
+
+
+def artists_query(*criteria):
+    return db.session.query(Artist.id, Artist.name).filter(*criteria)
+
+
+def owners_page(fields_map, fields, after_id=None, limit=None, criteria=()):
+    # One id-ordered page of venues or artists, selecting only `fields`
+    model_id = fields_map['id']
+    fields = ['id'] + [field for field in fields if field != 'id']
+    query = db.session.query(*(fields_map[field].label(field) for field in fields)).filter(*criteria)
+    if after_id is not None:
+        query = query.filter(model_id > after_id)
+    return query.order_by(model_id).limit(limit).all()
+
+
+def owners_by_ids(fields_map, fields, ids, criteria=()):
+    # The given venues or artists, in the order of `ids`
+    if not ids:
+        return []
+    model_id = fields_map['id']
+    fields = ['id'] + [field for field in fields if field != 'id']
+    rows = {row.id: row for row in
+            db.session.query(*(fields_map[field].label(field) for field in fields)
+                ).filter(model_id.in_(ids), *criteria)}
+    return [rows[owner_id] for owner_id in ids if owner_id in rows]
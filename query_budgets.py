@@ -0,0 +1,185 @@
+from collections import Counter
+from functools import wraps
+import click
+from flask import Response, current_app, g, has_request_context, request
+from flask.cli import with_appcontext
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from models import Venue, Artist
+
+# Development/test guard against N+1 queries.
+#
+# With QUERY_BUDGET_MODE set to 'warn' or 'raise', every statement of a
+# request is recorded, together with the relationship it lazy loads (if
+# any). Views declaring @query_budget(n) are checked against their budget
+# when they return; at the end of the request, the same SQL run
+# N_PLUS_ONE_THRESHOLD or more times with different parameters is reported
+# as an N+1, naming the relationship (Venue.show). Streamed responses (e.g.
+# /shows?stream=1, the calendar feeds, exports) keep running statements
+# while the body is sent, so both checks wait until it has been sent.
+# 'warn' logs the report, 'raise' fails the request with QueryBudgetExceeded
+# (a streamed one at the end of its body). `flask check-query-budgets`
+# requests every budgeted route once, for CI.
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+def query_budget(limit):
+    # Maximum number of statements of a request to the view, including the
+    # ones before it (e.g. @conditional's). Place it right above the view
+    # function, below @conditional/@cached, so they copy the budget.
+    def decorator(view):
+        @wraps(view)
+        def wrapper(**kwargs):
+            rv = view(**kwargs)
+            # Streamed bodies are checked once sent (see check())
+            if recording() and not (isinstance(rv, Response) and rv.is_streamed):
+                g.budget_checked = True
+                report(over_budget(g.query_log, limit), describe(), mode(), current_app.logger)
+            return rv
+        wrapper.query_budget = limit
+        return wrapper
+    return decorator
+
+
+def mode():
+    return current_app.config.get('QUERY_BUDGET_MODE', 'off')
+
+
+def recording():
+    return has_request_context() and g.get('query_log') is not None
+
+
+#  Recording
+#  ----------------------------------------------------------------
+
+@event.listens_for(Session, 'do_orm_execute')
+def note_relationship_load(orm_execute_state):
+    if recording() and orm_execute_state.is_relationship_load:
+        path = orm_execute_state.loader_strategy_path
+        g.loading_relationship = str(path[-1]) if path else 'relationship'
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def record_statement(connection, cursor, statement, parameters, context, executemany):
+    if recording():
+        g.query_log.append((statement, g.pop('loading_relationship', None)))
+
+
+def start_recording():
+    if mode() != 'off':
+        g.query_log = []
+
+
+#  Checks
+#  ----------------------------------------------------------------
+
+def n_plus_one(log, threshold):
+    problems = []
+    repeats = Counter(statement for statement, _ in log)
+    for statement, count in repeats.most_common():
+        if count < threshold:
+            break
+        relationships = sorted({name for sql, name in log if sql == statement and name})
+        source = f"lazy load of {', '.join(relationships)}" if relationships else 'repeated query'
+        problems.append(f"N+1: {source} ran {count} times: {' '.join(statement.split())[:200]}")
+    return problems
+
+
+def over_budget(log, budget):
+    if budget is not None and len(log) > budget:
+        return [f"{len(log)} queries, over the budget of {budget}"]
+    return []
+
+
+def describe():
+    return f"{request.method} {request.full_path.rstrip('?')} ({request.endpoint})"
+
+
+def report(problems, where, mode, logger):
+    if not problems:
+        return
+    message = f"{where}: " + '; '.join(problems)
+    if mode == 'raise':
+        raise QueryBudgetExceeded(message)
+    logger.warning(message)
+
+
+def checked_stream(body, log, budget, threshold, where, mode, logger):
+    # The streamed body, then the checks of all the request's statements.
+    # Runs after the request context is gone: everything is passed in.
+    yield from body
+    report(n_plus_one(log, threshold) + over_budget(log, budget), where, mode, logger)
+
+
+def check(response):
+    log = g.get('query_log')
+    if log is None:
+        return response
+    threshold = current_app.config.get('N_PLUS_ONE_THRESHOLD', 3)
+    budget = getattr(current_app.view_functions.get(request.endpoint), 'query_budget', None)
+    if response.is_streamed:
+        # Keep recording while the body streams (see stream_with_context)
+        response.response = checked_stream(response.response, log, budget, threshold,
+                                           describe(), mode(), current_app.logger)
+        return response
+    g.query_log = None
+    response.headers['X-Query-Count'] = str(len(log))
+    problems = n_plus_one(log, threshold)
+    if not g.pop('budget_checked', False):
+        # Views run without their wrapper (asgi.py) or failed before the check
+        problems += over_budget(log, budget)
+    report(problems, describe(), mode(), current_app.logger)
+    return response
+
+
+def init_app(app):
+    app.before_request(start_recording)
+    app.after_request(check)
+    app.cli.add_command(check_command)
+
+
+#  CI check
+#  ----------------------------------------------------------------
+
+def sample_arguments():
+    # A real venue/artist for routes taking an id
+    venue = Venue.query.order_by(Venue.id).first()
+    artist = Artist.query.order_by(Artist.id).first()
+    return {'venue_id': venue and venue.id, 'artist_id': artist and artist.id}
+
+
+@click.command('check-query-budgets')
+@with_appcontext
+def check_command():
+    """Request every route with a query budget once and report overruns."""
+    app = current_app._get_current_object()
+    app.config['QUERY_BUDGET_MODE'] = 'raise'
+    app.testing = True      # let QueryBudgetExceeded reach the test client
+    app.config['PRESERVE_CONTEXT_ON_EXCEPTION'] = False
+    samples = sample_arguments()
+    client = app.test_client()
+    failures = 0
+    for rule in sorted(app.url_map.iter_rules(), key=lambda rule: rule.rule):
+        budget = getattr(app.view_functions[rule.endpoint], 'query_budget', None)
+        if budget is None:
+            continue
+        if any(samples.get(argument) is None for argument in rule.arguments):
+            click.echo(f"skip  {rule.rule}: no sample data")
+            continue
+        url = rule.build({argument: samples[argument] for argument in rule.arguments})[1]
+        method = 'GET' if 'GET' in rule.methods else 'POST'
+        try:
+            response = client.open(url, method=method, data={'search_term': 'a'})
+            response.get_data()     # streamed bodies are checked once read
+        except QueryBudgetExceeded as e:
+            failures += 1
+            click.echo(f"FAIL  {e}")
+            continue
+        count = response.headers.get('X-Query-Count', 'streamed')
+        click.echo(f"ok    {method} {url}: {count}/{budget} queries")
+    if failures:
+        raise click.exceptions.Exit(1)
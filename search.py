@@ -0,0 +1,114 @@
+import re
+from flask import current_app
+from sqlalchemy import DDL, event, select, text
+from models import db, Venue, Artist
+import ngram_index
+
+# Ranked name/city/genre search for venues and artists.
+#
+# PostgreSQL: a GIN index on SEARCH_DOCUMENT answers the token-prefix
+# tsquery and a pg_trgm index on name answers substring matches; results are
+# ranked by ts_rank + trigram similarity.
+# SQLite: FTS5 tables (venue_search / artist_search) ranked with bm25.
+# Both are created by the "add search indexes" migration; on SQLite,
+# db.create_all() creates the FTS5 tables too (see below). Other databases
+# get an unranked, unindexed name ILIKE (the search before these indexes).
+# With NGRAM_SEARCH_INDEX on, name lookups go to ngram_index instead.
+
+# Must stay identical to the expression indexed in the migration
+SEARCH_DOCUMENT = (
+    "to_tsvector('simple', coalesce(name, '') || ' ' || "
+    "coalesce(city, '') || ' ' || coalesce(genres, ''))"
+)
+
+SEARCH_TABLES = {'Venue': 'venue_search', 'Artist': 'artist_search'}
+
+DEFAULT_LIMIT = 50
+
+POSTGRES_QUERY = """
+SELECT id, name, upcoming_shows_count
+FROM "{table}"
+WHERE {document} @@ to_tsquery('simple', :tsquery)
+   OR name ILIKE :pattern ESCAPE '\\'
+ORDER BY ts_rank({document}, to_tsquery('simple', :tsquery))
+         + similarity(name, :term) DESC, name
+LIMIT :limit
+"""
+
+SQLITE_QUERY = """
+SELECT t.id, t.name, t.upcoming_shows_count
+FROM {fts} JOIN "{table}" AS t ON t.id = {fts}.rowid
+WHERE {fts} MATCH :match
+ORDER BY bm25({fts}, 10.0, 2.0, 1.0), t.name
+LIMIT :limit
+"""
+
+# External-content FTS5 table of a model's table, kept in sync with triggers:
+# the same statements as the migration
+SQLITE_FTS = (
+    "CREATE VIRTUAL TABLE {fts} USING fts5("
+    "name, city, genres, content='{table}', content_rowid='id')",
+    'CREATE TRIGGER {fts}_ai AFTER INSERT ON "{table}" BEGIN '
+    'INSERT INTO {fts}(rowid, name, city, genres) '
+    'VALUES (new.id, new.name, new.city, new.genres); END',
+    'CREATE TRIGGER {fts}_ad AFTER DELETE ON "{table}" BEGIN '
+    "INSERT INTO {fts}({fts}, rowid, name, city, genres) "
+    "VALUES ('delete', old.id, old.name, old.city, old.genres); END",
+    'CREATE TRIGGER {fts}_au AFTER UPDATE ON "{table}" BEGIN '
+    "INSERT INTO {fts}({fts}, rowid, name, city, genres) "
+    "VALUES ('delete', old.id, old.name, old.city, old.genres); "
+    'INSERT INTO {fts}(rowid, name, city, genres) '
+    'VALUES (new.id, new.name, new.city, new.genres); END',
+)
+
+for model in (Venue, Artist):
+    for statement in SQLITE_FTS:
+        ddl = statement.format(fts=SEARCH_TABLES[model.__tablename__], table=model.__tablename__)
+        event.listen(model.__table__, 'after_create', DDL(ddl).execute_if(dialect='sqlite'))
+
+# Blank searches list everything, alphabetically
+LIST_QUERY = 'SELECT id, name, upcoming_shows_count FROM "{table}" ORDER BY name LIMIT :limit'
+
+
+def tokenize(term):
+    return re.findall(r'\w+', term.lower())
+
+
+def search(model, term, limit=None):
+    # Returns (id, name, upcoming_shows_count) rows for `model`, best match first
+    if limit is None:
+        limit = current_app.config.get('SEARCH_RESULTS_LIMIT', DEFAULT_LIMIT)
+    if tokenize(term) and ngram_index.enabled():
+        return ngram_index.search(model, term, limit)
+    return db.session.execute(*search_statement(model, term, limit)).fetchall()
+
+
+def search_statement(model, term, limit):
+    # (statement, parameters) of the SQL search
+    table = model.__tablename__
+    tokens = tokenize(term)
+    if not tokens:
+        return text(LIST_QUERY.format(table=table)), {'limit': limit}
+
+    dialect = db.engine.dialect.name
+    escaped = re.sub(r'([\\%_])', r'\\\1', term.strip())
+    if dialect == 'postgresql':
+        params = {
+            'tsquery': ' & '.join(token + ':*' for token in tokens),
+            'pattern': f'%{escaped}%',
+            'term': term.strip(),
+            'limit': limit,
+        }
+        query = POSTGRES_QUERY.format(table=table, document=SEARCH_DOCUMENT)
+    elif dialect == 'sqlite':
+        params = {
+            'match': ' '.join(f'"{token}"*' for token in tokens),
+            'limit': limit,
+        }
+        query = SQLITE_QUERY.format(table=table, fts=SEARCH_TABLES[table])
+    else:
+        statement = (select(model.id, model.name, model.upcoming_shows_count)
+                     .where(model.name.ilike(f'%{escaped}%', escape='\\'))
+                     .order_by(model.name).limit(limit))
+        return statement, {}
+    return text(query), params
@@ -0,0 +1,199 @@
+import random
+import time
+from datetime import datetime, timedelta
+from itertools import accumulate
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import func
+from models import db, Venue, Artist, Shows
+from forms import VenueForm
+from conditional import bump
+import cache
+import counters
+import genres
+import geo
+
+# `flask seed` -- synthetic data for load and scale testing.
+#
+# Volumes are configurable (e.g. --venues 100000 --shows 1000000) and the
+# rows only depend on --seed (show times are relative to today).
+# Distributions follow what a real listing site looks like: a few big cities
+# hold most venues and artists, a few venues and artists get most shows,
+# genres come from the forms' choices with uneven popularity, shows spread
+# over the past and the coming year and start in the evening. A venue or
+# artist gets at most one show a day, so the shows it creates never overlap (see
+# bookings.py; draws that find no free day are dropped). Rows are
+# written with batched Core INSERTs, one transaction per chunk, so it runs
+# fast on SQLite too.
+
+CITIES = [
+    ('New York', 'NY'), ('Los Angeles', 'CA'), ('Chicago', 'IL'), ('Houston', 'TX'),
+    ('San Francisco', 'CA'), ('Austin', 'TX'), ('Nashville', 'TN'), ('Seattle', 'WA'),
+    ('New Orleans', 'LA'), ('Atlanta', 'GA'), ('Denver', 'CO'), ('Boston', 'MA'),
+    ('Philadelphia', 'PA'), ('Portland', 'OR'), ('Miami', 'FL'), ('Detroit', 'MI'),
+    ('Minneapolis', 'MN'), ('Memphis', 'TN'), ('Phoenix', 'AZ'), ('San Diego', 'CA'),
+    ('Las Vegas', 'NV'), ('Baltimore', 'MD'), ('St. Louis', 'MO'), ('Kansas City', 'MO'),
+    ('Cleveland', 'OH'), ('Pittsburgh', 'PA'), ('Salt Lake City', 'UT'), ('Omaha', 'NE'),
+    ('Albuquerque', 'NM'), ('Boise', 'ID'),
+]
+
+ADJECTIVES = ['Velvet', 'Electric', 'Golden', 'Blue', 'Midnight', 'Crimson', 'Silver', 'Rusty',
+              'Neon', 'Wild', 'Quiet', 'Lucky', 'Broken', 'Painted', 'Hollow', 'Lonesome']
+NOUNS = ['Room', 'Owl', 'Anchor', 'Lantern', 'Fox', 'Harbor', 'Garden', 'Engine', 'Rose',
+         'Tiger', 'Crow', 'Bridge', 'Moon', 'River', 'Arrow', 'Canyon']
+VENUE_KINDS = ['Hall', 'Lounge', 'Club', 'Bar', 'Theater', 'Ballroom', 'Tavern', 'Pavilion']
+ARTIST_KINDS = ['Band', 'Trio', 'Collective', 'Orchestra', 'Project', 'Quartet', 'Sound System']
+STREETS = ['Main St', 'Market St', 'Broadway', 'Oak Ave', 'Elm St', '2nd Ave', 'Union St',
+           'Mission St', 'Sunset Blvd', 'Water St']
+
+GENRES = [choice for choice, _ in VenueForm.genres.kwargs['choices']]
+
+DURATIONS = (60, 90, 120, 180)
+DRAWS = 20          # tries to find a free day for a show
+
+
+def zipf_weights(count, exponent=1.1):
+    # Cumulative weights of rank 1..count, for random.choices
+    return list(accumulate(1 / rank ** exponent for rank in range(1, count + 1)))
+
+
+class Seeder:
+
+    def __init__(self, seed, chunk_size, past_ratio):
+        self.rng = random.Random(seed)
+        self.chunk_size = chunk_size
+        self.past_ratio = past_ratio
+        self.now = datetime.now().replace(minute=0, second=0, microsecond=0)
+        self.city_weights = zipf_weights(len(CITIES))
+        # Genre popularity: a seeded order of the form choices, Zipf-weighted
+        self.genres = self.rng.sample(GENRES, len(GENRES))
+        self.genre_weights = zipf_weights(len(self.genres), 0.8)
+        self.booked = set()         # (venue or artist key, day)
+        self.dropped = 0
+
+    def name(self, kinds):
+        rng = self.rng
+        return f"The {rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} {rng.choice(kinds)}"
+
+    def pick_genres(self):
+        count = self.rng.choices((1, 2, 3), weights=(5, 3, 2))[0]
+        picked = self.rng.choices(self.genres, cum_weights=self.genre_weights, k=count)
+        return ','.join(sorted(set(picked)))
+
+    def owner(self, number, kinds, seeking_column):
+        rng = self.rng
+        city, state = rng.choices(CITIES, cum_weights=self.city_weights)[0]
+        slug = f"{kinds[0].lower()}{number}"
+        return {
+            'name': self.name(kinds),
+            'city': city,
+            'state': state,
+            'phone': rng.randint(2000000, 9999999),
+            'genres': self.pick_genres(),
+            'image_link': f"https://images.example.com/{slug}.jpg",
+            'facebook_link': f"https://www.facebook.com/{slug}",
+            'website_link': f"https://{slug}.example.com",
+            seeking_column: rng.random() < 0.3,
+            'seeking_description': 'Looking for new acts' if rng.random() < 0.3 else None,
+        }
+
+    def venue(self, number):
+        row = self.owner(number, VENUE_KINDS, 'seeking_talent')
+        row['address'] = f"{self.rng.randint(1, 2999)} {self.rng.choice(STREETS)}"
+        # Spread around the city centre, within ~10 km
+        latitude, longitude = geo.lookup(row['city'], row['state'])
+        row['latitude'] = round(latitude + self.rng.gauss(0, 0.04), 5)
+        row['longitude'] = round(longitude + self.rng.gauss(0, 0.05), 5)
+        return row
+
+    def artist(self, number):
+        return self.owner(number, ARTIST_KINDS, 'seeking_venue')
+
+    def start_time(self):
+        rng = self.rng
+        days = rng.randint(1, 365)
+        if rng.random() < self.past_ratio:
+            days = -days
+        day = self.now + timedelta(days=days)
+        return day.replace(hour=rng.choice((18, 19, 20, 21, 22)), minute=rng.choice((0, 30)))
+
+    def show(self, venue_ids, venue_weights, artist_ids, artist_weights):
+        # A show on a day both its venue and its artist are free, or None
+        rng = self.rng
+        for _ in range(DRAWS):
+            venue_id = rng.choices(venue_ids, cum_weights=venue_weights)[0]
+            artist_id = rng.choices(artist_ids, cum_weights=artist_weights)[0]
+            start_time = self.start_time()
+            days = (('venue', venue_id, start_time.date()), ('artist', artist_id, start_time.date()))
+            if not any(day in self.booked for day in days):
+                self.booked.update(days)
+                return {'venue_id': venue_id, 'artist_id': artist_id,
+                        'start_time': start_time, 'duration': rng.choice(DURATIONS)}
+        self.dropped += 1
+        return None
+
+    def insert(self, model, rows, label, total):
+        # Batched INSERTs, one transaction per chunk
+        started = time.perf_counter()
+        done = 0
+        while True:
+            chunk = [row for _, row in zip(range(self.chunk_size), rows)]
+            if not chunk:
+                break
+            db.session.execute(model.__table__.insert(), chunk)
+            db.session.commit()
+            done += len(chunk)
+            elapsed = time.perf_counter() - started
+            click.echo(f"  {label}: {done}/{total} ({done / elapsed:,.0f} rows/s)")
+
+    def new_ids(self, model, after_id):
+        return [owner_id for (owner_id,) in
+                db.session.query(model.id).filter(model.id > after_id).order_by(model.id)]
+
+    def run(self, venue_count, artist_count, show_count):
+        last_venue = db.session.query(func.max(Venue.id)).scalar() or 0
+        last_artist = db.session.query(func.max(Artist.id)).scalar() or 0
+        self.insert(Venue, (self.venue(number) for number in range(venue_count)),
+                    'venues', venue_count)
+        self.insert(Artist, (self.artist(number) for number in range(artist_count)),
+                    'artists', artist_count)
+        venue_ids = self.new_ids(Venue, last_venue)
+        artist_ids = self.new_ids(Artist, last_artist)
+        if show_count and venue_ids and artist_ids:
+            # A few popular venues and artists get most of the shows
+            venue_weights = zipf_weights(len(venue_ids), 0.9)
+            artist_weights = zipf_weights(len(artist_ids), 0.9)
+            venue_ids = self.rng.sample(venue_ids, len(venue_ids))
+            artist_ids = self.rng.sample(artist_ids, len(artist_ids))
+            shows = (self.show(venue_ids, venue_weights, artist_ids, artist_weights)
+                     for _ in range(show_count))
+            self.insert(Shows, (show for show in shows if show), 'shows', show_count)
+            if self.dropped:
+                click.echo(f"  {self.dropped} shows dropped: no free day for their venue and artist")
+        # Core inserts skip the mapper events: counters, genre links, grid
+        # cells, stamps
+        click.echo("  recounting show counters and genre links")
+        counters.recount()
+        genres.reindex(Venue, Venue.id > last_venue)
+        genres.reindex(Artist, Artist.id > last_artist)
+        geo.locate(Venue.id > last_venue)
+        bump('Venue', 'Artist', 'Show')
+        db.session.commit()
+        cache.invalidate('venues', 'shows')
+
+
+@click.command('seed')
+@click.option('--venues', default=1000, show_default=True, help='Venues to create.')
+@click.option('--artists', default=2000, show_default=True, help='Artists to create.')
+@click.option('--shows', default=20000, show_default=True, help='Shows to create.')
+@click.option('--seed', default=0, show_default=True, help='Random seed; same seed, same data.')
+@click.option('--past-ratio', default=0.5, show_default=True, help='Share of shows in the past.')
+@click.option('--chunk-size', default=10000, show_default=True, help='Rows per transaction.')
+@with_appcontext
+def seed_command(venues, artists, shows, seed, past_ratio, chunk_size):
+    """Generate synthetic venues, artists and shows for load testing."""
+    started = time.perf_counter()
+    seeder = Seeder(seed, chunk_size, past_ratio)
+    seeder.run(venues, artists, shows)
+    click.echo(f"seeded {venues} venues, {artists} artists, {shows - seeder.dropped} shows "
+               f"in {time.perf_counter() - started:.1f}s")
@@ -2,3 +2,63 @@ window.parseISOString = function parseISOString(s) {
   var b = s.split(/\D+/);
   return new Date(Date.UTC(b[0], --b[1], b[2], b[3], b[4], b[5], b[6]));
 };
+
+// Typeahead for inputs with data-autocomplete="<url>": suggestions go to the
+// input's <datalist>, picking one fills the field named by data-target.
+document.querySelectorAll('input[data-autocomplete]').forEach(function (input) {
+  var list = document.getElementById(input.getAttribute('list'));
+  var target = document.getElementById(input.dataset.target);
+  var timer = null;
+  var latest = 0;
+
+  function label(item) {
+    return item.name + ' (' + [item.city, item.state].filter(Boolean).join(', ') + ')';
+  }
+
+  function pick() {
+    for (var i = 0; i < list.options.length; i++) {
+      if (list.options[i].value === input.value) {
+        target.value = list.options[i].dataset.id;
+        return true;
+      }
+    }
+    return false;
+  }
+
+  function suggest() {
+    var request = ++latest;
+    fetch(input.dataset.autocomplete + '?q=' + encodeURIComponent(input.value))
+      .then(function (response) { return response.json(); })
+      .then(function (body) {
+        if (request !== latest) return;   // a newer keystroke won
+        list.innerHTML = '';
+        body.data.forEach(function (item) {
+          var option = document.createElement('option');
+          option.value = label(item);
+          option.dataset.id = item.id;
+          list.appendChild(option);
+        });
+      });
+  }
+
+  input.addEventListener('input', function () {
+    if (pick() || !input.value.trim()) return;
+    clearTimeout(timer);
+    timer = setTimeout(suggest, 80);
+  });
+});
+
+// Links with data-near-me: ask for the browser's position, then follow the
+// link with ?lat=&lng= added.
+document.querySelectorAll('a[data-near-me]').forEach(function (link) {
+  link.addEventListener('click', function (event) {
+    if (!navigator.geolocation) return;
+    event.preventDefault();
+    navigator.geolocation.getCurrentPosition(function (position) {
+      var url = new URL(link.href, window.location.href);
+      url.searchParams.set('lat', position.coords.latitude.toFixed(4));
+      url.searchParams.set('lng', position.coords.longitude.toFixed(4));
+      window.location.href = url.toString();
+    });
+  });
+});
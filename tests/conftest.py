@@ -0,0 +1,46 @@
+import os
+import sqlite3
+import sys
+import pytest
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# The app's modules live at the top of the repository
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app
+from models import db
+
+
+@event.listens_for(Engine, 'connect')
+def enforce_foreign_keys(dbapi_connection, record):
+    # SQLite only checks foreign keys when asked to; PostgreSQL always does
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        dbapi_connection.execute('PRAGMA foreign_keys=ON')
+
+
+def make_app(tmp_path, **overrides):
+    # A test app on a fresh SQLite file, schema created from the models
+    settings = dict(
+        SQLALCHEMY_DATABASE_URI=f"sqlite:///{tmp_path / 'fyyur.db'}",
+        SQLALCHEMY_TRACK_MODIFICATIONS=False,
+        TESTING=True,
+        WTF_CSRF_ENABLED=False,
+        CACHE_BACKEND='null',
+        INDEX_STAMP_MAX_AGE=0,      # indexes see other workers' writes at once
+    )
+    settings.update(overrides)
+    app = create_app(**settings)
+    with app.app_context():
+        db.create_all()
+    return app
+
+
+@pytest.fixture
+def app(tmp_path):
+    return make_app(tmp_path)
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
@@ -0,0 +1,32 @@
+import pytest
+from models import db, Venue
+
+
+@pytest.fixture
+def venues(app):
+    with app.app_context():
+        for number in range(3):
+            db.session.add(Venue(name=f'Hall {number}', city='San Francisco', state='CA',
+                                 address='1', phone='1', genres='Jazz', seeking_talent=False))
+        db.session.commit()
+
+
+def test_pages(client, venues):
+    first = client.get('/api/v1/venues?fields=name&limit=2').get_json()
+    assert [venue['name'] for venue in first['data']] == ['Hall 0', 'Hall 1']
+    rest = client.get(f"/api/v1/venues?fields=name&limit=2&after={first['next_cursor']}").get_json()
+    assert [venue['name'] for venue in rest['data']] == ['Hall 2']
+    assert rest['next_cursor'] is None
+
+
+@pytest.mark.parametrize('query', ['limit=ten', 'limit=2.5', 'limit=0', 'after=abc', 'after=',
+                                   'limit=2&after=1x'])
+def test_malformed_paging_arguments(client, venues, query):
+    response = client.get(f'/api/v1/venues?{query}')
+    assert response.status_code == 400
+    assert response.get_json()['error'] == 'Bad Request'
+
+
+def test_malformed_show_cursor(client):
+    assert client.get('/api/v1/shows?after=nonsense').status_code == 400
+    assert client.get('/api/v1/venues/1/shows?limit=x').status_code == 400
@@ -0,0 +1,118 @@
+from models import db, Venue
+from conditional import bump
+import autocomplete
+from test_database import uris, routed_app     # noqa: F401 (fixture)
+
+
+def add_venue(name):
+    db.session.add(Venue(name=name, city='San Francisco', state='CA', address='1', phone='1',
+                         genres='Jazz', seeking_talent=False))
+    bump('Venue')
+    db.session.commit()
+
+
+def completions(client, prefix):
+    response = client.get(f'/autocomplete/venues?q={prefix}')
+    assert response.status_code == 200
+    return [venue['name'] for venue in response.get_json()['data']]
+
+
+def test_complete(app, client):
+    with app.app_context():
+        add_venue('The Musical Hop')
+        add_venue('Park Square Live Music & Coffee')
+    assert completions(client, 'the mu') == ['The Musical Hop']
+    assert completions(client, 'musical') == ['The Musical Hop']
+    assert completions(client, 'live') == ['Park Square Live Music & Coffee']
+    with app.app_context():
+        add_venue('Musicians Hall')
+    assert completions(client, 'musicia') == ['Musicians Hall']
+
+
+def test_limit_out_of_range(client):
+    response = client.get('/autocomplete/venues?q=a&limit=0')
+    assert response.status_code == 400
+    assert response.get_json()['error'] == 'Bad Request'
+
+
+def test_lagging_replica_does_not_pin_the_index(tmp_path, uris):
+    app = routed_app(tmp_path, uris)
+    with app.app_context():
+        add_venue('Primary Only Club')
+    # Requests read the replica, which has neither the venue nor the new stamp
+    assert completions(app.test_client(), 'primary') == ['Primary Hall', 'Primary Only Club']
+
+
+def built_index(app):
+    with app.app_context():
+        return autocomplete.indexes[autocomplete.index_key(Venue)]
+
+
+def test_own_writes_update_the_index_in_place(app, client):
+    with app.app_context():
+        add_venue('The Musical Hop')
+    assert completions(client, 'mus') == ['The Musical Hop']
+    version, index, _ = built_index(app)
+    with app.app_context():
+        add_venue('Musicians Hall')
+        venue = Venue.query.filter_by(name='The Musical Hop').one()
+        venue.name = 'The Jazz Hop'
+        bump('Venue')
+        db.session.commit()
+        assert built_index(app)[:2] == (version + 2, index)
+        db.session.delete(Venue.query.filter_by(name='Musicians Hall').one())
+        bump('Venue')
+        db.session.commit()
+        assert built_index(app)[:2] == (version + 3, index)
+        # Rolled back writes are not applied
+        db.session.add(Venue(name='Musical Ghost', city='X', state='CA', address='1',
+                             phone='1', genres='Jazz', seeking_talent=False))
+        db.session.flush()
+        db.session.rollback()
+    assert completions(client, 'mus') == []
+    assert completions(client, 'jazz') == ['The Jazz Hop']
+    assert built_index(app)[1] is index
+
+
+def test_other_writes_refresh_the_index(app, client):
+    with app.app_context():
+        add_venue('The Musical Hop')
+    assert completions(client, 'mus') == ['The Musical Hop']
+    index = built_index(app)[1]
+    with app.app_context():
+        # Another worker's writes: no ORM events here
+        db.session.execute(Venue.__table__.insert(), [dict(
+            name='Musicians Hall', city='San Francisco', state='CA', address='1', phone='1',
+            genres='Jazz', seeking_talent=False)])
+        bump('Venue')
+        db.session.commit()
+    assert completions(client, 'mus') == ['Musicians Hall', 'The Musical Hop']
+    # A stamp bump that changed no name (e.g. a counter rollover) reads no names
+    with app.app_context():
+        bump('Venue')
+        db.session.commit()
+    assert completions(client, 'mus') == ['Musicians Hall', 'The Musical Hop']
+    assert built_index(app)[1] is index
+    # Deleted elsewhere: the index is rebuilt
+    with app.app_context():
+        db.session.execute(Venue.__table__.delete().where(Venue.name == 'Musicians Hall'))
+        bump('Venue')
+        db.session.commit()
+    assert completions(client, 'mus') == ['The Musical Hop']
+    assert built_index(app)[1] is not index
+
+
+def test_prefix_index_updates():
+    index = autocomplete.PrefixIndex([(2, 'Blue Note', 'NYC', 'NY'), (5, 'Blue Moon', 'SF', 'CA')])
+    index.add(3, 'Blue Note', 'LA', 'CA')
+    index.add(1, 'Big Blue', 'SF', 'CA')
+    assert [row[0] for row in index.complete('blue', 10)] == [5, 2, 3, 1]
+    index.add(5, 'Red Moon', 'SF', 'CA')
+    index.remove(2)
+    assert index.complete('blue', 10) == [(3, 'Blue Note', 'LA', 'CA'), (1, 'Big Blue', 'SF', 'CA')]
+    assert [row[0] for row in index.complete('moon', 10)] == [5]
+    # Same as building from scratch
+    rebuilt = autocomplete.PrefixIndex([(1, 'Big Blue', 'SF', 'CA'), (3, 'Blue Note', 'LA', 'CA'),
+                                        (5, 'Red Moon', 'SF', 'CA')])
+    assert (index.names, index.name_ids, index.words, index.word_ids) == (
+        rebuilt.names, rebuilt.name_ids, rebuilt.words, rebuilt.word_ids)
@@ -0,0 +1,52 @@
+from datetime import datetime
+import pytest
+from sqlalchemy.exc import IntegrityError
+from models import db, Venue, Artist, Shows
+from bookings import BookingConflict, booking_conflict
+
+
+@pytest.fixture
+def owners(app):
+    with app.app_context():
+        db.session.add(Venue(name='Hall', city='San Francisco', state='CA', address='1',
+                             phone='1', genres='Jazz', seeking_talent=False))
+        db.session.add(Artist(name='Band', city='San Francisco', state='CA', phone='1',
+                              genres='Jazz', seeking_venue=False))
+        db.session.commit()
+
+
+def book(client, start_time, duration=120, venue_id=1, artist_id=1):
+    return client.post('/shows/create', data={'venue_id': venue_id, 'artist_id': artist_id,
+                                              'start_time': start_time, 'duration': duration})
+
+
+def test_overlapping_booking_rejected(app, client, owners):
+    assert 'successfully listed' in book(client, '2031-06-01 20:00:00').get_data(as_text=True)
+    page = book(client, '2031-06-01 21:00:00').get_data(as_text=True)
+    assert ('Show was not added: the venue 1 is already booked from '
+            '2031-06-01 20:00 to 22:00 (show 1)') in page
+    # Back on the form, to pick another time
+    assert 'name="start_time"' in page
+    # Right after the first one ends is free
+    assert 'successfully listed' in book(client, '2031-06-01 22:00:00').get_data(as_text=True)
+    with app.app_context():
+        assert Shows.query.count() == 2
+
+
+class ExclusionViolation(Exception):
+    # What psycopg2 raises for a violated exclusion constraint
+    pgcode = '23P01'
+
+
+def test_concurrent_booking(app, client, owners):
+    # On PostgreSQL a booking that loses the race to a concurrent one passes
+    # the check and fails on the exclusion constraint; its message is the
+    # same as the check's
+    book(client, '2031-06-01 20:00:00')
+    with app.app_context():
+        show = Shows(venue_id=1, artist_id=1, start_time=datetime(2031, 6, 1, 21), duration=60)
+        conflict = booking_conflict(IntegrityError('INSERT', {}, ExclusionViolation()), show)
+        assert isinstance(conflict, BookingConflict)
+        assert str(conflict) == 'venue 1 is already booked from 2031-06-01 20:00 to 22:00 (show 1)'
+        # Other integrity errors are not booking conflicts
+        assert booking_conflict(IntegrityError('INSERT', {}, Exception()), show) is None
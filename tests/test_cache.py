@@ -0,0 +1,63 @@
+import pytest
+import cache
+from conftest import make_app
+from models import db, Venue
+from test_database import FORM
+
+
+@pytest.fixture(params=['lru', 'shared'])
+def backend(request):
+    return cache.create_backend({'CACHE_BACKEND': request.param})
+
+
+def test_invalidate(backend):
+    backend.set('page:/venues', 'old', {'venues'})
+    assert backend.get('page:/venues') == 'old'
+    backend.invalidate('venues')
+    assert backend.get('page:/venues') is None
+
+
+def test_invalidated_while_rendering(backend):
+    since = backend.sequence()
+    backend.invalidate('venue:3')       # a write commits during the render
+    backend.set('page:/venues/3', 'rendered from old data', {'venue:3'}, since=since)
+    assert backend.get('page:/venues/3') is None
+    # Other tags' invalidations do not matter
+    since = backend.sequence()
+    backend.invalidate('venue:4')
+    backend.set('page:/venues/3', 'fresh', {'venue:3'}, since=since)
+    assert backend.get('page:/venues/3') == 'fresh'
+
+
+def test_cached_view_invalidated_while_rendering(app):
+    app.config['CACHE_BACKEND'] = 'lru'
+    cache.init_app(app)
+    renders = []
+
+    @cache.cached('venue:{venue_id}')
+    def view(venue_id):
+        renders.append(venue_id)
+        if len(renders) == 1:
+            cache.invalidate(f'venue:{venue_id}')
+        return f'venue {venue_id}, render {len(renders)}'
+
+    for expected in ('render 1', 'render 2', 'render 2'):
+        with app.test_request_context('/venues/3'):
+            assert view(venue_id=3).get_data(as_text=True).endswith(expected)
+
+
+def test_other_workers_write(tmp_path):
+    # Two workers, each with its own LRU cache, on one database: B's
+    # invalidation does not reach A, the new version stamps do
+    worker_a = make_app(tmp_path, CACHE_BACKEND='lru').test_client()
+    app_b = make_app(tmp_path, CACHE_BACKEND='lru')
+    with app_b.app_context():
+        db.session.add(Venue(name='Old Hall', city='San Francisco', state='CA', address='1',
+                             phone='1', genres='Jazz', seeking_talent=False))
+        db.session.commit()
+    before = worker_a.get('/venues/1')
+    assert 'Old Hall' in before.get_data(as_text=True)
+    app_b.test_client().post('/venues/1/edit', data=dict(FORM, name='New Hall'))
+    after = worker_a.get('/venues/1')
+    assert after.headers['ETag'] != before.headers['ETag']
+    assert 'New Hall' in after.get_data(as_text=True)
@@ -0,0 +1,113 @@
+from datetime import datetime, timedelta
+import pytest
+from models import db, Venue, Artist, Shows
+from calendars import escape, fold
+
+NOW = datetime.now().replace(minute=0, second=0, microsecond=0)
+VENUE_NAME = 'Café Olé; Music, Bar & Grill'
+ADDRESS = '1015 Folsom Street, Entrance on the Harrison Street side of the building'
+
+
+@pytest.fixture
+def shows(app):
+    # Shows of venue 1: 10 days ago, in 10 days (90 minutes), and in 400 days
+    with app.app_context():
+        db.session.add(Venue(name=VENUE_NAME, city='San Francisco', state='CA', address=ADDRESS,
+                             phone='1', genres='Jazz', seeking_talent=False))
+        db.session.add(Artist(name='Band', city='San Francisco', state='CA', phone='1',
+                              genres='Jazz', seeking_venue=False))
+        db.session.flush()
+        for days, duration in ((-10, 120), (10, 90), (400, 120)):
+            db.session.add(Shows(venue_id=1, artist_id=1, duration=duration,
+                                 start_time=NOW + timedelta(days=days)))
+        db.session.commit()
+
+
+def unfold(body):
+    return body.replace('\r\n ', '').split('\r\n')
+
+
+def events(response):
+    assert response.status_code == 200
+    return [line for line in unfold(response.get_data(as_text=True)) if line.startswith('UID:')]
+
+
+def test_escape():
+    assert escape('a\\b;c,d\ne\r\nf') == 'a\\\\b\\;c\\,d\\ne\\nf'
+    assert escape(None) == ''
+
+
+def test_fold():
+    assert fold('SUMMARY:short') == 'SUMMARY:short\r\n'
+    line = 'LOCATION:' + 'é' * 80
+    folded = fold(line)
+    assert folded.endswith('\r\n')
+    parts = folded[:-2].split('\r\n')
+    assert all(len(part.encode('utf-8')) <= 75 for part in parts)
+    assert all(part.startswith(' ') for part in parts[1:])
+    assert ''.join([parts[0]] + [part[1:] for part in parts[1:]]) == line
+
+
+def test_feed(client, shows):
+    response = client.get('/venues/1/calendar.ics')
+    assert response.mimetype == 'text/calendar'
+    body = response.get_data(as_text=True)
+    assert body.startswith('BEGIN:VCALENDAR\r\n') and body.endswith('END:VCALENDAR\r\n')
+    assert all(len(line.encode('utf-8')) <= 75 for line in body.split('\r\n'))
+    lines = unfold(body)
+    assert 'X-WR-CALNAME:Café Olé\\; Music\\, Bar & Grill | Fyyur' in lines
+    assert 'SUMMARY:Band at Café Olé\\; Music\\, Bar & Grill' in lines
+    assert ('LOCATION:Café Olé\\; Music\\, Bar & Grill\\, 1015 Folsom Street\\, Entrance on the '
+            'Harrison Street side of the building\\, San Francisco\\, CA') in lines
+    start = NOW + timedelta(days=10)
+    event = lines[lines.index('UID:show-2@fyyur'):]
+    assert f"DTSTART:{start:%Y%m%dT%H%M%S}" in event[:4]
+    assert f"DTEND:{start + timedelta(minutes=90):%Y%m%dT%H%M%S}" in event[:4]
+    # Events link to the other side: the venue's feed to the artist
+    assert 'URL:http://localhost/artists/1' in lines
+    artist_feed = client.get('/artists/1/calendar.ics')
+    assert 'URL:http://localhost/venues/1' in unfold(artist_feed.get_data(as_text=True))
+    assert events(artist_feed) == events(response)
+
+
+def test_window(client, shows):
+    # By default 30 days back and 365 ahead
+    assert events(client.get('/venues/1/calendar.ics')) == ['UID:show-1@fyyur', 'UID:show-2@fyyur']
+    later = NOW + timedelta(days=300)
+    assert events(client.get(f'/venues/1/calendar.ics?from={later:%Y-%m-%d}')) == ['UID:show-3@fyyur']
+    assert events(client.get(f'/venues/1/calendar.ics?to={NOW.isoformat()}')) == ['UID:show-1@fyyur']
+    start, end = NOW + timedelta(days=9), NOW + timedelta(days=11)
+    assert events(client.get(f'/venues/1/calendar.ics?from={start.isoformat()}'
+                             f'&to={end.isoformat()}')) == ['UID:show-2@fyyur']
+
+
+@pytest.mark.parametrize('query', ['from=yesterday', 'to=2031-13-01',
+                                   'from=2031-02-01&to=2031-01-01', 'from=2030-01-01&to=2033-01-01'])
+def test_bad_window(client, shows, query):
+    assert client.get(f'/venues/1/calendar.ics?{query}').status_code == 400
+    assert client.get(f'/artists/1/calendar.ics?{query}').status_code == 400
+
+
+def test_feed_revalidation(app, client, shows):
+    response = client.get('/venues/1/calendar.ics')
+    assert response.headers['Cache-Control'] == 'public, max-age=300'
+    etag = response.headers['ETag']
+    assert client.get('/venues/1/calendar.ics', headers={'If-None-Match': etag}).status_code == 304
+    app.test_client().post('/shows/create', data={
+        'venue_id': 1, 'artist_id': 1, 'start_time': f"{NOW + timedelta(days=20):%Y-%m-%d %H:%M:%S}"})
+    response = client.get('/venues/1/calendar.ics', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert len(events(response)) == 3
+
+
+def test_shows_range(client, shows):
+    def shown(query):
+        response = client.get(f'/shows?{query}')
+        assert response.status_code == 200
+        return response.get_data(as_text=True).count('/venues/1"')
+
+    assert shown('') == 3
+    assert shown(f"from={NOW:%Y-%m-%d}") == 2
+    assert shown(f"from={NOW:%Y-%m-%d}&to={NOW + timedelta(days=30):%Y-%m-%d}") == 1
+    assert client.get('/shows?from=soon').status_code == 400
+    assert client.get('/shows?from=2031-02-01&to=2031-01-01').status_code == 400
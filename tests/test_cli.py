@@ -0,0 +1,56 @@
+import os
+import sys
+from flask_migrate import upgrade
+from sqlalchemy import inspect
+from app import create_app
+from models import db, Venue, Shows
+
+MIGRATIONS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'migrations')
+
+
+def test_commands_registered_outside_the_cli(app):
+    assert {'import', 'export', 'seed', 'conflicts', 'geocode', 'assets',
+            'check-query-budgets', 'rollover-show-counters'} <= set(app.cli.commands)
+
+
+def test_deferred_commands_run(app):
+    result = app.test_cli_runner().invoke(args=['seed', '--venues', '5', '--artists', '5',
+                                                '--shows', '20'])
+    assert result.exit_code == 0, result.output
+    assert 'seeder' in sys.modules
+    with app.app_context():
+        assert Venue.query.count() == 5
+        assert Shows.query.count() > 0
+
+
+def test_seed_reports_the_shows_inserted(app):
+    # Two venues cannot hold 2000 shows in two years: many are dropped
+    result = app.test_cli_runner().invoke(args=['seed', '--venues', '2', '--artists', '2',
+                                                '--shows', '2000'])
+    assert 'shows dropped' in result.output
+    with app.app_context():
+        assert f", {Shows.query.count()} shows in" in result.output
+
+
+def test_conflicts_exit_status(app):
+    runner = app.test_cli_runner()
+    runner.invoke(args=['seed', '--venues', '2', '--artists', '2', '--shows', '10'])
+    assert runner.invoke(args=['conflicts']).exit_code == 0
+    with app.app_context():
+        # A Core insert skips the booking check
+        show = Shows.query.first()
+        db.session.execute(Shows.__table__.insert(), {
+            'venue_id': show.venue_id, 'artist_id': show.artist_id,
+            'start_time': show.start_time, 'duration': show.duration})
+        db.session.commit()
+    result = runner.invoke(args=['conflicts'])
+    assert result.exit_code == 1
+    assert '1 venue conflicts' in result.output and '1 artist conflicts' in result.output
+
+
+def test_migrations(tmp_path):
+    app = create_app(SQLALCHEMY_DATABASE_URI=f"sqlite:///{tmp_path / 'migrated.db'}",
+                     SQLALCHEMY_TRACK_MODIFICATIONS=False, TESTING=True)
+    with app.app_context():
+        upgrade(directory=MIGRATIONS)
+        assert 'geocell' in [column['name'] for column in inspect(db.engine).get_columns('Venue')]
@@ -0,0 +1,89 @@
+from datetime import datetime
+import pytest
+from conftest import make_app
+from models import db, Venue, Artist, Shows
+from test_database import FORM
+
+ARTIST_FORM = {key: value for key, value in FORM.items() if key != 'address'}
+
+# Endpoints decorated with @conditional, and their Cache-Control
+PAGES = {
+    '/venues': 'private, no-cache',
+    '/venues/near?lat=37.77&lng=-122.42': 'private, no-cache',
+    '/venues/1': 'private, no-cache',
+    '/venues/1/calendar.ics': 'public, max-age=300',
+    '/artists': 'private, no-cache',
+    '/artists/1': 'private, no-cache',
+    '/artists/1/calendar.ics': 'public, max-age=300',
+    '/shows': 'private, no-cache',
+    '/api/v1/venues': 'private, no-cache',
+    '/api/v1/venues/1': 'private, no-cache',
+    '/api/v1/venues/1/shows': 'private, no-cache',
+    '/api/v1/artists': 'private, no-cache',
+    '/api/v1/artists/1': 'private, no-cache',
+    '/api/v1/artists/1/shows': 'private, no-cache',
+    '/api/v1/shows': 'private, no-cache',
+}
+
+
+@pytest.fixture
+def app(tmp_path):
+    # One time bucket for the whole test
+    app = make_app(tmp_path, CONDITIONAL_GET_TIME_BUCKET=86400)
+    with app.app_context():
+        db.session.add(Venue(name='Hall', city='San Francisco', state='CA', address='1',
+                             phone='1', genres='Jazz', seeking_talent=False,
+                             latitude=37.77, longitude=-122.42))
+        db.session.add(Artist(name='Band', city='San Francisco', state='CA', phone='1',
+                              genres='Jazz', seeking_venue=False))
+        db.session.flush()
+        db.session.add(Shows(venue_id=1, artist_id=1, start_time=datetime(2031, 6, 1, 20)))
+        db.session.commit()
+    return app
+
+
+def etags(client):
+    return {url: client.get(url).headers['ETag'] for url in PAGES}
+
+
+@pytest.mark.parametrize('url', PAGES)
+def test_revalidation(client, url):
+    response = client.get(url)
+    assert response.status_code == 200
+    assert response.headers['Cache-Control'] == PAGES[url]
+    revalidated = client.get(url, headers={'If-None-Match': response.headers['ETag']})
+    assert revalidated.status_code == 304
+    assert revalidated.get_data() == b''
+    assert revalidated.headers['ETag'] == response.headers['ETag']
+    assert revalidated.headers['Cache-Control'] == PAGES[url]
+    since = client.get(url, headers={'If-Modified-Since': response.headers['Last-Modified']})
+    assert since.status_code == 304
+    assert client.get(url, headers={'If-None-Match': '"other"'}).status_code == 200
+
+
+def changed(before, after):
+    return {url for url in PAGES if before[url] != after[url]}
+
+
+def test_venue_write(app, client):
+    before = etags(client)
+    # A separate client: the flashed message would skip the conditional GET
+    app.test_client().post('/venues/1/edit', data=dict(FORM, name='New Hall'))
+    # Bumps 'Venue' and 'Venue:1': only the artist list does not depend on them
+    assert changed(before, etags(client)) == set(PAGES) - {'/artists'}
+
+
+def test_artist_write(app, client):
+    before = etags(client)
+    app.test_client().post('/artists/1/edit', data=dict(ARTIST_FORM, name='New Band'))
+    # Bumps 'Artist' and 'Artist:1'
+    assert changed(before, etags(client)) == set(PAGES) - {
+        '/venues', '/venues/near?lat=37.77&lng=-122.42'}
+
+
+def test_show_write(app, client):
+    before = etags(client)
+    app.test_client().post('/shows/create', data={'venue_id': 1, 'artist_id': 1,
+                                                  'start_time': '2031-07-01 20:00:00'})
+    # Bumps 'Show', 'Venue:1' and 'Artist:1'
+    assert changed(before, etags(client)) == set(PAGES) - {'/artists'}
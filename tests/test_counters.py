@@ -0,0 +1,77 @@
+from datetime import datetime, timedelta
+import pytest
+from models import db, Venue, Artist, Shows, ShowCounters
+import counters
+
+
+@pytest.fixture
+def owners(app):
+    with app.app_context():
+        db.session.add(Venue(name='Hall', city='San Francisco', state='CA', address='1',
+                             phone='1', genres='Jazz', seeking_talent=False))
+        db.session.add(Artist(name='Band', city='San Francisco', state='CA', phone='1',
+                              genres='Jazz', seeking_venue=False))
+        db.session.commit()
+
+
+def add_show(start_time):
+    show = Shows(venue_id=1, artist_id=1, start_time=start_time)
+    db.session.add(show)
+    db.session.commit()
+    return show
+
+
+def counts():
+    # (upcoming, past) of the venue and of the artist
+    venue, artist = Venue.query.get(1), Artist.query.get(1)
+    return ((venue.upcoming_shows_count, venue.past_shows_count),
+            (artist.upcoming_shows_count, artist.past_shows_count))
+
+
+def test_insert_and_delete(app, owners):
+    with app.app_context():
+        # No ShowCounters row (db.create_all()): the first show starts the counters now
+        assert ShowCounters.query.count() == 0
+        past = add_show(datetime.now() - timedelta(days=30))
+        assert ShowCounters.query.count() == 1
+        assert counts() == ((0, 1), (0, 1))
+        upcoming = add_show(datetime.now() + timedelta(days=30))
+        assert counts() == ((1, 1), (1, 1))
+        db.session.delete(past)
+        db.session.commit()
+        assert counts() == ((1, 0), (1, 0))
+        db.session.delete(upcoming)
+        db.session.commit()
+        assert counts() == ((0, 0), (0, 0))
+
+
+def test_rollover(app, owners):
+    now = datetime.now()
+    with app.app_context():
+        db.session.add(ShowCounters(id=1, cutoff=now - timedelta(days=2)))
+        db.session.commit()
+        add_show(now - timedelta(days=3))
+        add_show(now - timedelta(days=1))       # started since the cutoff
+        add_show(now + timedelta(days=1))
+        assert counts() == ((2, 1), (2, 1))
+        assert counters.rollover(now) == 1
+        db.session.commit()
+        assert counts() == ((1, 2), (1, 2))
+        assert ShowCounters.query.get(1).cutoff == now
+        assert counters.rollover(now) == 0
+        # The same numbers as counting from scratch
+        counters.recount()
+        db.session.commit()
+        assert counts() == ((1, 2), (1, 2))
+
+
+def test_rollover_command(app, owners):
+    with app.app_context():
+        db.session.add(ShowCounters(id=1, cutoff=datetime.now() - timedelta(days=2)))
+        db.session.commit()
+        add_show(datetime.now() - timedelta(days=1))
+    result = app.test_cli_runner().invoke(args=['rollover-show-counters'])
+    assert result.exit_code == 0
+    assert result.output == '1 shows rolled over to past\n'
+    with app.app_context():
+        assert counts() == ((0, 1), (0, 1))
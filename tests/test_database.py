@@ -0,0 +1,78 @@
+import pytest
+from conftest import make_app
+from models import db, Venue
+
+# Two SQLite files stand in for a primary and its replica. They hold
+# different venues, so a response tells which one served it.
+
+FORM = {
+    'name': 'New Hall', 'city': 'San Francisco', 'state': 'CA', 'address': '1 Market Street',
+    'phone': '4155550100', 'genres': 'Jazz', 'facebook_link': 'https://www.facebook.com/newhall',
+    'image_link': 'https://example.com/hall.jpg', 'website_link': 'https://example.com',
+    'seeking_description': 'Bands',
+}
+
+
+def database(tmp_path, name):
+    directory = tmp_path / name
+    directory.mkdir()
+    app = make_app(directory)
+    with app.app_context():
+        db.session.add(Venue(name=f'{name.title()} Hall', city='San Francisco', state='CA',
+                             address='1', phone='1', genres='Jazz', seeking_talent=False))
+        db.session.commit()
+    return app.config['SQLALCHEMY_DATABASE_URI']
+
+
+@pytest.fixture
+def uris(tmp_path):
+    return database(tmp_path, 'primary'), database(tmp_path, 'replica')
+
+
+def routed_app(tmp_path, uris, **overrides):
+    primary, replica = uris
+    return make_app(tmp_path, SQLALCHEMY_DATABASE_URI=primary, SQLALCHEMY_REPLICA_URIS=[replica],
+                    **overrides)
+
+
+def venue_names(client, url='/api/v1/venues?fields=name'):
+    return [venue['name'] for venue in client.get(url).get_json()['data']]
+
+
+def test_reads_go_to_the_replica(tmp_path, uris):
+    client = routed_app(tmp_path, uris).test_client()
+    assert venue_names(client) == ['Replica Hall']
+    assert 'Replica Hall' in client.get('/venues').get_data(as_text=True)
+    assert 'Replica Hall' in client.get('/venues/1').get_data(as_text=True)
+
+
+def test_writes_go_to_the_primary_and_pin_the_client(tmp_path, uris):
+    app = routed_app(tmp_path, uris)
+    client = app.test_client()
+    client.post('/venues/create', data=FORM)
+    # The writer reads its own write from the primary...
+    assert venue_names(client) == ['Primary Hall', 'New Hall']
+    # ...other clients keep reading from the replica
+    assert venue_names(app.test_client()) == ['Replica Hall']
+
+
+def test_pin_expires(tmp_path, uris):
+    client = routed_app(tmp_path, uris, REPLICA_PIN_SECONDS=0).test_client()
+    client.post('/venues/create', data=FORM)
+    assert venue_names(client) == ['Replica Hall']
+
+
+def test_without_replicas_reads_go_to_the_primary(tmp_path, uris):
+    app = make_app(tmp_path, SQLALCHEMY_DATABASE_URI=uris[0])
+    assert app.extensions['replicas'] == []
+    assert venue_names(app.test_client()) == ['Primary Hall']
+
+
+def test_pool_stats(tmp_path, uris):
+    app = routed_app(tmp_path, uris, POOL_STATS=True)
+    stats = app.test_client().get('/debug/pool').get_json()
+    assert set(stats) == {'primary', 'replica0'}
+
+
+def test_pool_stats_off_by_default(tmp_path):
+    assert make_app(tmp_path).test_client().get('/debug/pool').status_code == 404
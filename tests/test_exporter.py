@@ -0,0 +1,63 @@
+import time
+from datetime import datetime, timedelta
+from models import db, Venue, Artist, Shows
+import counters
+import exporter
+import geo
+
+
+def exported_ids(kind, since):
+    return [row.id for row in exporter.export_rows(kind, since)]
+
+
+def add_catalogue():
+    venue = Venue(name='The Musical Hop', city='Nowhere', state='CA', address='1', phone='1',
+                  genres='Jazz', seeking_talent=False)
+    artist = Artist(name='Guns N Petals', city='San Francisco', state='CA', phone='1',
+                    genres='Rock n Roll', seeking_venue=False)
+    db.session.add_all([venue, artist])
+    db.session.flush()
+    db.session.add(Shows(venue_id=venue.id, artist_id=artist.id,
+                         start_time=datetime.now() + timedelta(seconds=1)))
+    db.session.commit()
+    return venue.id
+
+
+def moments_later():
+    time.sleep(0.01)
+    return datetime.utcnow()
+
+
+def test_incremental_export(app):
+    with app.app_context():
+        venue_id = add_catalogue()
+        since = moments_later()
+        assert exported_ids('venues', since) == []
+        db.session.get(Venue, venue_id).phone = '2'
+        db.session.commit()
+        assert exported_ids('venues', since) == [venue_id]
+
+
+def test_derived_updates_are_not_exported(app):
+    with app.app_context():
+        add_catalogue()
+        since = moments_later()
+        counters.recount()
+        counters.rollover(datetime.now() + timedelta(days=1))
+        db.session.commit()
+        assert db.session.query(Venue.past_shows_count).scalar() == 1
+        assert exported_ids('venues', since) == []
+        assert exported_ids('artists', since) == []
+
+
+def test_located_venues_are_exported(app):
+    with app.app_context():
+        venue_id = add_catalogue()
+        # A venue written by a Core insert, before being located
+        db.session.query(Venue).update({'city': 'Austin', 'state': 'TX', 'latitude': None,
+                                        'longitude': None, 'geocell': None})
+        db.session.commit()
+        since = moments_later()
+        assert geo.locate()[0] == 1
+        db.session.commit()
+        assert exported_ids('venues', since) == [venue_id]
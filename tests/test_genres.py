@@ -0,0 +1,39 @@
+from models import db, Venue, Artist, venue_genres, artist_genres
+import genres
+
+
+def add_venue(**fields):
+    venue = Venue(name='The Musical Hop', city='San Francisco', state='CA', address='1015 Folsom Street',
+                  phone='123-123-1234', genres='Jazz,Reggae', seeking_talent=False, **fields)
+    db.session.add(venue)
+    db.session.commit()
+    return venue.id
+
+
+def test_genres_are_linked(app):
+    with app.app_context():
+        venue_id = add_venue()
+        assert db.session.query(Venue.id).filter(genres.with_genre(Venue, 'jazz')).all() == [(venue_id,)]
+        assert genres.all_names() == ['Jazz', 'Reggae']
+
+
+def test_delete_venue_with_genres(app, client):
+    with app.app_context():
+        venue_id = add_venue()
+    response = client.delete(f'/venues/{venue_id}')
+    assert response.status_code == 302
+    with app.app_context():
+        assert db.session.get(Venue, venue_id) is None
+        assert db.session.query(venue_genres).count() == 0
+
+
+def test_delete_artist_with_genres(app):
+    with app.app_context():
+        artist = Artist(name='Guns N Petals', city='San Francisco', state='CA', phone='326-123-5000',
+                        genres='Rock n Roll', seeking_venue=False)
+        db.session.add(artist)
+        db.session.commit()
+        db.session.delete(artist)
+        db.session.commit()
+        assert db.session.query(Artist).count() == 0
+        assert db.session.query(artist_genres).count() == 0
@@ -0,0 +1,62 @@
+from models import db, Venue
+import geo
+
+NEW_YORK = (40.7128, -74.006)
+
+FORM = {
+    'name': 'The Dueling Pianos Bar', 'city': 'New York', 'state': 'NY',
+    'address': '335 Delancey Street', 'phone': '9140031132', 'genres': 'Jazz',
+    'facebook_link': 'https://www.facebook.com/theduelingpianos',
+    'image_link': 'https://example.com/pianos.jpg', 'website_link': 'https://example.com',
+    'seeking_description': 'Pianists', 'latitude': '', 'longitude': '',
+}
+
+
+def venue_location(app, name):
+    with app.app_context():
+        venue = Venue.query.filter_by(name=name).one()
+        return venue.id, venue.latitude, venue.longitude, venue.geocell
+
+
+def test_none_coordinates_are_not_given(app):
+    with app.app_context():
+        venue = Venue(name='Blank', city='New York', state='NY', address='1', phone='1',
+                      genres='Jazz', seeking_talent=False, latitude=None, longitude=None)
+        db.session.add(venue)
+        db.session.commit()
+        assert (venue.latitude, venue.longitude) == NEW_YORK
+        assert venue.geocell == geo.cell_of(*NEW_YORK)
+
+
+def test_create_without_coordinates(app, client):
+    client.post('/venues/create', data=FORM)
+    venue_id, latitude, longitude, geocell = venue_location(app, FORM['name'])
+    assert (latitude, longitude) == NEW_YORK
+    assert geocell == geo.cell_of(*NEW_YORK)
+    page = client.get('/venues/near?lat=40.73&lng=-74.0&radius=10').get_data(as_text=True)
+    assert f'/venues/{venue_id}"' in page
+
+
+def test_create_with_coordinates(app, client):
+    client.post('/venues/create', data=dict(FORM, latitude='40.68', longitude='-73.97'))
+    _, latitude, longitude, geocell = venue_location(app, FORM['name'])
+    assert (latitude, longitude, geocell) == (40.68, -73.97, geo.cell_of(40.68, -73.97))
+
+
+def test_edit_moves_venue_to_new_city(app, client):
+    client.post('/venues/create', data=FORM)
+    venue_id, latitude, longitude, _ = venue_location(app, FORM['name'])
+    # The edit form comes back with the old coordinates filled in
+    client.post(f'/venues/{venue_id}/edit', data=dict(
+        FORM, city='Chicago', state='IL', latitude=str(latitude), longitude=str(longitude)))
+    _, latitude, longitude, geocell = venue_location(app, FORM['name'])
+    chicago = geo.gazetteer(app.config['GAZETTEER_PATH'])[('chicago', 'IL')]
+    assert (latitude, longitude) == chicago
+    assert geocell == geo.cell_of(*chicago)
+
+
+def test_edit_sets_coordinates(app, client):
+    client.post('/venues/create', data=FORM)
+    venue_id = venue_location(app, FORM['name'])[0]
+    client.post(f'/venues/{venue_id}/edit', data=dict(FORM, latitude='40.68', longitude='-73.97'))
+    assert venue_location(app, FORM['name'])[1:] == (40.68, -73.97, geo.cell_of(40.68, -73.97))
@@ -0,0 +1,100 @@
+import csv
+import json
+from models import db, Venue, Artist, Shows, ImportCheckpoint
+from importer import Importer
+import genres
+from test_database import FORM
+
+VENUE = dict(FORM, genres='Jazz,Blues', seeking_talent='yes')
+
+
+def write_csv(path, rows):
+    with open(path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+    return str(path)
+
+
+def write_jsonl(path, rows):
+    path.write_text(''.join(json.dumps(row) + '\n' for row in rows))
+    return str(path)
+
+
+def run(app, *args):
+    return app.test_cli_runner().invoke(args=['import', *args])
+
+
+def test_rows_are_validated(app, tmp_path):
+    path = write_csv(tmp_path / 'venues.csv', [
+        dict(VENUE, name='Good Hall'),
+        dict(VENUE, name=''),                       # required
+        dict(VENUE, name='Bad Genre', genres='Polka'),
+        dict(VENUE, name='Other Hall', genres='Folk', seeking_talent='no'),
+    ])
+    result = run(app, 'venues', path)
+    assert result.exit_code == 1
+    assert 'venues: 2 inserted, 2 rejected' in result.output
+    assert 'row 2: ' in result.output and "'name'" in result.output
+    assert 'row 3: ' in result.output and "'genres'" in result.output
+    with app.app_context():
+        venues = {venue.name: venue for venue in Venue.query}
+        assert set(venues) == {'Good Hall', 'Other Hall'}
+        assert venues['Good Hall'].genres == 'Jazz,Blues' and venues['Good Hall'].seeking_talent
+        assert not venues['Other Hall'].seeking_talent
+        # Genre links are written for the Core inserts
+        assert [venue.name for venue in Venue.query.filter(genres.with_genre(Venue, 'Blues'))] == [
+            'Good Hall']
+
+
+def test_shows_resolve_names_and_ids(app, tmp_path):
+    with app.app_context():
+        for name in ('Hall', 'Twin', 'Twin'):
+            db.session.add(Venue(name=name, city='San Francisco', state='CA', address='1',
+                                 phone='1', genres='Jazz', seeking_talent=False))
+        db.session.add(Artist(name='Band', city='San Francisco', state='CA', phone='1',
+                              genres='Jazz', seeking_venue=False))
+        db.session.commit()
+    path = write_jsonl(tmp_path / 'shows.jsonl', [
+        {'venue': 'Hall', 'artist': 'Band', 'start_time': '2031-06-01T20:00:00'},
+        {'venue_id': 1, 'artist_id': '1', 'start_time': '2031-06-02 20:00:00', 'duration': 90},
+        {'venue': 'Twin', 'artist': 'Band', 'start_time': '2031-06-03 20:00:00'},  # ambiguous
+        {'venue_id': 99, 'artist': 'Band', 'start_time': '2031-06-04 20:00:00'},   # unknown
+    ])
+    result = run(app, 'shows', path)
+    assert result.exit_code == 1
+    assert 'shows: 2 inserted, 2 rejected' in result.output
+    assert result.output.count('unknown or ambiguous id/name') == 2
+    with app.app_context():
+        assert [(show.venue_id, show.duration) for show in Shows.query.order_by(Shows.id)] == [
+            (1, 120), (1, 90)]
+        # Counters are recounted for the Core inserts
+        assert Venue.query.get(1).upcoming_shows_count == 2
+
+
+def test_resume_after_failed_chunk(app, tmp_path, monkeypatch):
+    path = write_csv(tmp_path / 'venues.csv', [dict(VENUE, name=f'Hall {number}')
+                                               for number in range(1, 6)])
+    write = Importer.write
+
+    def failing_write(importer, records):
+        if any(record['name'] == 'Hall 4' for record in records):
+            raise RuntimeError('connection lost')
+        write(importer, records)
+
+    monkeypatch.setattr(Importer, 'write', failing_write)
+    result = run(app, 'venues', path, '--chunk-size', '2')
+    assert isinstance(result.exception, RuntimeError)
+    assert 're-run to resume after row 2' in result.output
+    with app.app_context():
+        assert Venue.query.count() == 2
+        assert ImportCheckpoint.query.one().rows_committed == 2
+
+    monkeypatch.setattr(Importer, 'write', write)
+    result = run(app, 'venues', path, '--chunk-size', '2')
+    assert result.exit_code == 0, result.output
+    assert 'resuming' in result.output and 'after row 2' in result.output
+    with app.app_context():
+        assert [venue.name for venue in Venue.query.order_by(Venue.id)] == [
+            f'Hall {number}' for number in range(1, 6)]
+        assert ImportCheckpoint.query.count() == 0
@@ -0,0 +1,45 @@
+import importlib
+import pytest
+from conftest import make_app
+import config
+
+
+@pytest.mark.parametrize('environ, endpoint', [
+    ({}, False),
+    ({'METRICS_ENDPOINT': '1'}, True),
+    ({'METRICS_TOKEN': 's3cret'}, True),
+    ({'METRICS_ENDPOINT': '0', 'METRICS_TOKEN': 's3cret'}, True),
+])
+def test_endpoint_setting(monkeypatch, environ, endpoint):
+    # Off unless asked for, whatever DEBUG is
+    for name in ('METRICS_ENDPOINT', 'METRICS_TOKEN'):
+        monkeypatch.delenv(name, raising=False)
+    for name, value in environ.items():
+        monkeypatch.setenv(name, value)
+    try:
+        assert importlib.reload(config).METRICS_ENDPOINT is endpoint
+    finally:
+        monkeypatch.undo()
+        importlib.reload(config)
+
+
+def test_endpoint_off(tmp_path):
+    client = make_app(tmp_path).test_client()
+    assert client.get('/metrics').status_code == 404
+    # Server-Timing is recorded either way
+    assert 'Server-Timing' in client.get('/api/v1/venues').headers
+
+
+def test_endpoint(tmp_path):
+    client = make_app(tmp_path, METRICS_ENDPOINT=True).test_client()
+    client.get('/api/v1/venues')
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert 'endpoint="api.venues"' in response.get_data(as_text=True)
+
+
+def test_token(tmp_path):
+    client = make_app(tmp_path, METRICS_ENDPOINT=True, METRICS_TOKEN='s3cret').test_client()
+    assert client.get('/metrics').status_code == 401
+    assert client.get('/metrics', headers={'Authorization': 'Bearer wrong'}).status_code == 401
+    assert client.get('/metrics', headers={'Authorization': 'Bearer s3cret'}).status_code == 200
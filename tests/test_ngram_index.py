@@ -0,0 +1,89 @@
+from sqlalchemy import event
+from models import db, Venue
+from conditional import bump
+import ngram_index
+from ngram_index import NgramIndex
+
+
+def test_index():
+    index = NgramIndex()
+    index.add(1, 'The Musical Hop')
+    index.add(2, 'Park Square Live Music & Coffee')
+    assert index.search('music') == [1, 2]
+    assert index.search('hop') == [1]
+    index.remove(1)
+    assert index.search('music') == [2]
+    assert index.stats()['documents'] == 1
+
+
+def add_venue(name):
+    # A write as any worker makes it: the row and a bump of the stamp
+    venue = Venue(name=name, city='San Francisco', state='CA', address='1', phone='1',
+                  genres='Jazz', seeking_talent=False)
+    db.session.add(venue)
+    bump('Venue')
+    db.session.commit()
+    return venue.id
+
+
+def names(term):
+    return [row.name for row in ngram_index.search(Venue, term)]
+
+
+def test_writes_by_other_workers(app):
+    with app.app_context():
+        add_venue('The Musical Hop')
+        assert names('music') == ['The Musical Hop']
+        # Not record()ed here: the stamp tells the index to rebuild
+        venue_id = add_venue('Park Square Live Music')
+        assert names('music') == ['The Musical Hop', 'Park Square Live Music']
+        db.session.delete(db.session.get(Venue, venue_id))
+        bump('Venue')
+        db.session.commit()
+        assert names('music') == ['The Musical Hop']
+
+
+def test_recorded_writes(app):
+    with app.app_context():
+        add_venue('The Musical Hop')
+        names('music')
+        version, index = ngram_index.indexes[ngram_index.index_key(Venue)]
+        venue_id = add_venue('Park Square Live Music')
+        ngram_index.record(Venue, venue_id, 'Park Square Live Music')
+        # The only write since the build: updated in place, not rebuilt
+        assert ngram_index.indexes[ngram_index.index_key(Venue)] == (version + 1, index)
+        assert names('music') == ['The Musical Hop', 'Park Square Live Music']
+
+
+def test_deleted_venue_leaves_search(app, client):
+    app.config['NGRAM_SEARCH_INDEX'] = True
+    with app.app_context():
+        venue_id = add_venue('The Musical Hop')
+        assert names('musical') == ['The Musical Hop']
+    client.delete(f'/venues/{venue_id}')
+    with app.app_context():
+        assert names('musical') == []
+        assert ngram_index.get_index(Venue).stats()['documents'] == 0
+
+
+def test_stamp_read_at_most_every_max_age(app):
+    app.config['INDEX_STAMP_MAX_AGE'] = 60
+    with app.app_context():
+        statements = []
+        event.listen(db.engine, 'before_cursor_execute',
+                     lambda connection, cursor, statement, *args: statements.append(statement))
+        add_venue('The Musical Hop')
+        assert names('music') == ['The Musical Hop']
+        del statements[:]
+        assert ngram_index.get_index(Venue).search('music') == [1]
+        assert statements == []
+        # Another worker's write shows up once the stamp is read again...
+        add_venue('Park Square Live Music')
+        assert names('music') == ['The Musical Hop']
+        app.config['INDEX_STAMP_MAX_AGE'] = 0
+        assert names('music') == ['The Musical Hop', 'Park Square Live Music']
+        # ...this worker's own at once
+        app.config['INDEX_STAMP_MAX_AGE'] = 60
+        venue_id = add_venue('Music Box')
+        ngram_index.record(Venue, venue_id, 'Music Box')
+        assert names('music') == ['Music Box', 'The Musical Hop', 'Park Square Live Music']
@@ -0,0 +1,158 @@
+import base64
+import re
+from datetime import datetime, timedelta
+from html import unescape
+import pytest
+from models import db, Venue, Artist, Shows
+from queries import encode_cursor
+
+NOW = datetime.now().replace(minute=0, second=0, microsecond=0)
+SHOW_LINK = re.compile(r'<h5><a href="/artists/(\d+)">')
+NEXT_LINK = re.compile(r'<a href="([^"]*)"><button class="btn btn-default btn-lg">Next')
+
+
+def add_owners(count):
+    for number in range(1, count + 1):
+        db.session.add(Venue(name=f'Hall {number}', city='San Francisco', state='CA',
+                             address='1', phone='1', genres='Jazz', seeking_talent=False))
+        db.session.add(Artist(name=f'Band {number}', city='San Francisco', state='CA',
+                              phone='1', genres='Jazz', seeking_venue=False))
+    db.session.flush()
+
+
+@pytest.fixture
+def shows(app):
+    # Show n: venue n, artist n. Two at a time, latest first, so that ids
+    # run against start_time and pages split ties:
+    # by (start_time, id) they are 6, 7, 4, 5, 2, 3, 1.
+    with app.app_context():
+        add_owners(7)
+        for number in range(1, 8):
+            db.session.add(Shows(venue_id=number, artist_id=number,
+                                 start_time=NOW + timedelta(days=(7 - number) // 2)))
+        db.session.commit()
+
+
+def walk(client, url):
+    # Show ids of the /shows pages from `url` on, following the Next links
+    ids, pages = [], 0
+    while url:
+        response = client.get(url)
+        assert response.status_code == 200
+        body = response.get_data(as_text=True)
+        ids += [int(show_id) for show_id in SHOW_LINK.findall(body)]
+        pages += 1
+        next_link = NEXT_LINK.search(body)
+        url = unescape(next_link.group(1)) if next_link else None
+    return ids, pages
+
+
+@pytest.mark.parametrize('limit, pages', [(1, 7), (2, 4), (3, 3), (7, 1), (30, 1)])
+def test_pages(client, shows, limit, pages):
+    assert walk(client, f'/shows?limit={limit}') == ([6, 7, 4, 5, 2, 3, 1], pages)
+
+
+def test_pages_of_a_range(client, shows):
+    # The Next link keeps ?from=&to=
+    url = f'/shows?limit=2&from={(NOW + timedelta(days=1)).date()}&to={(NOW + timedelta(days=3)).date()}'
+    assert walk(client, url) == ([4, 5, 2, 3], 2)
+
+
+def test_api_pages(client, shows):
+    ids, cursor = [], ''
+    while cursor is not None:
+        page = client.get(f'/api/v1/shows?fields=id&limit=2&after={cursor}').get_json()
+        ids += [show['id'] for show in page['data']]
+        cursor = page['next_cursor']
+    assert ids == [6, 7, 4, 5, 2, 3, 1]
+
+
+def test_page_after_a_deleted_show(app, client, shows):
+    # A cursor stays valid when its show is gone
+    cursor = encode_cursor(NOW + timedelta(days=1), 4)
+    with app.app_context():
+        db.session.delete(db.session.get(Shows, 4))
+        db.session.commit()
+    assert walk(client, f'/shows?limit=2&after={cursor}') == ([5, 2, 3, 1], 2)
+
+
+def raw_cursor(raw):
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+@pytest.mark.parametrize('cursor', [
+    'nonsense', '!!!', 'é', 'a',
+    raw_cursor('2031-06-01T20:00:00'),
+    raw_cursor('2031-06-01T20:00:00|x'),
+    raw_cursor('tomorrow|1'),
+    raw_cursor('2031-06-01T20:00:00|1|2'),
+])
+def test_tampered_cursor(client, shows, cursor):
+    assert client.get(f'/shows?after={cursor}').status_code == 400
+    assert client.get(f'/api/v1/shows?after={cursor}').status_code == 400
+
+
+#  Venue and artist pages
+#  ----------------------------------------------------------------
+
+TILE_LINK = re.compile(r'<h5><a href="/(?:artists|venues)/(\d+)">')
+MORE_LINK = re.compile(r'<a href="([^"]*)"><button class="btn btn-default">Show more')
+
+
+@pytest.fixture
+def schedule(app):
+    # Venue 1 has a show with each artist n, artist 1 one at each venue n:
+    # both have upcoming shows 5..9 (soonest first) and past shows 4..1
+    # (latest first), numbered by the other side.
+    app.config['DETAIL_SHOWS_PAGE_SIZE'] = 2
+    with app.app_context():
+        add_owners(9)
+        for number in range(1, 10):
+            db.session.add(Shows(venue_id=1, artist_id=number,
+                                 start_time=NOW + timedelta(days=number - 5, hours=12)))
+            if number > 1:
+                db.session.add(Shows(venue_id=number, artist_id=1,
+                                     start_time=NOW + timedelta(days=number - 5, hours=18)))
+        db.session.commit()
+
+
+def walk_section(client, url, section):
+    # Ids in one section (0: upcoming, 1: past) of the pages from `url` on,
+    # following its Show more links; the other section must stay put.
+    ids, pages, other = [], 0, None
+    while url:
+        response = client.get(url)
+        assert response.status_code == 200
+        sections = response.get_data(as_text=True).split('<section>')[1:]
+        ids += [int(owner_id) for owner_id in TILE_LINK.findall(sections[section])]
+        other_ids = TILE_LINK.findall(sections[1 - section])
+        assert other in (None, other_ids)
+        other = other_ids
+        pages += 1
+        more_link = MORE_LINK.search(sections[section])
+        url = unescape(more_link.group(1)) if more_link else None
+    return ids, pages
+
+
+@pytest.mark.parametrize('page', ['/venues/1', '/artists/1'])
+def test_show_more(client, schedule, page):
+    assert walk_section(client, page, 0) == ([5, 6, 7, 8, 9], 3)
+    assert walk_section(client, page, 1) == ([4, 3, 2, 1], 2)
+
+
+@pytest.mark.parametrize('page', ['/venues/1', '/artists/1'])
+def test_show_more_of_both_sections(client, schedule, page):
+    # Paging one section keeps the other's cursor
+    response = client.get(page)
+    more_links = MORE_LINK.findall(response.get_data(as_text=True))
+    assert len(more_links) == 2
+    upcoming_after = re.search(r'upcoming_after=([^&"]+)', unescape(more_links[0])).group(1)
+    # walk_section() checks the upcoming shows stay on their second page
+    assert walk_section(client, f'{page}?upcoming_after={upcoming_after}', 1) == ([4, 3, 2, 1], 2)
+
+
+@pytest.mark.parametrize('page', ['/venues/1', '/artists/1'])
+@pytest.mark.parametrize('argument', ['past_after', 'upcoming_after'])
+@pytest.mark.parametrize('cursor', ['nonsense', 'é', raw_cursor('2031-06-01T20:00:00|x')])
+def test_tampered_show_more_cursor(client, schedule, page, argument, cursor):
+    assert client.get(f'{page}?{argument}={cursor}').status_code == 400
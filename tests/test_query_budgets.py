@@ -0,0 +1,71 @@
+import pytest
+from flask import Response, stream_with_context
+from sqlalchemy import text
+from models import db
+from query_budgets import QueryBudgetExceeded, query_budget
+
+
+def run_queries(count):
+    for _ in range(count):
+        db.session.execute(text('SELECT 1'))
+
+
+@pytest.fixture
+def client(app):
+    app.config['QUERY_BUDGET_MODE'] = 'raise'
+    app.config['N_PLUS_ONE_THRESHOLD'] = 100
+
+    @query_budget(2)
+    def page(count):
+        run_queries(count)
+        return 'ok'
+
+    @query_budget(2)
+    def stream(count):
+        def body():
+            yield 'first chunk\n'
+            run_queries(count)
+            yield 'last chunk\n'
+        return Response(stream_with_context(body()))
+
+    app.add_url_rule('/budget/page/<int:count>', 'page', page)
+    app.add_url_rule('/budget/stream/<int:count>', 'stream', stream)
+    return app.test_client()
+
+
+def test_within_budget(client):
+    response = client.get('/budget/page/2')
+    assert response.headers['X-Query-Count'] == '2'
+    assert client.get('/budget/stream/2').get_data(as_text=True) == 'first chunk\nlast chunk\n'
+
+
+def test_over_budget(client):
+    with pytest.raises(QueryBudgetExceeded, match='3 queries, over the budget of 2'):
+        client.get('/budget/page/3')
+
+
+def test_statements_while_streaming_count(client):
+    response = client.get('/budget/stream/3')
+    with pytest.raises(QueryBudgetExceeded, match='3 queries, over the budget of 2'):
+        response.get_data()
+
+
+def test_warn_mode_logs(app, client, caplog):
+    app.config['QUERY_BUDGET_MODE'] = 'warn'
+    assert client.get('/budget/stream/3').get_data(as_text=True).endswith('last chunk\n')
+    assert 'over the budget of 2' in caplog.text
+
+
+def test_check_command(app):
+    result = app.test_cli_runner().invoke(args=['check-query-budgets'])
+    assert result.exit_code == 0, result.output
+
+    @query_budget(2)
+    def over():
+        run_queries(3)
+        return 'ok'
+
+    app.add_url_rule('/budget/over', 'over', over)
+    result = app.test_cli_runner().invoke(args=['check-query-budgets'])
+    assert result.exit_code == 1
+    assert 'FAIL' in result.output and '/budget/over' in result.output
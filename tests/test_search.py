@@ -0,0 +1,59 @@
+from models import db, Venue
+from search import search
+
+
+def add_venues(*names, city='San Francisco', genres='Jazz'):
+    for name in names:
+        db.session.add(Venue(name=name, city=city, state='CA', address='1',
+                             phone='1', genres=genres, seeking_talent=False))
+    db.session.commit()
+
+
+def names(rows):
+    return [row.name for row in rows]
+
+
+def test_fts_ranks_name_matches_first(app):
+    with app.app_context():
+        add_venues('Blues Alley', 'Bluebird Cafe', genres='Rock')
+        add_venues('Corner Bar', genres='Blues')
+        add_venues('Dive', city='Bluefield', genres='Rock')
+        # Token prefixes of name, then city, then genres
+        ranked = names(search(Venue, 'blue'))
+        assert sorted(ranked[:2]) == ['Bluebird Cafe', 'Blues Alley']
+        assert ranked[2:] == ['Dive', 'Corner Bar']
+        assert names(search(Venue, 'blues alley')) == ['Blues Alley']
+        assert sorted(names(search(Venue, 'blue', limit=2))) == ['Bluebird Cafe', 'Blues Alley']
+
+
+def test_fts_follows_updates_and_deletes(app):
+    with app.app_context():
+        add_venues('Blues Alley', 'Corner Bar')
+        venue = Venue.query.filter_by(name='Corner Bar').one()
+        venue.name = 'Blue Corner'
+        db.session.commit()
+        assert names(search(Venue, 'corner')) == ['Blue Corner']
+        db.session.delete(Venue.query.filter_by(name='Blues Alley').one())
+        db.session.commit()
+        assert names(search(Venue, 'blue')) == ['Blue Corner']
+
+
+def test_search_page(app, client):
+    with app.app_context():
+        add_venues('The Musical Hop', 'Park Square')
+    response = client.post('/venues/search', data={'search_term': 'musical'})
+    assert response.status_code == 200
+    page = response.get_data(as_text=True)
+    assert 'The Musical Hop' in page and 'Park Square' not in page
+
+
+def test_other_dialects_fall_back_to_ilike(app, monkeypatch):
+    with app.app_context():
+        add_venues('The Musical Hop', 'Park Square Live Music', '100% Jazz')
+        monkeypatch.setattr(db.engine.dialect, 'name', 'mysql')
+        assert [row.name for row in search(Venue, 'MUSIC')] == ['Park Square Live Music',
+                                                               'The Musical Hop']
+        assert [row.name for row in search(Venue, 'music', limit=1)] == ['Park Square Live Music']
+        # LIKE wildcards in the term match literally
+        assert [row.name for row in search(Venue, '0% j')] == ['100% Jazz']
+        assert search(Venue, 'q_ad') == []
@@ -0,0 +1,66 @@
+#----------------------------------------------------------------------------#
+# HTML pages, one blueprint per section (registered by create_app in app.py):
+#   views.venues    /venues...
+#   views.artists   /artists...
+#   views.shows     /shows...
+# and the helpers they share.
+#----------------------------------------------------------------------------#
+
+from datetime import datetime
+from flask import Response, abort, current_app, request, stream_with_context
+import genres
+import calendars
+
+def bool_arg(value):
+  return value.lower() in ('1', 'true', 'yes', 'on')
+
+def time_range():
+  # ?from=&to= as ISO dates or datetimes, (None, None) when absent
+  try:
+    return tuple(datetime.fromisoformat(request.args[name]) if request.args.get(name) else None
+                 for name in ('from', 'to'))
+  except ValueError:
+    abort(400)
+
+def search_results(matches):
+  return {
+    "count": len(matches),
+    "data": [{
+      "id": match.id,
+      "name": match.name,
+      "num_upcoming_shows": match.upcoming_shows_count
+    } for match in matches]
+  }
+
+def owner_page(owner, past_shows, upcoming_shows, upcoming_count, past_count):
+  # Template data of a venue/artist page: the model's columns plus its shows
+  return {
+    **owner.__dict__,
+    'genres': genres.split(owner.genres),
+    'past_shows': past_shows,
+    'upcoming_shows': upcoming_shows,
+    'past_shows_count': past_count,
+    'upcoming_shows_count': upcoming_count
+  }
+
+def stream_template(template_name, **context):
+  # Render a template piece by piece (see Flask's "Streaming Contents" pattern)
+  app = current_app._get_current_object()
+  app.update_template_context(context)
+  template = app.jinja_env.get_template(template_name)
+  stream = template.stream(context)
+  stream.enable_buffering(5)
+  return stream
+
+def calendar_feed(owner, owner_column, link):
+  # Streamed iCalendar feed of the owner's shows (see calendars.py)
+  try:
+    start, end = calendars.window(*time_range())
+  except ValueError:
+    abort(400)
+  rows = calendars.events_query(owner_column, owner.id, start, end).yield_per(calendars.BATCH_SIZE)
+  name = f"{owner.name} | Fyyur"
+  response = Response(stream_with_context(calendars.feed(name, rows, link)),
+                      mimetype='text/calendar')
+  response.headers['Content-Disposition'] = 'inline; filename=calendar.ics'
+  return response
@@ -0,0 +1,169 @@
+#----------------------------------------------------------------------------#
+# Artist pages: list, search, detail, create and edit.
+#----------------------------------------------------------------------------#
+
+from flask import Blueprint, render_template, request, flash, redirect, url_for
+from models import db, Artist, Shows
+import search
+import ngram_index
+from conditional import conditional, bump
+import cache
+import genres
+import calendars
+from queries import artists_query, show_counts, show_section, shows_query
+from cache import cached
+from database import read_only
+from query_budgets import query_budget
+from views import calendar_feed, owner_page, search_results
+
+blueprint = Blueprint('artists', __name__)
+
+#  Artists
+#  ----------------------------------------------------------------
+@blueprint.route('/artists')
+@read_only
+@conditional('Artist')
+@query_budget(3)
+def index():
+  # TODO: replace with real data returned from querying the database
+  
+  genre = request.args.get('genre')
+  artists = artists_query(*([genres.with_genre(Artist, genre)] if genre else [])).all()
+  return render_template('pages/artists.html', artists=artists, genre=genre)
+
+@blueprint.route('/artists/search', methods=['POST'])
+@read_only
+@query_budget(3)
+def search_artists():
+  # Ranked, case-insensitive prefix search on name, city and genres
+  # seach for "band" should return "The Wild Sax Band".
+  search_term = request.form.get('search_term', '')
+  matches = search.search(Artist, search_term)
+  return render_template('pages/search_artists.html', results=search_results(matches), search_term=search_term)
+
+@blueprint.route('/artists/<int:artist_id>')
+@read_only
+@conditional('Artist:{artist_id}', 'Venue', time_sensitive=True)
+@cached('artist:{artist_id}')
+@query_budget(6)
+def show_artist(artist_id):
+  # shows the artist page with the given artist_id
+  artist = Artist.query.get_or_404(artist_id)
+  # Each section is one bounded query on Show(artist_id, start_time), joined
+  # to the venue's name and image
+  shows = shows_query(['venue_id', 'venue_name', 'venue_image_link']
+          ).filter(Shows.artist_id == artist_id)
+  upcoming_count, past_count = show_counts(Shows.artist_id, artist_id)
+  past_shows = show_section(shows, upcoming=False, after=request.args.get('past_after'))
+  upcoming_shows = show_section(shows, upcoming=True, after=request.args.get('upcoming_after'))
+  # the cached page shows these venues' names and images
+  cache.add_tags(*(f'venue:{show.venue_id}' for show in past_shows.rows + upcoming_shows.rows))
+
+  ven_dict = owner_page(artist, past_shows, upcoming_shows, upcoming_count, past_count)
+  return render_template('pages/show_artist.html', artist=ven_dict)
+
+@blueprint.route('/artists/<int:artist_id>/calendar.ics')
+@read_only
+@conditional('Artist:{artist_id}', 'Venue', time_sensitive=calendars.WINDOW_BUCKET)
+@query_budget(3)
+def calendar(artist_id):
+  # iCalendar feed of the artist's shows, ?from=&to= (see calendars.py)
+  artist = Artist.query.get_or_404(artist_id)
+  return calendar_feed(artist, Shows.artist_id, calendars.venue_link)
+
+
+#  Update
+#  ----------------------------------------------------------------
+
+@blueprint.route('/artists/<int:artist_id>/edit', methods=['GET'])
+def edit_artist(artist_id):
+  from forms import ArtistForm
+  form = ArtistForm()
+  # TODO: populate form with fields from artist with ID <artist_id>
+  artist = Artist.query.get(artist_id)          # Query data based on id
+  # separate genres from ","
+  form.genres.data = genres.split(artist.genres)   
+
+  return render_template('forms/edit_artist.html', form=form, artist=artist)
+
+@blueprint.route('/artists/<int:artist_id>/edit', methods=['POST'])
+def edit_artist_submission(artist_id):
+  # TODO: take values from the form submitted, and update existing
+  # artist record with ID <artist_id> using the new attributes
+  from forms import ArtistForm
+  form = ArtistForm(request.form)
+
+  if form.validate():             
+    try:
+      artist = Artist.query.get(artist_id)       
+      artist.name = form.name.data
+      artist.city = form.city.data
+      artist.state = form.state.data
+      artist.phone = form.phone.data
+      artist.genres=",".join(form.genres.data)      
+      artist.facebook_link = form.facebook_link.data
+      artist.image_link = form.image_link.data
+      artist.seeking_venue = form.seeking_venue.data
+      artist.seeking_description = form.seeking_description.data
+      artist.website_link = form.website_link.data
+      db.session.add(artist)              
+      bump('Artist', f'Artist:{artist_id}')
+      db.session.commit()
+      ngram_index.record(Artist, artist_id, form.name.data)
+      cache.invalidate(f'artist:{artist_id}')
+      flash("Artist "+artist.name+" was edited succesfully")
+    except:
+      db.session.rollback()
+    finally:
+      db.session.close()
+  else:
+    flash("Artist was not edited!")
+
+  return redirect(url_for('artists.show_artist', artist_id=artist_id))
+#  Create Artist
+#  ----------------------------------------------------------------
+
+@blueprint.route('/artists/create', methods=['GET'])
+def create_artist_form():
+  from forms import ArtistForm
+  form = ArtistForm()
+  return render_template('forms/new_artist.html', form=form)
+
+@blueprint.route('/artists/create', methods=['POST'])
+def create_artist_submission():
+  # called upon submitting the new artist listing form
+  # TODO: insert form data as a new Venue record in the db, instead
+  # TODO: modify data to be the data object returned from db insertion
+  from forms import ArtistForm
+  form = ArtistForm(request.form)
+  if form.validate():           
+    try:
+      new_artist = Artist(      
+        name=form.name.data,
+        city=form.city.data,
+        state=form.state.data,
+        phone=form.phone.data,
+        genres=",".join(form.genres.data),
+        image_link= form.image_link.data,
+        facebook_link=form.facebook_link.data,
+        website_link=form.website_link.data,
+        seeking_venue=form.seeking_venue.data,
+        seeking_description=form.seeking_description.data,
+      )
+      db.session.add(new_artist)    
+      bump('Artist')
+      db.session.commit()
+      ngram_index.record(Artist, new_artist.id, new_artist.name)
+    # on successful db insert, flash success
+      flash('Artist ' + request.form['name'] + ' was successfully listed!')
+    except Exception:
+    # TODO: on unsuccessful db insert, flash an error instead.    
+      db.session.rollback()
+      flash('Artist' + request.form['name'] + ' was added unsuccessfully !')
+    # e.g., flash('An error occurred. Artist ' + data.name + ' could not be listed.')
+    finally:
+      db.session.close()
+  else:
+    flash("Artist was not added!")
+
+  return render_template('pages/home.html')
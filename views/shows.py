@@ -0,0 +1,103 @@
+#----------------------------------------------------------------------------#
+# Show pages: the paginated list and the booking form.
+#----------------------------------------------------------------------------#
+
+from flask import Blueprint, Response, current_app, render_template, request, flash, abort, stream_with_context
+from models import db, Shows
+from sqlalchemy.exc import IntegrityError
+from bookings import BookingConflict, booking_conflict
+from conditional import conditional, bump
+import cache
+from queries import KeysetPage, shows_page
+from cache import cached
+from database import read_only
+from query_budgets import query_budget
+from views import bool_arg, stream_template, time_range
+
+blueprint = Blueprint('shows', __name__)
+
+#  Shows
+#  ----------------------------------------------------------------
+
+SHOW_TILE_FIELDS = ['venue_id', 'artist_id', 'venue_name', 'artist_name', 'artist_image_link']
+
+@blueprint.route('/shows')
+@read_only
+@conditional('Show', 'Venue', 'Artist')
+@cached('shows')
+@query_budget(4)
+def index():
+  # displays list of shows at /shows, one keyset page at a time
+  # (?after=<cursor>&limit=<n>), optionally only those starting in
+  # ?from=&to= (ISO dates/times); ?stream=1 streams the page as it renders.
+  page_size = min(
+    request.args.get('limit', current_app.config['SHOWS_PAGE_SIZE'], type=int),
+    current_app.config['SHOWS_PAGE_SIZE_MAX'])
+  start, end = time_range()
+  if page_size < 1 or (start and end and end < start):
+    abort(400)
+  # Only the columns the template uses
+  query = shows_page(SHOW_TILE_FIELDS, request.args.get('after'), page_size, start, end)
+
+  streaming = request.args.get('stream', current_app.config['SHOWS_STREAMING'], type=bool_arg)
+  if streaming:
+    page = KeysetPage(query.yield_per(100), page_size)
+    return Response(stream_with_context(stream_template('pages/shows.html', shows=page)))
+  page = KeysetPage(query.all(), page_size)
+  cache.add_tags(*(f'venue:{show.venue_id}' for show in page.rows),
+                 *(f'artist:{show.artist_id}' for show in page.rows))
+  return render_template('pages/shows.html', shows=page)
+
+@blueprint.route('/shows/create')
+def create_shows():
+  # renders form. do not touch.
+  from forms import ShowForm
+  form = ShowForm()
+  return render_template('forms/new_show.html', form=form)
+
+@blueprint.route('/shows/create', methods=['POST'])
+def create_show_submission():
+  # called to create new shows in the db, upon submitting new show listing form
+  # TODO: insert form data as a new Show record in the db, instead
+  from forms import ShowForm
+  form = ShowForm(request.form)
+  if form.validate():
+    try:
+      new_show = Shows(                       
+        artist_id=form.artist_id.data,
+        venue_id=form.venue_id.data,
+        start_time=form.start_time.data,
+        duration=form.duration.data,
+      )
+      db.session.add(new_show)                
+      # the show appears on both detail pages and in /shows and /venues
+      bump('Show', f'Venue:{new_show.venue_id}', f'Artist:{new_show.artist_id}')
+      db.session.commit()
+      cache.invalidate('shows', 'venues', f'venue:{form.venue_id.data}', f'artist:{form.artist_id.data}')
+
+    # on successful db insert, flash success
+      flash('Show was successfully listed!')
+    # TODO: on unsuccessful db insert, flash an error instead.
+    except (BookingConflict, IntegrityError) as error:
+      # double booking (bookings.py), found by the check or, for concurrent
+      # bookings, by the exclusion constraints: back to the form to pick
+      # another time
+      db.session.rollback()
+      conflict = booking_conflict(error, new_show)
+      if conflict is None:
+        flash("Show was unsuccessfully added!")
+      else:
+        flash(f"Show was not added: the {conflict}")
+        return render_template('forms/new_show.html', form=form)
+    except Exception:
+      db.session.rollback()
+      flash("Show was unsuccessfully added!")
+
+    # e.g., flash('An error occurred. Show could not be listed.')
+    # see: http://flask.pocoo.org/docs/1.0/patterns/flashing/
+    finally:
+      db.session.close()
+  else:
+    flash("Show was not added")
+    
+  return render_template('pages/home.html')
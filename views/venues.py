@@ -0,0 +1,243 @@
+#----------------------------------------------------------------------------#
+# Venue pages: list, search, detail, create, edit and delete.
+#----------------------------------------------------------------------------#
+
+from itertools import groupby
+from flask import Blueprint, current_app, render_template, request, flash, redirect, url_for, abort
+from models import db, Artist, Venue, Shows
+import search
+import ngram_index
+from conditional import conditional, bump
+import cache
+import counters
+import genres
+import calendars
+import geo
+from queries import show_counts, show_section, shows_query, venue_areas
+from cache import cached
+from database import read_only
+from query_budgets import query_budget
+from views import calendar_feed, owner_page, search_results
+
+blueprint = Blueprint('venues', __name__)
+
+def group_areas(rows):
+  # Rows are already sorted by (state, city), so a single pass builds the areas
+  data = []
+  for (city, state), area_rows in groupby(rows, key=lambda r: (r.city, r.state)):
+    data.append({
+      "city": city,
+      "state": state,
+      "venues": [{
+        "id": row.id,
+        "name": row.name,
+        "num_upcoming_shows": row.num_upcoming_shows
+      } for row in area_rows]
+    })
+  return data
+
+#  Venues
+#  ----------------------------------------------------------------
+
+@blueprint.route('/venues')
+@read_only
+@conditional('Venue', 'Show', time_sensitive=True)
+@cached('venues')
+@query_budget(3)
+def index():
+  # One query over Venue alone (upcoming counts are denormalized);
+  # ?genre= joins the genre links
+  genre = request.args.get('genre')
+  rows = venue_areas(*([genres.with_genre(Venue, genre)] if genre else []))
+  return render_template('pages/venues.html', areas=group_areas(rows), genre=genre);
+
+@blueprint.route('/venues/near')
+@read_only
+@conditional('Venue', 'Show', time_sensitive=True)
+@query_budget(3)
+def venues_near():
+  # Venues within ?radius= km of ?lat=&lng=, nearest first, then by upcoming
+  # shows: one query over the grid cells around the point (see geo.py)
+  config = current_app.config
+  latitude = request.args.get('lat', type=float)
+  longitude = request.args.get('lng', type=float)
+  radius = request.args.get('radius', config['VENUES_NEAR_RADIUS_KM'], type=float)
+  limit = request.args.get('limit', config['VENUES_NEAR_LIMIT'], type=int)
+  if (latitude is None or longitude is None or not -90 <= latitude <= 90
+      or not -180 <= longitude <= 180 or not 0 < radius <= config['VENUES_NEAR_RADIUS_MAX_KM']
+      or not 1 <= limit <= config['VENUES_NEAR_LIMIT_MAX']):
+    abort(400)
+  venues = geo.near(latitude, longitude, radius, limit)
+  return render_template('pages/venues_near.html', venues=venues, radius=radius)
+
+@blueprint.route('/venues/search', methods=['POST'])
+@read_only
+@query_budget(3)
+def search_venues():
+  # Ranked, case-insensitive prefix search on name, city and genres
+  search_term = request.form.get("search_term", "")
+  matches = search.search(Venue, search_term)
+  return render_template('pages/search_venues.html', results=search_results(matches), search_term=search_term)
+
+@blueprint.route('/venues/<int:venue_id>')
+@read_only
+@conditional('Venue:{venue_id}', 'Artist', time_sensitive=True)
+@cached('venue:{venue_id}')
+@query_budget(6)
+def show_venue(venue_id):
+  venue = Venue.query.get_or_404(venue_id)     # Obtain the data for that venue_id
+  # Each section is one bounded query on Show(venue_id, start_time), joined
+  # to the artist's name and image
+  shows = shows_query(['artist_id', 'artist_name', 'artist_image_link']
+          ).filter(Shows.venue_id == venue_id)
+  upcoming_count, past_count = show_counts(Shows.venue_id, venue_id)
+  past_shows = show_section(shows, upcoming=False, after=request.args.get('past_after'))
+  upcoming_shows = show_section(shows, upcoming=True, after=request.args.get('upcoming_after'))
+  # the cached page shows these artists' names and images
+  cache.add_tags(*(f'artist:{show.artist_id}' for show in past_shows.rows + upcoming_shows.rows))
+
+  ven_dict = owner_page(venue, past_shows, upcoming_shows, upcoming_count, past_count)
+  return render_template('pages/show_venue.html', venue=ven_dict)
+
+@blueprint.route('/venues/<int:venue_id>/calendar.ics')
+@read_only
+@conditional('Venue:{venue_id}', 'Artist', time_sensitive=calendars.WINDOW_BUCKET)
+@query_budget(3)
+def calendar(venue_id):
+  # iCalendar feed of the venue's shows, ?from=&to= (see calendars.py)
+  venue = Venue.query.get_or_404(venue_id)
+  return calendar_feed(venue, Shows.venue_id, calendars.artist_link)
+
+#  Create Venue
+#  ----------------------------------------------------------------
+
+@blueprint.route('/venues/create', methods=['GET'])
+def create_venue_form():
+  from forms import VenueForm
+  form = VenueForm()
+  return render_template('forms/new_venue.html', form=form)
+
+@blueprint.route('/venues/create', methods=['POST'])
+def create_venue_submission():
+  # TODO: insert form data as a new Venue record in the db, instead
+  # TODO: modify data to be the data object returned from db insertion
+  from forms import VenueForm
+  form = VenueForm(request.form)
+
+  if form.validate():             
+    try:
+      new_venue = Venue(          
+        name=form.name.data,      
+        city=form.city.data,
+        state=form.state.data,
+        address=form.address.data,
+        phone=form.phone.data,
+        genres=",".join(form.genres.data),    
+        facebook_link=form.facebook_link.data,
+        image_link=form.image_link.data,
+        seeking_talent=form.seeking_talent.data,
+        seeking_description=form.seeking_description.data,
+        website_link=form.website_link.data,
+        latitude=form.latitude.data,
+        longitude=form.longitude.data,
+      )
+      db.session.add(new_venue)         
+      bump('Venue')
+      db.session.commit()
+      ngram_index.record(Venue, new_venue.id, new_venue.name)
+      cache.invalidate('venues')
+    # on successful db insert, flash success
+      flash('Venue ' + request.form['name'] + ' was successfully listed!')
+    # TODO: on unsuccessful db insert, flash an error instead.
+    except Exception:
+      db.session.rollback()
+      flash('An error occured. Venue ' + request.form['name'] + ' could not be listed.')
+    # e.g., flash('An error occurred. Venue ' + data.name + ' could not be listed.')
+    # see: http://flask.pocoo.org/docs/1.0/patterns/flashing/
+    finally:
+      db.session.close()
+  else:
+    flash("Venue was not listed!")
+
+    # return render_template('pages/home.html')
+  return redirect(url_for('venues.index'))
+
+@blueprint.route('/venues/<venue_id>', methods=['DELETE'])
+def delete_venue(venue_id):
+    # TODO: Complete this endpoint for taking a venue_id, and using
+    # SQLAlchemy ORM to delete a record. Handle cases where the session commit could fail. 
+  venue = Venue.query.get(venue_id)           # Obtain data based on id
+  if venue:
+    try:
+      venue_name = venue.name         
+      artist_ids = [artist_id for (artist_id,) in
+                    db.session.query(Shows.artist_id).filter_by(venue_id=venue.id).distinct()]
+      Shows.query.filter_by(venue_id=venue.id).delete()   # the venue's shows go with it
+      counters.recount(Artist, artist_ids)                # bulk delete skips the ORM events
+      db.session.delete(venue)   
+      bump('Venue', f'Venue:{venue.id}', 'Show')
+      db.session.commit()             
+      ngram_index.record(Venue, int(venue_id))
+      cache.invalidate('venues', 'shows', f'venue:{venue_id}')
+      flash("Selected Venue: " + venue_name + " has been deleted succesfully.")
+    except:
+      db.session.rollback()
+    finally:
+      db.session.close()
+  return redirect(url_for('venues.index'))
+  
+
+  # BONUS CHALLENGE: Implement a button to delete a Venue on a Venue Page, have it so that
+  # clicking that button delete it from the db then redirect the user to the homepage
+  # return render_template('pages/home.html')
+
+
+#  Update
+#  ----------------------------------------------------------------
+
+@blueprint.route('/venues/<int:venue_id>/edit', methods=['GET'])
+def edit_venue(venue_id):
+  from forms import VenueForm
+  form = VenueForm()
+  # TODO: populate form with values from venue with ID <venue_id>
+  venue = Venue.query.get(venue_id)                 
+  form.genres.data = genres.split(venue.genres)        
+  form.latitude.data = venue.latitude
+  form.longitude.data = venue.longitude
+  return render_template('forms/edit_venue.html', form=form, venue=venue)
+
+@blueprint.route('/venues/<int:venue_id>/edit', methods=['POST'])
+def edit_venue_submission(venue_id):
+  # TODO: take values from the form submitted, and update existing
+  # venue record with ID <venue_id> using the new attributes
+  from forms import VenueForm
+  form = VenueForm(request.form)
+  if form.validate():          
+    try:
+      venue = Venue.query.get(venue_id)     
+      venue.name = form.name.data
+      venue.city = form.city.data
+      venue.state = form.state.data
+      venue.phone = form.phone.data
+      venue.genres=",".join(form.genres.data)     
+      venue.facebook_link = form.facebook_link.data
+      venue.image_link = form.image_link.data
+      venue.seeking_talent = form.seeking_talent.data
+      venue.seeking_description = form.seeking_description.data
+      venue.website_link = form.website_link.data
+      # Unchanged coordinates follow a change of city; cleared ones too
+      venue.latitude = form.latitude.data
+      venue.longitude = form.longitude.data
+      db.session.add(venue)           
+      bump('Venue', f'Venue:{venue_id}')
+      db.session.commit()
+      ngram_index.record(Venue, venue_id, form.name.data)
+      cache.invalidate('venues', f'venue:{venue_id}')
+      flash("Venue "+form.name.data+" was edited succesfully")
+    except Exception:
+      db.session.rollback()
+    finally:
+      db.session.close()
+  else:
+    flash("Venue was not edited!")
+  return redirect(url_for('venues.show_venue', venue_id=venue_id))